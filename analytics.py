@@ -0,0 +1,255 @@
+"""
+BiasharaFlow Pharma - Analytics computations
+Pure pandas aggregations behind the dashboard tabs and reports.
+No Streamlit imports, so they can be reused by headless batch jobs.
+"""
+
+import pandas as pd
+import numpy as np
+from typing import Dict, Optional, Sequence, Tuple
+
+import price_anomalies
+
+
+# ============================================================================
+# SECTION 1: FILTERING
+# ============================================================================
+
+def sales_only(df: pd.DataFrame) -> pd.DataFrame:
+    """Exclude voided and return transactions for sales analysis."""
+    return df[(df['Voided'] == 'No') & (df['IsReturn'] == 'No')].copy()
+
+
+def filter_transactions(df: pd.DataFrame,
+                        date_range: Optional[Tuple] = None,
+                        outlets: Optional[Sequence[str]] = None,
+                        categories: Optional[Sequence[str]] = None,
+                        employees: Optional[Sequence[str]] = None,
+                        shifts: Optional[Sequence[str]] = None,
+                        hour_range: Optional[Tuple[int, int]] = None,
+                        payment_types: Optional[Sequence[str]] = None) -> pd.DataFrame:
+    """Apply the sidebar filters. A filter left as None is not applied."""
+    mask = pd.Series(True, index=df.index)
+    if date_range is not None and len(date_range) == 2:
+        dates = df['Date'].dt.date
+        mask &= (dates >= date_range[0]) & (dates <= date_range[1])
+    if outlets is not None:
+        mask &= df['OutletName'].isin(outlets)
+    if categories is not None:
+        mask &= df['Category'].isin(categories)
+    if employees is not None:
+        mask &= df['CashierName'].isin(employees)
+    if shifts is not None:
+        mask &= df['Shift'].isin(shifts)
+    if hour_range is not None:
+        mask &= (df['Hour'] >= hour_range[0]) & (df['Hour'] <= hour_range[1])
+    if payment_types is not None:
+        mask &= df['PaymentType'].isin(payment_types)
+    return df[mask].copy()
+
+
+# ============================================================================
+# SECTION 2: REPORT TABLES
+# ============================================================================
+
+# Measures behind every sales-by-dimension view; TransactionID counts baskets
+SALES_TOTALS = {
+    'TotalPriceKES': 'sum',
+    'ProfitKES': 'sum',
+    'TransactionID': 'nunique',
+    'Quantity': 'sum',
+}
+
+
+def sales_totals(filtered_df: pd.DataFrame, by: Sequence[str]) -> pd.DataFrame:
+    """Sales, profit, baskets and units per group of ``by``, sorted by the group keys."""
+    return filtered_df.groupby(list(by)).agg(SALES_TOTALS).reset_index()
+
+
+def daily_sales_report(filtered_df: pd.DataFrame) -> pd.DataFrame:
+    """Daily totals of sales, profit, transactions and units."""
+    daily_report = filtered_df.groupby(filtered_df['Date'].dt.date).agg({
+        'TotalPriceKES': 'sum',
+        'ProfitKES': 'sum',
+        'TransactionID': 'nunique',
+        'Quantity': 'sum'
+    }).reset_index()
+    daily_report.columns = ['Date', 'Total Sales', 'Profit', 'Transactions', 'Units Sold']
+    return daily_report
+
+
+def employee_performance(filtered_df: pd.DataFrame) -> pd.DataFrame:
+    """Per-cashier sales ranking used by the Employee Performance tab."""
+    employee_stats = filtered_df.groupby(['CashierID', 'CashierName', 'OutletName']).agg({
+        'TotalPriceKES': 'sum',
+        'ProfitKES': 'sum',
+        'TransactionID': 'nunique',
+        'Quantity': 'sum',
+        'DiscountPercent': 'mean'
+    }).reset_index()
+    return rank_employees(employee_stats)
+
+
+def rank_employees(employee_stats: pd.DataFrame) -> pd.DataFrame:
+    """Name, derive and rank per-cashier totals; shared by the pandas and SQL backends."""
+    employee_stats.columns = ['CashierID', 'Name', 'Branch', 'Sales', 'Profit', 'Transactions', 'Units', 'AvgDiscount']
+    employee_stats['AvgTransaction'] = (employee_stats['Sales'] / employee_stats['Transactions']).round(0)
+    employee_stats['SalesRank'] = employee_stats['Sales'].rank(ascending=False).astype(int)
+    return employee_stats.sort_values('Sales', ascending=False)
+
+
+def expiry_report(inventory_df: pd.DataFrame, days: int = 90) -> pd.DataFrame:
+    """Inventory lines expiring within ``days`` days, most urgent first."""
+    return inventory_df[inventory_df['DaysToExpiry'] <= days][
+        ['ItemName', 'Category', 'CurrentStock', 'DaysToExpiry', 'StockValue']
+    ].sort_values('DaysToExpiry')
+
+
+# Per-cashier measures behind the fraud risk score; the flag columns come from fraud_flags
+FRAUD_MEASURES = {
+    'TransactionID': 'count',
+    'VoidFlag': 'sum',
+    'ReturnFlag': 'sum',
+    'DiscountPercent': 'mean',
+    'NegProfitFlag': 'sum',
+    'PriceAnomaly': 'sum',
+}
+
+
+def fraud_flags(all_df: pd.DataFrame) -> pd.DataFrame:
+    """``all_df`` with 0/1 columns marking voided, returned and loss-making lines.
+
+    Lines not yet scored against their SKU price baselines are scored here,
+    against baselines from ``all_df`` itself; the loader scores the whole
+    dataset once so that filtered views keep the full-history baselines.
+    """
+    if 'PriceAnomaly' not in all_df.columns:
+        all_df = price_anomalies.score_lines(all_df)
+    return all_df.assign(
+        VoidFlag=(all_df['Voided'] == 'Yes').astype(np.int64),
+        ReturnFlag=(all_df['IsReturn'] == 'Yes').astype(np.int64),
+        NegProfitFlag=(all_df['ProfitKES'] < 0).astype(np.int64),
+    )
+
+
+def fraud_risk(all_df: pd.DataFrame) -> pd.DataFrame:
+    """Per-cashier fraud risk scoring over all transactions, voids included."""
+    fraud_stats = fraud_flags(all_df).groupby(['CashierID', 'CashierName', 'OutletName']).agg(
+        FRAUD_MEASURES
+    ).reset_index()
+    return score_fraud(fraud_stats)
+
+
+def score_fraud(fraud_stats: pd.DataFrame) -> pd.DataFrame:
+    """Name, derive rates and score per-cashier counts; shared by the pandas and sharded backends."""
+    fraud_stats.columns = ['CashierID', 'Name', 'Branch', 'TotalTxn', 'Voids', 'Returns', 'AvgDiscount', 'NegProfit',
+                           'PriceAnomalies']
+    fraud_stats['VoidRate'] = (fraud_stats['Voids'] / fraud_stats['TotalTxn'] * 100).round(2)
+    fraud_stats['ReturnRate'] = (fraud_stats['Returns'] / fraud_stats['TotalTxn'] * 100).round(2)
+    fraud_stats['NegProfitRate'] = (fraud_stats['NegProfit'] / fraud_stats['TotalTxn'] * 100).round(2)
+    fraud_stats['PriceAnomalyRate'] = (fraud_stats['PriceAnomalies'] / fraud_stats['TotalTxn'] * 100).round(2)
+
+    # Risk Score Calculation
+    fraud_stats['RiskScore'] = (
+        (fraud_stats['VoidRate'] > 5).astype(int) * 35 +
+        (fraud_stats['AvgDiscount'] > 10).astype(int) * 25 +
+        (fraud_stats['NegProfitRate'] > 3).astype(int) * 30 +
+        (fraud_stats['ReturnRate'] > 5).astype(int) * 10
+    )
+
+    fraud_stats['RiskLevel'] = fraud_stats['RiskScore'].apply(
+        lambda x: '🔴 HIGH' if x >= 50 else ('🟡 MEDIUM' if x >= 25 else '🟢 LOW')
+    )
+    return fraud_stats
+
+
+REPORT_TYPES = [
+    "Daily Sales Report",
+    "Employee Performance Report",
+    "Inventory Report",
+    "Expiry Alert Report",
+    "Fraud Risk Report",
+]
+
+
+def build_reports(all_df: pd.DataFrame, inventory_df: pd.DataFrame) -> Dict[str, pd.DataFrame]:
+    """Compute every Reports-tab output for an already-filtered slice of transactions."""
+    filtered_df = sales_only(all_df)
+    return {
+        "Daily Sales Report": daily_sales_report(filtered_df),
+        "Employee Performance Report": employee_performance(filtered_df),
+        "Inventory Report": inventory_df,
+        "Expiry Alert Report": expiry_report(inventory_df),
+        "Fraud Risk Report": fraud_risk(all_df),
+    }
+
+
+# ============================================================================
+# SECTION 3: DENSE MATRIX AGGREGATION
+# ============================================================================
+
+DAY_ORDER = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+
+def bincount_matrix(codes: Sequence[np.ndarray], shape: Tuple[int, ...],
+                    weights: Optional[np.ndarray] = None) -> np.ndarray:
+    """Sum ``weights`` (or count rows) into a dense array indexed by integer codes.
+
+    ``codes`` holds one integer array per dimension, e.g. (day, hour) or
+    (outlet, day, hour). They are flattened into one bin number and summed
+    with a single ``np.bincount`` into an array of ``shape``, so the cost is
+    one pass over the rows however many cells there are.
+    """
+    flat = np.ravel_multi_index(tuple(np.asarray(c, dtype=np.intp) for c in codes), shape)
+    size = int(np.prod(shape))
+    return np.bincount(flat, weights=weights, minlength=size)[:size].reshape(shape)
+
+
+def _hour_axis(df: pd.DataFrame) -> np.ndarray:
+    if len(df) == 0:
+        return np.arange(7, 23)
+    return np.arange(df['Hour'].min(), df['Hour'].max() + 1)
+
+
+def day_hour_matrix(df: pd.DataFrame, value: str = 'TotalPriceKES') -> pd.DataFrame:
+    """Day-of-week x hour totals, Monday first."""
+    hours = _hour_axis(df)
+    matrix = bincount_matrix((df['DayOfWeek'].values, df['Hour'].values - hours[0]),
+                             (7, len(hours)), df[value].values)
+    return pd.DataFrame(matrix, index=DAY_ORDER, columns=hours)
+
+
+def outlet_hour_matrix(df: pd.DataFrame, value: str = 'TotalPriceKES') -> pd.DataFrame:
+    """Outlet x hour totals."""
+    hours = _hour_axis(df)
+    codes, outlets = pd.factorize(df['OutletName'], sort=True)
+    matrix = bincount_matrix((codes, df['Hour'].values - hours[0]),
+                             (len(outlets), len(hours)), df[value].values)
+    return pd.DataFrame(matrix, index=outlets, columns=hours)
+
+
+def outlet_day_hour_cube(df: pd.DataFrame, value: str = 'TotalPriceKES') -> Tuple[np.ndarray, pd.Index, np.ndarray]:
+    """Outlet x day-of-week x hour totals for per-outlet small multiples.
+
+    Returns the cube, the outlet names along axis 0 and the hours along axis 2.
+    """
+    hours = _hour_axis(df)
+    codes, outlets = pd.factorize(df['OutletName'], sort=True)
+    cube = bincount_matrix((codes, df['DayOfWeek'].values, df['Hour'].values - hours[0]),
+                           (len(outlets), 7, len(hours)), df[value].values)
+    return cube, outlets, hours
+
+
+def date_hour_matrix(df: pd.DataFrame, value: str = 'TotalPriceKES') -> pd.DataFrame:
+    """Calendar date x hour totals covering every day from first to last sale."""
+    hours = _hour_axis(df)
+    days = df['Date'].values.astype('datetime64[D]')
+    if len(days) == 0:
+        return pd.DataFrame(columns=hours, dtype=float)
+    start = days.min()
+    day_codes = (days - start).astype(np.int64)
+    n_days = int(day_codes.max()) + 1
+    matrix = bincount_matrix((day_codes, df['Hour'].values - hours[0]),
+                             (n_days, len(hours)), df[value].values)
+    index = pd.Index(pd.date_range(pd.Timestamp(start), periods=n_days, freq='D').date, name='Date')
+    return pd.DataFrame(matrix, index=index, columns=hours)
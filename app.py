@@ -10,10 +10,34 @@ import pandas as pd
 import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
-from datetime import datetime, timedelta
-from typing import Dict, List, Tuple
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
 import warnings
-import calendar
+import os
+import glob
+import fnmatch
+import dimensions
+import reconciliation
+import rankings
+import baskets
+import productivity
+import sql_backend
+import sharded_backend
+import loader
+import sketches
+import stock_ledger
+import stockouts
+import alerts
+import patterns
+import returns
+import price_anomalies
+import discounts
+import progressive
+import targets
+import result_cache
+import charts
+import cards
+import analytics
 warnings.filterwarnings('ignore')
 
 # ============================================================================
@@ -124,6 +148,15 @@ st.markdown("""
     font-weight: 500;
 }
 
+.alert-info {
+    background: linear-gradient(135deg, #33b5e5 0%, #0099CC 100%);
+    color: white;
+    padding: 1rem 1.5rem;
+    border-radius: 10px;
+    margin: 0.5rem 0;
+    font-weight: 500;
+}
+
 .alert-success {
     background: linear-gradient(135deg, #00C851 0%, #007E33 100%);
     color: white;
@@ -158,6 +191,17 @@ st.markdown("""
     justify-content: center;
 }
 
+.card-grid {
+    display: grid;
+    gap: 1rem;
+    margin: 0.5rem 0;
+}
+
+.card-grid .rank-card,
+.card-grid .alert-critical {
+    margin: 0;
+}
+
 .rank-gold { background: linear-gradient(135deg, #FFD700, #FFA500); }
 .rank-silver { background: linear-gradient(135deg, #C0C0C0, #A0A0A0); }
 .rank-bronze { background: linear-gradient(135deg, #CD7F32, #8B4513); }
@@ -266,323 +310,150 @@ footer {visibility: hidden;}
 
 
 # ============================================================================
-# SECTION 1: ENHANCED DATA GENERATION
+# SECTION 1: DATA LOADING
 # ============================================================================
 
-@st.cache_data
-def generate_pharmacy_data(num_rows: int = 2500, seed: int = 42) -> pd.DataFrame:
-    """Generate comprehensive Kenyan pharmacy data with employee shifts and detailed tracking."""
-    np.random.seed(seed)
-    
-    # Outlets with more details
-    outlets = {
-        'OUT001': {'name': 'Nairobi CBD', 'city': 'Nairobi', 'rent': 150000, 'target': 800000},
-        'OUT002': {'name': 'Mombasa Nyali', 'city': 'Mombasa', 'rent': 100000, 'target': 600000},
-        'OUT003': {'name': 'Kisumu Mega', 'city': 'Kisumu', 'rent': 80000, 'target': 500000}
-    }
-    
-    # Enhanced cashier data with shifts and hire dates
-    cashiers = {
-        'OUT001': [
-            ('C001', 'Jane Wanjiku', 'Morning', '2022-03-15', 45000),
-            ('C002', 'Peter Omondi', 'Afternoon', '2021-08-20', 50000),
-            ('C003', 'Grace Muthoni', 'Evening', '2023-01-10', 42000)
-        ],
-        'OUT002': [
-            ('C004', 'Hassan Ali', 'Morning', '2022-06-01', 44000),
-            ('C005', 'Fatma Said', 'Afternoon', '2021-11-15', 48000),
-            ('C006', 'Kevin Otieno', 'Evening', '2023-04-20', 40000)
-        ],
-        'OUT003': [
-            ('C007', 'Lucy Achieng', 'Morning', '2022-01-05', 43000),
-            ('C008', 'James Kiprop', 'Afternoon', '2021-09-10', 47000),
-            ('C009', 'Mary Nekesa', 'Evening', '2023-02-28', 41000)
-        ]
-    }
-    
-    # Expanded medicine catalog with reorder levels
-    medicines = [
-        ('MED001', 'Paracetamol 500mg', 'Painkillers', 50, 30, 'No', 100, 500),
-        ('MED002', 'Ibuprofen 400mg', 'Painkillers', 80, 50, 'No', 80, 400),
-        ('MED003', 'Amoxicillin 500mg', 'Antibiotics', 150, 90, 'Yes', 60, 300),
-        ('MED004', 'Azithromycin 250mg', 'Antibiotics', 350, 200, 'Yes', 40, 200),
-        ('MED005', 'Metformin 500mg', 'Chronic', 120, 70, 'Yes', 100, 500),
-        ('MED006', 'Amlodipine 5mg', 'Chronic', 180, 100, 'Yes', 80, 400),
-        ('MED007', 'Omeprazole 20mg', 'Gastro', 200, 120, 'No', 70, 350),
-        ('MED008', 'Cetirizine 10mg', 'Allergy', 60, 35, 'No', 90, 450),
-        ('MED009', 'Vitamin C 1000mg', 'Vitamins', 250, 150, 'No', 120, 600),
-        ('MED010', 'Multivitamin Plus', 'Vitamins', 450, 280, 'No', 80, 400),
-        ('MED011', 'Cough Syrup 100ml', 'Cold & Flu', 180, 100, 'No', 100, 500),
-        ('MED012', 'Flu Capsules', 'Cold & Flu', 120, 70, 'No', 150, 750),
-        ('MED013', 'Malaria Test Kit', 'Diagnostics', 300, 180, 'No', 50, 250),
-        ('MED014', 'Artemether-Lum', 'Antimalarials', 550, 350, 'Yes', 60, 300),
-        ('MED015', 'ORS Sachets', 'Gastro', 30, 15, 'No', 200, 1000),
-        ('MED016', 'Zinc Tablets', 'Supplements', 150, 90, 'No', 100, 500),
-        ('MED017', 'Insulin Syringe', 'Diabetes', 50, 25, 'No', 150, 750),
-        ('MED018', 'Glucometer Strips', 'Diabetes', 800, 500, 'No', 40, 200),
-        ('MED019', 'Antacid Tablets', 'Gastro', 100, 60, 'No', 120, 600),
-        ('MED020', 'Eye Drops 10ml', 'Ophthalmic', 280, 170, 'No', 60, 300),
-        ('MED021', 'Diclofenac Gel', 'Painkillers', 350, 200, 'No', 50, 250),
-        ('MED022', 'Loratadine 10mg', 'Allergy', 90, 55, 'No', 80, 400),
-        ('MED023', 'Aspirin 300mg', 'Painkillers', 40, 20, 'No', 150, 750),
-        ('MED024', 'Doxycycline 100mg', 'Antibiotics', 200, 120, 'Yes', 50, 250),
-        ('MED025', 'Metronidazole 400mg', 'Antibiotics', 80, 45, 'Yes', 70, 350),
-        ('MED026', 'Salbutamol Inhaler', 'Respiratory', 650, 400, 'Yes', 30, 150),
-        ('MED027', 'Prednisolone 5mg', 'Steroids', 120, 70, 'Yes', 40, 200),
-        ('MED028', 'Ferrous Sulphate', 'Supplements', 60, 35, 'No', 100, 500),
-        ('MED029', 'Folic Acid 5mg', 'Supplements', 50, 25, 'No', 120, 600),
-        ('MED030', 'Clotrimazole Cream', 'Antifungal', 180, 100, 'No', 60, 300),
-    ]
-    
-    # Date range: 6 months
-    end_date = datetime(2024, 12, 31)
-    start_date = end_date - timedelta(days=180)
-    
-    data = []
-    transaction_id = 10000
-    
-    for _ in range(num_rows):
-        # Random date
-        date = start_date + timedelta(days=np.random.randint(0, 181))
-        month = date.month
-        day_of_week = date.weekday()
-        
-        # Time of day with realistic distribution
-        # More transactions during lunch (12-2) and evening (5-7)
-        hour_weights = [0.02, 0.02, 0.03, 0.05, 0.06, 0.08, 0.10, 0.12, 0.10, 0.08, 0.08, 0.06, 0.05, 0.05, 0.05, 0.05]
-        hours = list(range(7, 23))
-        hour = np.random.choice(hours, p=hour_weights[:len(hours)])
-        minute = np.random.randint(0, 60)
-        second = np.random.randint(0, 60)
-        date = date.replace(hour=hour, minute=minute, second=second)
-        
-        # Determine shift based on hour
-        if 7 <= hour < 14:
-            shift = 'Morning'
-        elif 14 <= hour < 19:
-            shift = 'Afternoon'
-        else:
-            shift = 'Evening'
-        
-        # Weekend boost
-        weekend_mult = 1.3 if day_of_week >= 5 else 1.0
-        
-        # Seasonal multiplier
-        seasonal_mult = 1.3 if month in [10, 11, 12, 4, 5] else 1.0
-        
-        # Select outlet
-        outlet_weights = [0.45, 0.30, 0.25]
-        outlet_id = np.random.choice(list(outlets.keys()), p=outlet_weights)
-        outlet_info = outlets[outlet_id]
-        
-        # Select cashier based on shift
-        shift_cashiers = [c for c in cashiers[outlet_id] if c[2] == shift]
-        if not shift_cashiers:
-            shift_cashiers = cashiers[outlet_id]
-        cashier = shift_cashiers[np.random.randint(0, len(shift_cashiers))]
-        cashier_id, cashier_name, cashier_shift, hire_date, salary = cashier
-        
-        # Select medicine
-        med_idx = np.random.randint(0, len(medicines))
-        if month in [10, 11, 12, 4, 5] and np.random.random() < 0.3:
-            med_idx = np.random.choice([10, 11, 13, 14, 25])
-        
-        item = medicines[med_idx]
-        item_code, item_name, category, unit_price, cost_price, prescription, reorder_level, max_stock = item
-        
-        # Quantity
-        quantity = np.random.choice([1, 1, 1, 2, 2, 3, 5, 10], p=[0.35, 0.2, 0.15, 0.1, 0.08, 0.07, 0.03, 0.02])
-        
-        # Payment type
-        payment_type = np.random.choice(['M-Pesa', 'Cash', 'Card', 'Insurance'], p=[0.70, 0.18, 0.07, 0.05])
-        
-        # Customer type
-        customer_type = np.random.choice(['Walk-in', 'Regular', 'Corporate', 'Hospital'], p=[0.50, 0.30, 0.12, 0.08])
-        
-        # Discount
-        discount = 0
-        if customer_type == 'Corporate':
-            discount = np.random.choice([10, 15, 20])
-        elif customer_type == 'Regular' and np.random.random() < 0.3:
-            discount = np.random.choice([5, 10])
-        elif np.random.random() < 0.05:
-            discount = np.random.choice([5, 10, 15])
-        
-        # Calculate amounts
-        total_price = unit_price * quantity * (1 - discount/100)
-        total_cost = cost_price * quantity
-        profit = total_price - total_cost
-        
-        # Stock levels
-        stock_before = np.random.randint(reorder_level - 20, max_stock)
-        stock_after = max(0, stock_before - quantity)
-        
-        # Expiry date
-        days_to_expiry = np.random.choice(
-            [7, 15, 30, 45, 60, 90, 180, 365, 730],
-            p=[0.01, 0.02, 0.05, 0.05, 0.08, 0.15, 0.24, 0.25, 0.15]
-        )
-        expiry_date = date + timedelta(days=int(days_to_expiry))
-        
-        # Void transactions
-        void_rate = 0.08 if cashier_id in ['C003', 'C006'] else 0.02
-        voided = 'Yes' if np.random.random() < void_rate else 'No'
-        
-        # Fraud patterns
-        if cashier_id in ['C003', 'C006'] and np.random.random() < 0.05:
-            discount = 50
-            total_price = unit_price * quantity * 0.5
-            profit = total_price - total_cost
-        
-        # Return transactions
-        is_return = 'Yes' if np.random.random() < 0.03 else 'No'
-        if is_return == 'Yes':
-            total_price = -abs(total_price)
-            profit = -abs(profit)
-        
-        transaction_id += 1
-        
-        data.append({
-            'Date': date,
-            'Hour': hour,
-            'DayOfWeek': day_of_week,
-            'DayName': calendar.day_name[day_of_week],
-            'WeekNumber': date.isocalendar()[1],
-            'Month': date.strftime('%B'),
-            'MonthNum': month,
-            'Year': date.year,
-            'Shift': shift,
-            'OutletID': outlet_id,
-            'OutletName': outlet_info['name'],
-            'City': outlet_info['city'],
-            'MonthlyTarget': outlet_info['target'],
-            'CashierID': cashier_id,
-            'CashierName': cashier_name,
-            'CashierShift': cashier_shift,
-            'HireDate': hire_date,
-            'Salary': salary,
-            'TransactionID': f'TXN{transaction_id}',
-            'PaymentType': payment_type,
-            'CustomerType': customer_type,
-            'ItemCode': item_code,
-            'ItemName': item_name,
-            'Category': category,
-            'Quantity': quantity,
-            'UnitPriceKES': unit_price,
-            'TotalPriceKES': total_price,
-            'CostPriceKES': cost_price * quantity,
-            'ProfitKES': profit,
-            'DiscountPercent': discount,
-            'PrescriptionRequired': prescription,
-            'ExpiryDate': expiry_date,
-            'DaysToExpiry': days_to_expiry,
-            'StockLevelBefore': stock_before,
-            'StockLevelAfter': stock_after,
-            'ReorderLevel': reorder_level,
-            'MaxStock': max_stock,
-            'Voided': voided,
-            'IsReturn': is_return
-        })
-    
-    df = pd.DataFrame(data)
-    df['Date'] = pd.to_datetime(df['Date'])
-    df['ExpiryDate'] = pd.to_datetime(df['ExpiryDate'])
-    
-    return df.sort_values('Date').reset_index(drop=True)
+# Dataset size and dimensions, overridable for load testing:
+#   PHARMA_ROWS=500000 PHARMA_SCALE=200x10x10000 streamlit run app.py
+#   PHARMA_DIMENSIONS=config streamlit run app.py
+DATA_ROWS = int(os.environ.get('PHARMA_ROWS', '2500'))
+DATA_SCALE = os.environ.get('PHARMA_SCALE', '')
+DIMENSIONS_DIR = os.environ.get('PHARMA_DIMENSIONS', '')
+DATA_WORKERS = int(os.environ.get('PHARMA_WORKERS', '1'))
+MPESA_STATEMENT = os.environ.get('PHARMA_MPESA_STATEMENT', '')
+# Where sales aggregations run: 'pandas', an embedded SQL engine ('duckdb' / 'sqlite'),
+# or 'sharded' across PHARMA_SHARDS outlet-partitioned worker processes (default: one per core)
+# With PHARMA_PARQUET (a path or glob), DuckDB scans the sales from those Parquet files instead of
+# holding a copy of the frame; they are written from the loaded sales if none exist yet. It selects
+# the SQL backend by default (SQLite, over a copy of the frame, when duckdb is not installed)
+SALES_PARQUET = os.environ.get('PHARMA_PARQUET', '')
+QUERY_BACKEND = os.environ.get('PHARMA_BACKEND', sql_backend.default_engine() if SALES_PARQUET else 'pandas')
+QUERY_SHARDS = int(os.environ.get('PHARMA_SHARDS', '0')) or None
+# Shared per-view result cache: byte budget and time-to-live
+RESULT_CACHE_MB = int(os.environ.get('PHARMA_CACHE_MB', '256'))
+RESULT_CACHE_TTL = int(os.environ.get('PHARMA_CACHE_TTL', '3600'))
+# Alert rules CSV (default: config/alerts.csv) and the log fired alerts are appended to
+ALERT_RULES = os.environ.get('PHARMA_ALERT_RULES', '')
+ALERT_LOG = os.environ.get('PHARMA_ALERT_LOG', '')
+# Progressive overview: draw it from a stratified sample first, refine to exact in the background on
+# PHARMA_REFINE_WORKERS threads shared by all sessions (default: the thread pool's own sizing)
+PROGRESSIVE = os.environ.get('PHARMA_PROGRESSIVE', '0') == '1'
+REFINE_WORKERS = int(os.environ.get('PHARMA_REFINE_WORKERS', '0')) or None
+REFINE_POLL_SECONDS = 0.5
 
 
-@st.cache_data
-def generate_employee_logins(df: pd.DataFrame) -> pd.DataFrame:
-    """Generate employee login/logout records."""
-    np.random.seed(42)
-    
-    employees = df[['CashierID', 'CashierName', 'OutletName', 'CashierShift', 'HireDate', 'Salary']].drop_duplicates()
-    
-    # Generate 180 days of login data
-    login_records = []
-    
-    for _, emp in employees.iterrows():
-        for day_offset in range(180):
-            date = datetime(2024, 7, 4) + timedelta(days=day_offset)
-            
-            # 85% attendance rate
-            if np.random.random() > 0.15:
-                # Login time based on shift
-                if emp['CashierShift'] == 'Morning':
-                    login_hour = np.random.choice([6, 7, 7, 7, 8])
-                    logout_hour = np.random.choice([14, 14, 14, 15, 15])
-                elif emp['CashierShift'] == 'Afternoon':
-                    login_hour = np.random.choice([13, 14, 14, 14, 15])
-                    logout_hour = np.random.choice([19, 19, 20, 20, 21])
-                else:
-                    login_hour = np.random.choice([18, 19, 19, 19, 20])
-                    logout_hour = np.random.choice([22, 22, 23, 23, 23])
-                
-                login_time = date.replace(hour=login_hour, minute=np.random.randint(0, 60))
-                logout_time = date.replace(hour=logout_hour, minute=np.random.randint(0, 60))
-                
-                # Late flag
-                expected_login = 7 if emp['CashierShift'] == 'Morning' else (14 if emp['CashierShift'] == 'Afternoon' else 19)
-                is_late = login_hour > expected_login
-                
-                login_records.append({
-                    'Date': date.date(),
-                    'CashierID': emp['CashierID'],
-                    'CashierName': emp['CashierName'],
-                    'OutletName': emp['OutletName'],
-                    'Shift': emp['CashierShift'],
-                    'LoginTime': login_time,
-                    'LogoutTime': logout_time,
-                    'HoursWorked': (logout_time - login_time).seconds / 3600,
-                    'IsLate': is_late,
-                    'Status': 'Present'
-                })
-            else:
-                login_records.append({
-                    'Date': date.date(),
-                    'CashierID': emp['CashierID'],
-                    'CashierName': emp['CashierName'],
-                    'OutletName': emp['OutletName'],
-                    'Shift': emp['CashierShift'],
-                    'LoginTime': None,
-                    'LogoutTime': None,
-                    'HoursWorked': 0,
-                    'IsLate': False,
-                    'Status': 'Absent'
-                })
-    
-    return pd.DataFrame(login_records)
+@st.cache_data(max_entries=4)
+def load_dimensions(directory: str, scale: str) -> Optional[Dict[str, pd.DataFrame]]:
+    """Synthetic scale-out if ``scale`` is set, else CSV tables from ``directory``, else defaults."""
+    spec = dimensions.parse_scale(scale)
+    if spec is not None:
+        return dimensions.synthesize_dimensions(**spec)
+    if directory:
+        return dimensions.load_dimensions(directory)
+    return None
 
 
-@st.cache_data
-def generate_inventory_data(df: pd.DataFrame) -> pd.DataFrame:
-    """Generate current inventory status."""
-    np.random.seed(42)
-    
-    inventory = df.groupby(['ItemCode', 'ItemName', 'Category', 'UnitPriceKES', 'ReorderLevel', 'MaxStock']).agg({
-        'Quantity': 'sum',
-        'CostPriceKES': 'first',
-        'ExpiryDate': 'min',
-        'DaysToExpiry': 'min'
-    }).reset_index()
-    
-    # Simulate current stock
-    inventory['CurrentStock'] = inventory.apply(
-        lambda x: np.random.randint(max(0, x['ReorderLevel'] - 30), x['MaxStock']), axis=1
-    )
-    
-    inventory['StockValue'] = inventory['CurrentStock'] * inventory['UnitPriceKES']
-    inventory['StockStatus'] = inventory.apply(
-        lambda x: 'Critical' if x['CurrentStock'] <= x['ReorderLevel'] * 0.5 
-        else ('Low' if x['CurrentStock'] <= x['ReorderLevel'] else 'Good'), axis=1
-    )
-    
-    inventory['NeedsReorder'] = inventory['CurrentStock'] <= inventory['ReorderLevel']
-    inventory['ReorderQty'] = inventory.apply(
-        lambda x: x['MaxStock'] - x['CurrentStock'] if x['NeedsReorder'] else 0, axis=1
-    )
-    
-    return inventory
+@st.cache_data(max_entries=2)
+def load_datasets(num_rows: int = 2500, seed: int = 42,
+                  dims: Optional[Dict[str, pd.DataFrame]] = None) -> Tuple[Dict[str, pd.DataFrame], pd.DataFrame]:
+    """Cached wrapper around loader.load_datasets: transactions, logins, inventory, sales and load timings."""
+    return loader.load_datasets(num_rows, seed, dims, workers=DATA_WORKERS)
+
+
+@st.cache_resource
+def shared_result_cache() -> result_cache.ResultCache:
+    """One per-view result cache for every session in this process."""
+    return result_cache.ResultCache(RESULT_CACHE_MB * 1024 ** 2, RESULT_CACHE_TTL)
+
+
+@st.cache_resource
+def overview_refiner() -> progressive.Refiner:
+    """Background threads computing exact overview results into the shared result cache."""
+    return progressive.Refiner(shared_result_cache(), REFINE_WORKERS)
+
+
+@st.cache_resource
+def shared_figure_cache() -> charts.FigureCache:
+    """Built chart figures for every session in this process, keyed by their input data."""
+    return charts.FigureCache()
+
+
+@st.cache_resource
+def shared_ranking_index(dataset_key: Tuple) -> rankings.RankingIndex:
+    """Shared per-outlet/per-SKU ranking index; each run syncs it with the loaded sales."""
+    return rankings.RankingIndex()
+
+
+@st.cache_resource
+def build_sketch_index(sales_df: pd.DataFrame) -> sketches.SketchIndex:
+    """Shared per-(day, outlet) sketches over all sales for approximate metrics."""
+    return sketches.SketchIndex.from_transactions(sales_df)
+
+
+@st.cache_resource
+def build_discount_cube(sales_df: pd.DataFrame) -> discounts.DiscountCube:
+    """Shared discount cube over all sales, for leakage breakdowns and drill-down."""
+    return discounts.DiscountCube.from_transactions(sales_df)
+
+
+@st.cache_resource
+def build_overview_sample(sales_df: pd.DataFrame) -> progressive.StratifiedSample:
+    """Shared stratified basket sample (1% of every outlet-day) for instant overview estimates."""
+    return progressive.StratifiedSample.from_transactions(sales_df)
+
+
+@st.cache_resource
+def build_stock_ledger(df: pd.DataFrame, receipts: pd.DataFrame) -> stock_ledger.StockLedger:
+    """Shared stock ledger over every movement, for point-in-time stock and stock trends."""
+    return stock_ledger.StockLedger.from_transactions(df, receipts)
+
+
+@st.cache_resource
+def build_alert_engine(df: pd.DataFrame, receipts: pd.DataFrame) -> alerts.AlertEngine:
+    """Shared alert engine with every loaded transaction ingested; later batches only re-check their days."""
+    engine = alerts.AlertEngine(alerts.load_alert_rules(ALERT_RULES or None),
+                                build_stock_ledger(df, receipts), ALERT_LOG or None)
+    engine.ingest(df)
+    return engine
+
+
+def parquet_target(pattern: str) -> str:
+    """File to write the sales to when ``pattern`` matches none: the path itself, or part-0.parquet for a glob."""
+    directory = os.path.dirname(pattern)
+    if glob.has_magic(directory):
+        raise ValueError(f"PHARMA_PARQUET={pattern!r} matches no files and its directory is a pattern; "
+                         f"create the files first or use a plain directory")
+    target = os.path.join(directory, 'part-0.parquet') if glob.has_magic(pattern) else pattern
+    if not fnmatch.fnmatch(target, pattern):
+        raise ValueError(f"PHARMA_PARQUET={pattern!r} matches no files, and {target!r} would not match it either")
+    os.makedirs(directory or '.', exist_ok=True)
+    return target
+
+
+@st.cache_resource
+def build_sql_backend(sales_df: pd.DataFrame, engine: str, parquet: str = '') -> sql_backend.SQLBackend:
+    """Shared embedded SQL database holding all sales, or a DuckDB view over their Parquet files."""
+    if parquet and engine == 'duckdb':
+        if not glob.glob(parquet):
+            sales_df.to_parquet(parquet_target(parquet), index=False)
+        return sql_backend.SQLBackend.from_parquet(parquet)
+    return sql_backend.SQLBackend.from_frame(sales_df, engine)
+
+
+@st.cache_resource
+def build_sharded_backend(df: pd.DataFrame, shards: Optional[int]) -> sharded_backend.ShardedBackend:
+    """Shared outlet shards of all transactions, each held by its own worker process."""
+    return sharded_backend.ShardedBackend.from_frame(df, shards)
+
+
+@st.cache_data(max_entries=2)
+def reconcile_payments(df: pd.DataFrame, statement_path: str) -> Dict[str, pd.DataFrame]:
+    """Reconcile M-Pesa sales against the statement file, or a simulated statement if none is set."""
+    if statement_path:
+        statement = reconciliation.load_mpesa_statement(statement_path)
+    else:
+        statement = reconciliation.simulate_mpesa_statement(df)
+    return reconciliation.reconcile_mpesa(df, statement)
 
 
 # ============================================================================
@@ -591,18 +462,20 @@ def generate_inventory_data(df: pd.DataFrame) -> pd.DataFrame:
 
 def main():
     # Load data
-    df = generate_pharmacy_data(2500)
-    login_df = generate_employee_logins(df)
-    inventory_df = generate_inventory_data(df)
+    dims = load_dimensions(DIMENSIONS_DIR, DATA_SCALE)
+    datasets, load_timings = load_datasets(DATA_ROWS, dims=dims)
+    df = datasets['transactions']
+    login_df = datasets['logins']
+    inventory_df = datasets['inventory']
     
     # Exclude voided and return transactions for sales analysis
-    sales_df = df[(df['Voided'] == 'No') & (df['IsReturn'] == 'No')].copy()
+    sales_df = datasets['sales']
     
     # ========== HEADER ==========
     st.markdown("""
     <div class="main-header">
         <h1>💊 BiasharaFlow Pharma Rudder Research</h1>
-        <p>Premium Analytics Dashboard • 3 Outlets • Real-time Monitoring</p>
+        <p>Premium Analytics Dashboard • """ + f"{df['OutletID'].nunique()} Outlets" + """ • Real-time Monitoring</p>
         <div class="live-clock">📅 """ + datetime.now().strftime("%A, %d %B %Y | %H:%M") + """</div>
     </div>
     """, unsafe_allow_html=True)
@@ -681,28 +554,103 @@ def main():
         st.markdown("#### 🔄 Data Refresh")
         if st.button("🔄 Refresh Dashboard", use_container_width=True):
             st.cache_data.clear()
+            shared_result_cache().clear()
+            shared_figure_cache().clear()
             st.rerun()
         
+        with st.expander("⏱️ Load Timings"):
+            st.caption(f"Loaded in {load_timings['Finish'].max():.2f}s; "
+                       f"critical path {load_timings['CriticalPath'].max():.2f}s")
+            st.dataframe(
+                load_timings[['Stage', 'Seconds', 'Finish', 'CriticalPath', 'Path']].round(3),
+                use_container_width=True,
+                hide_index=True
+            )
+        
+        # Filled in once this run's views have been served
+        cache_panel = st.empty()
+        chart_panel = st.empty()
+        
         st.markdown("---")
         st.caption("🇰🇪 Built for Kenyan Pharmacies")
         st.caption("📱 Mobile Optimized")
     
     # Apply filters
     if len(date_range) == 2:
-        mask = (
-            (sales_df['Date'].dt.date >= date_range[0]) &
-            (sales_df['Date'].dt.date <= date_range[1]) &
-            (sales_df['OutletName'].isin(outlets)) &
-            (sales_df['Category'].isin(categories)) &
-            (sales_df['CashierName'].isin(employees)) &
-            (sales_df['Shift'].isin(shifts)) &
-            (sales_df['Hour'] >= hour_range[0]) &
-            (sales_df['Hour'] <= hour_range[1]) &
-            (sales_df['PaymentType'].isin(payment_types))
+        sidebar_filters = dict(
+            date_range=date_range,
+            outlets=outlets,
+            categories=categories,
+            employees=employees,
+            shifts=shifts,
+            hour_range=hour_range,
+            payment_types=payment_types
         )
-        filtered_df = sales_df[mask].copy()
     else:
-        filtered_df = sales_df.copy()
+        sidebar_filters = {}
+    
+    # Per-view results are shared across sessions, keyed by dataset and normalized filter state.
+    # Cached values are shared: derive new frames from them, never modify them in place.
+    results = shared_result_cache()
+    dataset_key = (DATA_ROWS, DATA_SCALE, DIMENSIONS_DIR, QUERY_BACKEND)
+    view_key = result_cache.filter_key(dataset=dataset_key, **sidebar_filters)
+    
+    def cached(name: str, compute, key: Optional[str] = None):
+        return results.get_or_compute((name, key or view_key), compute)
+    
+    def filtered_view() -> pd.DataFrame:
+        return cached('filtered_df', lambda: analytics.filter_transactions(sales_df, **sidebar_filters))
+    
+    # Sales-by-dimension aggregations run in pandas on filtered_df, or are pushed
+    # down to the embedded SQL engine with the same filters
+    if QUERY_BACKEND == 'sharded':
+        query_backend = build_sharded_backend(df, QUERY_SHARDS)
+    elif QUERY_BACKEND != 'pandas':
+        query_backend = build_sql_backend(sales_df, QUERY_BACKEND, SALES_PARQUET)
+    else:
+        query_backend = None
+    # Heatmaps and fraud counters are also scattered to the shards
+    sharded = query_backend if QUERY_BACKEND == 'sharded' else None
+    
+    def sales_totals(by: List[str]) -> pd.DataFrame:
+        if query_backend is not None:
+            return cached(f"sales_totals:{','.join(by)}", lambda: query_backend.sales_totals(by, **sidebar_filters))
+        return cached(f"sales_totals:{','.join(by)}", lambda: analytics.sales_totals(filtered_view(), by))
+    
+    # Figures are rebuilt only when the data they are drawn from changes; cached figures are shared
+    figures = shared_figure_cache()
+    
+    def cached_figure(name: str, data, build):
+        return figures.get(name, data, build)
+    
+    # Card lists render as one element per section; long lists page with a "show more" button
+    def card_section(section: str, frame: pd.DataFrame, build, columns: int = 1, page_size: int = 12):
+        shown_key = f"cards_shown:{section}"
+        shown = st.session_state.get(shown_key, page_size)
+        st.markdown(cards.grid(build(frame.iloc[:shown]), columns), unsafe_allow_html=True)
+        if len(frame) > shown:
+            remaining = len(frame) - shown
+            if st.button(f"Show {min(page_size, remaining)} more ({remaining:,} hidden)", key=f"more:{section}"):
+                st.session_state[shown_key] = shown + page_size
+                st.rerun()
+    
+    # Product rankings come from the shared index while only outlet/category filters
+    # are narrowed; any other filter falls back to a one-off ranking of filtered_df
+    # After a refresh only the sales newer than the index's latest are folded in
+    ranking_index = shared_ranking_index(dataset_key)
+    ranking_index.sync(sales_df, key=dataset_key)
+    ranking_from_index = (
+        (len(date_range) != 2 or (date_range[0] <= df['Date'].min().date() and date_range[1] >= df['Date'].max().date())) and
+        set(employees) >= set(df['CashierName'].unique()) and
+        set(shifts) >= {'Morning', 'Afternoon', 'Evening'} and
+        hour_range[0] <= 7 and hour_range[1] >= 23 and
+        set(payment_types) >= set(df['PaymentType'].unique())
+    )
+    
+    def rank_products(k: int, largest: bool = True) -> pd.DataFrame:
+        if ranking_from_index:
+            return ranking_index.rank(k, largest=largest, outlets=outlets, categories=categories)
+        return rankings.rank_products(filtered_df, k, largest=largest)
     
     # ========== MAIN TABS ==========
     tab1, tab2, tab3, tab4, tab5, tab6, tab7, tab8 = st.tabs([
@@ -718,47 +666,113 @@ def main():
     
     # ========== TAB 1: OVERVIEW ==========
     with tab1:
-        # Quick Stats Row
-        col1, col2, col3, col4, col5 = st.columns(5)
-        
-        total_sales = filtered_df['TotalPriceKES'].sum()
-        total_profit = filtered_df['ProfitKES'].sum()
-        total_transactions = len(filtered_df)
-        avg_basket = filtered_df['TotalPriceKES'].mean() if len(filtered_df) > 0 else 0
-        mpesa_pct = (filtered_df[filtered_df['PaymentType'] == 'M-Pesa']['TotalPriceKES'].sum() / total_sales * 100) if total_sales > 0 else 0
-        
-        with col1:
-            st.metric("💰 Total Sales", f"KES {total_sales:,.0f}", delta="+12.5% vs last period")
-        
-        with col2:
-            st.metric("📈 Total Profit", f"KES {total_profit:,.0f}", delta=f"{(total_profit/total_sales*100):.1f}% margin")
-        
-        with col3:
-            st.metric("🧾 Transactions", f"{total_transactions:,}", delta="+8.3% growth")
+        # Headline numbers, the sales trend and the payment mix. In progressive mode the exact numbers
+        # are computed on a background thread; until they land these sections show estimates from the
+        # stratified sample with 95% margins, as fragments that poll the refinement and swap the exact
+        # values in place. Nothing else on the page waits for it
+        def overview_numbers() -> Dict:
+            payment_dist = sales_totals(['PaymentType'])
+            total_sales = payment_dist['TotalPriceKES'].sum()
+            total_transactions = query_backend.kpis(**sidebar_filters)['Transactions'] if query_backend is not None \
+                else filtered_view()['TransactionID'].nunique()
+            view = filtered_view()
+            daily_sales = view.groupby(view['Date'].dt.date)['TotalPriceKES'].sum().tail(30).reset_index()
+            daily_sales.columns = ['Date', 'Sales']
+            return dict(
+                payment_dist=payment_dist,
+                total_sales=total_sales,
+                total_profit=payment_dist['ProfitKES'].sum(),
+                total_transactions=total_transactions,
+                avg_basket=total_sales / total_transactions if total_transactions > 0 else 0,
+                mpesa_pct=(payment_dist.loc[payment_dist['PaymentType'] == 'M-Pesa', 'TotalPriceKES'].sum() / total_sales * 100) if total_sales > 0 else 0,
+                daily_sales=daily_sales,
+            )
         
-        with col4:
-            st.metric("🛒 Avg Basket", f"KES {avg_basket:,.0f}", delta="+5.2%")
+        exact_overview = overview_refiner().submit(('overview', view_key), overview_numbers) if PROGRESSIVE else None
+        refining = exact_overview is not None and not exact_overview.done()
+        overview_sample = build_overview_sample(sales_df) if refining else None
+        
+        def progressive_section(render_exact, render_estimate):
+            """Render the exact overview, or while it is still refining the estimate, polling until it lands."""
+            def section():
+                if exact_overview is None:
+                    render_exact(overview_numbers())
+                elif exact_overview.done():
+                    render_exact(exact_overview.result())
+                    if refining:
+                        # A full rerun finds the overview cached and stops the polling
+                        st.rerun()
+                else:
+                    render_estimate()
+            if refining:
+                st.fragment(section, run_every=REFINE_POLL_SECONDS)()
+            else:
+                section()
         
-        with col5:
-            st.metric("📱 M-Pesa %", f"{mpesa_pct:.1f}%", delta="Target: 75%")
+        def show_kpis(overview: Dict):
+            total_sales = overview['total_sales']
+            total_profit = overview['total_profit']
+            col1, col2, col3, col4, col5 = st.columns(5)
+            
+            with col1:
+                st.metric("💰 Total Sales", f"KES {total_sales:,.0f}", delta="+12.5% vs last period")
+            
+            with col2:
+                st.metric("📈 Total Profit", f"KES {total_profit:,.0f}", delta=f"{(total_profit/total_sales*100):.1f}% margin")
+            
+            with col3:
+                st.metric("🧾 Transactions", f"{overview['total_transactions']:,}", delta="+8.3% growth")
+            
+            with col4:
+                st.metric("🛒 Avg Basket", f"KES {overview['avg_basket']:,.0f}", delta="+5.2%")
+            
+            with col5:
+                st.metric("📱 M-Pesa %", f"{overview['mpesa_pct']:.1f}%", delta="Target: 75%")
+        
+        def show_kpi_estimates():
+            t0 = datetime.now()
+            estimate = overview_sample.kpis(**sidebar_filters)
+            col1, col2, col3, col4, col5 = st.columns(5)
+            for col, label, measure, fmt in [
+                (col1, "💰 Total Sales", 'Sales', "KES {:,.0f}"),
+                (col2, "📈 Total Profit", 'Profit', "KES {:,.0f}"),
+                (col3, "🧾 Transactions", 'Transactions', "{:,.0f}"),
+                (col4, "🛒 Avg Basket", 'AvgBasket', "KES {:,.0f}"),
+                (col5, "📱 M-Pesa %", 'MpesaPct', "{:.1f}%"),
+            ]:
+                value, margin = estimate.loc[measure]
+                with col:
+                    st.metric(label, f"≈ {fmt.format(value)}", delta=f"± {fmt.format(margin)}", delta_color="off")
+            elapsed_ms = (datetime.now() - t0).total_seconds() * 1000
+            st.caption(f"⏳ Estimated from {len(overview_sample):,} sampled baskets in {elapsed_ms:.0f} ms "
+                       f"(± is a 95% margin); refining to exact values...")
+        
+        progressive_section(show_kpis, show_kpi_estimates)
         
         st.markdown("---")
         
-        # Alerts Section
+        # Alerts Section: rules breaching on the latest day, from the alert engine
         st.markdown("### 🚨 Live Alerts")
         alert_col1, alert_col2, alert_col3 = st.columns(3)
         
-        # Low stock alert
-        low_stock = inventory_df[inventory_df['StockStatus'].isin(['Critical', 'Low'])]
+        alert_engine = build_alert_engine(df, datasets['receipts'])
+        active_alerts = alert_engine.active()
+        stock_alerts = active_alerts[active_alerts['Metric'].isin(list(alerts.STOCK_METRICS))]
+        sales_alerts = active_alerts[~active_alerts['Metric'].isin(list(alerts.STOCK_METRICS))]
         expiring_soon = inventory_df[inventory_df['DaysToExpiry'] <= 30]
         
+        def alert_box(active: pd.DataFrame) -> str:
+            """The most severe active alert, plus how many others are active."""
+            top = active.sort_values('Severity', key=lambda s: s.map(alerts.SEVERITIES.index), kind='mergesort').iloc[0]
+            others = f" (+{len(active) - 1} more)" if len(active) > 1 else ""
+            return (f'<div class="alert-{top["Severity"]}">'
+                    f'{"⚠️" if top["Severity"] == "critical" else "🔔"} {top["Severity"].upper()}: '
+                    f'{top["Name"]} at {top["ScopeValue"]} ({top["Metric"]} {top["Value"]:,.1f} '
+                    f'{top["Operator"]} {top["Threshold"]:,.1f}){others}</div>')
+        
         with alert_col1:
-            if len(low_stock[low_stock['StockStatus'] == 'Critical']) > 0:
-                st.markdown(f"""
-                <div class="alert-critical">
-                    ⚠️ CRITICAL: {len(low_stock[low_stock['StockStatus'] == 'Critical'])} products need immediate restock!
-                </div>
-                """, unsafe_allow_html=True)
+            if len(stock_alerts) > 0:
+                st.markdown(alert_box(stock_alerts), unsafe_allow_html=True)
             else:
                 st.markdown("""
                 <div class="alert-success">
@@ -781,15 +795,11 @@ def main():
                 """, unsafe_allow_html=True)
         
         with alert_col3:
-            # Check for fraud
-            void_rate = (df['Voided'] == 'Yes').sum() / len(df) * 100
-            if void_rate > 5:
-                st.markdown(f"""
-                <div class="alert-critical">
-                    🚨 HIGH VOID RATE: {void_rate:.1f}% - Investigate immediately!
-                </div>
-                """, unsafe_allow_html=True)
+            # Void, discount and loss-making sales rules
+            if len(sales_alerts) > 0:
+                st.markdown(alert_box(sales_alerts), unsafe_allow_html=True)
             else:
+                void_rate = (df['Voided'] == 'Yes').sum() / len(df) * 100
                 st.markdown(f"""
                 <div class="alert-success">
                     ✅ Void rate normal: {void_rate:.1f}%
@@ -799,74 +809,117 @@ def main():
         st.markdown("---")
         
         # Charts Row
-        chart_col1, chart_col2 = st.columns(2)
-        
-        with chart_col1:
-            st.markdown("#### 📊 Sales Trend (Last 30 Days)")
-            daily_sales = filtered_df.groupby(filtered_df['Date'].dt.date)['TotalPriceKES'].sum().tail(30).reset_index()
-            daily_sales.columns = ['Date', 'Sales']
+        def show_charts(overview: Dict):
+            chart_col1, chart_col2 = st.columns(2)
+            daily_sales = overview['daily_sales']
+            payment_dist = overview['payment_dist']
             
-            fig = px.area(daily_sales, x='Date', y='Sales', 
-                         color_discrete_sequence=['#006600'])
-            fig.update_layout(
-                margin=dict(l=0, r=0, t=10, b=0),
-                height=300,
-                xaxis_title="",
-                yaxis_title="Sales (KES)",
-                showlegend=False
-            )
-            fig.update_traces(fill='tozeroy', line=dict(width=2))
-            st.plotly_chart(fig, use_container_width=True)
-        
-        with chart_col2:
-            st.markdown("#### 💳 Payment Methods")
-            payment_dist = filtered_df.groupby('PaymentType')['TotalPriceKES'].sum().reset_index()
+            with chart_col1:
+                st.markdown("#### 📊 Sales Trend (Last 30 Days)")
+                
+                def build_sales_trend():
+                    fig = px.area(daily_sales, x='Date', y='Sales', 
+                                 color_discrete_sequence=['#006600'])
+                    fig.update_layout(
+                        margin=dict(l=0, r=0, t=10, b=0),
+                        height=300,
+                        xaxis_title="",
+                        yaxis_title="Sales (KES)",
+                        showlegend=False
+                    )
+                    fig.update_traces(fill='tozeroy', line=dict(width=2))
+                    return fig
+                st.plotly_chart(cached_figure('sales_trend', daily_sales, build_sales_trend), use_container_width=True)
             
-            fig = px.pie(payment_dist, values='TotalPriceKES', names='PaymentType',
-                        color_discrete_sequence=['#006600', '#28a745', '#ffc107', '#17a2b8'],
-                        hole=0.4)
-            fig.update_layout(
-                margin=dict(l=0, r=0, t=10, b=0),
-                height=300
-            )
-            st.plotly_chart(fig, use_container_width=True)
+            with chart_col2:
+                st.markdown("#### 💳 Payment Methods")
+                
+                def build_payment_methods():
+                    fig = px.pie(payment_dist, values='TotalPriceKES', names='PaymentType',
+                                color_discrete_sequence=['#006600', '#28a745', '#ffc107', '#17a2b8'],
+                                hole=0.4)
+                    fig.update_layout(
+                        margin=dict(l=0, r=0, t=10, b=0),
+                        height=300
+                    )
+                    return fig
+                st.plotly_chart(cached_figure('payment_methods', payment_dist, build_payment_methods), use_container_width=True)
+        
+        def show_chart_estimates():
+            chart_col1, chart_col2 = st.columns(2)
+            approx_daily = overview_sample.daily('Sales', **sidebar_filters).tail(30)
+            approx_payment = overview_sample.by('PaymentType', 'Sales', **sidebar_filters)
+            
+            with chart_col1:
+                st.markdown("#### 📊 Sales Trend (Last 30 Days)")
+                
+                def build_approx_trend():
+                    fig = go.Figure([
+                        go.Scatter(x=approx_daily['Date'], y=approx_daily['Sales'] + approx_daily['Margin'],
+                                   mode='lines', line=dict(width=0), hoverinfo='skip'),
+                        go.Scatter(x=approx_daily['Date'], y=(approx_daily['Sales'] - approx_daily['Margin']).clip(lower=0),
+                                   mode='lines', line=dict(width=0), fill='tonexty',
+                                   fillcolor='rgba(0, 102, 0, 0.15)', hoverinfo='skip'),
+                        go.Scatter(x=approx_daily['Date'], y=approx_daily['Sales'], mode='lines',
+                                   line=dict(color='#006600', width=2, dash='dot')),
+                    ])
+                    fig.update_layout(margin=dict(l=0, r=0, t=10, b=0), height=300, xaxis_title="",
+                                      yaxis_title="Sales (KES, estimate)", showlegend=False)
+                    return fig
+                st.plotly_chart(cached_figure('sales_trend_estimate', approx_daily, build_approx_trend),
+                                use_container_width=True)
+            
+            with chart_col2:
+                st.markdown("#### 💳 Payment Methods")
+                
+                def build_approx_payment():
+                    fig = px.bar(approx_payment, x='PaymentType', y='Sales', error_y='Margin', color='PaymentType',
+                                 color_discrete_sequence=['#006600', '#28a745', '#ffc107', '#17a2b8'])
+                    fig.update_layout(margin=dict(l=0, r=0, t=10, b=0), height=300, xaxis_title="",
+                                      yaxis_title="Sales (KES, estimate)", showlegend=False)
+                    return fig
+                st.plotly_chart(cached_figure('payment_methods_estimate', approx_payment, build_approx_payment),
+                                use_container_width=True)
+        
+        progressive_section(show_charts, show_chart_estimates)
+        filtered_df = filtered_view()
         
         # Bottom Row
         bottom_col1, bottom_col2 = st.columns(2)
         
         with bottom_col1:
             st.markdown("#### 🏆 Top 5 Products Today")
-            top_products = filtered_df.groupby('ItemName').agg({
-                'Quantity': 'sum',
-                'TotalPriceKES': 'sum',
-                'ProfitKES': 'sum'
-            }).nlargest(5, 'TotalPriceKES').reset_index()
+            top_products = rank_products(5)
             
-            fig = px.bar(top_products, x='TotalPriceKES', y='ItemName', orientation='h',
-                        color_discrete_sequence=['#006600'])
-            fig.update_layout(
-                margin=dict(l=0, r=0, t=10, b=0),
-                height=250,
-                yaxis_title="",
-                xaxis_title="Sales (KES)"
-            )
-            st.plotly_chart(fig, use_container_width=True)
+            def build_top_products_today():
+                fig = px.bar(top_products, x='TotalPriceKES', y='ItemName', orientation='h',
+                            color_discrete_sequence=['#006600'])
+                fig.update_layout(
+                    margin=dict(l=0, r=0, t=10, b=0),
+                    height=250,
+                    yaxis_title="",
+                    xaxis_title="Sales (KES)"
+                )
+                return fig
+            st.plotly_chart(cached_figure('top_products_today', top_products, build_top_products_today), use_container_width=True)
         
         with bottom_col2:
             st.markdown("#### 🏪 Sales by Branch")
-            branch_sales = filtered_df.groupby('OutletName')['TotalPriceKES'].sum().reset_index()
+            branch_sales = sales_totals(['OutletName'])
             
-            fig = px.bar(branch_sales, x='OutletName', y='TotalPriceKES',
-                        color='OutletName',
-                        color_discrete_sequence=['#006600', '#28a745', '#90EE90'])
-            fig.update_layout(
-                margin=dict(l=0, r=0, t=10, b=0),
-                height=250,
-                xaxis_title="",
-                yaxis_title="Sales (KES)",
-                showlegend=False
-            )
-            st.plotly_chart(fig, use_container_width=True)
+            def build_sales_by_branch():
+                fig = px.bar(branch_sales, x='OutletName', y='TotalPriceKES',
+                            color='OutletName',
+                            color_discrete_sequence=['#006600', '#28a745', '#90EE90'])
+                fig.update_layout(
+                    margin=dict(l=0, r=0, t=10, b=0),
+                    height=250,
+                    xaxis_title="",
+                    yaxis_title="Sales (KES)",
+                    showlegend=False
+                )
+                return fig
+            st.plotly_chart(cached_figure('sales_by_branch', branch_sales, build_sales_by_branch), use_container_width=True)
     
     # ========== TAB 2: SALES ANALYTICS ==========
     with tab2:
@@ -883,40 +936,40 @@ def main():
         
         if time_view == "Hourly":
             st.markdown("#### ⏰ Sales by Hour")
-            hourly_sales = filtered_df.groupby('Hour').agg({
-                'TotalPriceKES': 'sum',
-                'TransactionID': 'count',
-                'ProfitKES': 'sum'
-            }).reset_index()
+            hourly_sales = sales_totals(['Hour'])[['Hour', 'TotalPriceKES', 'TransactionID', 'ProfitKES']]
             hourly_sales.columns = ['Hour', 'Sales', 'Transactions', 'Profit']
             
             col1, col2 = st.columns(2)
             
             with col1:
-                fig = px.bar(hourly_sales, x='Hour', y='Sales',
-                            color='Sales',
-                            color_continuous_scale=['#90EE90', '#006600'])
-                fig.update_layout(
-                    margin=dict(l=0, r=0, t=30, b=0),
-                    height=400,
-                    title="Sales by Hour",
-                    xaxis_title="Hour of Day",
-                    yaxis_title="Sales (KES)"
-                )
-                st.plotly_chart(fig, use_container_width=True)
+                def build_sales_by_hour():
+                    fig = px.bar(hourly_sales, x='Hour', y='Sales',
+                                color='Sales',
+                                color_continuous_scale=['#90EE90', '#006600'])
+                    fig.update_layout(
+                        margin=dict(l=0, r=0, t=30, b=0),
+                        height=400,
+                        title="Sales by Hour",
+                        xaxis_title="Hour of Day",
+                        yaxis_title="Sales (KES)"
+                    )
+                    return fig
+                st.plotly_chart(cached_figure('sales_by_hour', hourly_sales, build_sales_by_hour), use_container_width=True)
             
             with col2:
-                fig = px.line(hourly_sales, x='Hour', y='Transactions',
-                             color_discrete_sequence=['#006600'],
-                             markers=True)
-                fig.update_layout(
-                    margin=dict(l=0, r=0, t=30, b=0),
-                    height=400,
-                    title="Transactions by Hour",
-                    xaxis_title="Hour of Day",
-                    yaxis_title="Number of Transactions"
-                )
-                st.plotly_chart(fig, use_container_width=True)
+                def build_transactions_by_hour():
+                    fig = px.line(hourly_sales, x='Hour', y='Transactions',
+                                 color_discrete_sequence=['#006600'],
+                                 markers=True)
+                    fig.update_layout(
+                        margin=dict(l=0, r=0, t=30, b=0),
+                        height=400,
+                        title="Transactions by Hour",
+                        xaxis_title="Hour of Day",
+                        yaxis_title="Number of Transactions"
+                    )
+                    return fig
+                st.plotly_chart(cached_figure('transactions_by_hour', hourly_sales, build_transactions_by_hour), use_container_width=True)
             
             # Peak Hours Analysis
             st.markdown("#### 🔥 Peak Hours Analysis")
@@ -953,37 +1006,37 @@ def main():
         
         elif time_view == "Daily":
             st.markdown("#### 📅 Sales by Day of Week")
-            daily_sales = filtered_df.groupby(['DayOfWeek', 'DayName']).agg({
-                'TotalPriceKES': 'sum',
-                'TransactionID': 'count',
-                'ProfitKES': 'sum'
-            }).reset_index()
+            daily_sales = sales_totals(['DayOfWeek', 'DayName'])
             daily_sales = daily_sales.sort_values('DayOfWeek')
             
             col1, col2 = st.columns(2)
             
             with col1:
-                fig = px.bar(daily_sales, x='DayName', y='TotalPriceKES',
-                            color='TotalPriceKES',
-                            color_continuous_scale=['#90EE90', '#006600'])
-                fig.update_layout(
-                    margin=dict(l=0, r=0, t=30, b=0),
-                    height=400,
-                    title="Sales by Day of Week",
-                    xaxis_title="",
-                    yaxis_title="Sales (KES)"
-                )
-                st.plotly_chart(fig, use_container_width=True)
+                def build_sales_by_weekday():
+                    fig = px.bar(daily_sales, x='DayName', y='TotalPriceKES',
+                                color='TotalPriceKES',
+                                color_continuous_scale=['#90EE90', '#006600'])
+                    fig.update_layout(
+                        margin=dict(l=0, r=0, t=30, b=0),
+                        height=400,
+                        title="Sales by Day of Week",
+                        xaxis_title="",
+                        yaxis_title="Sales (KES)"
+                    )
+                    return fig
+                st.plotly_chart(cached_figure('sales_by_weekday', daily_sales, build_sales_by_weekday), use_container_width=True)
             
             with col2:
-                fig = px.pie(daily_sales, values='TotalPriceKES', names='DayName',
-                            color_discrete_sequence=px.colors.sequential.Greens)
-                fig.update_layout(
-                    margin=dict(l=0, r=0, t=30, b=0),
-                    height=400,
-                    title="Sales Distribution by Day"
-                )
-                st.plotly_chart(fig, use_container_width=True)
+                def build_weekday_share():
+                    fig = px.pie(daily_sales, values='TotalPriceKES', names='DayName',
+                                color_discrete_sequence=px.colors.sequential.Greens)
+                    fig.update_layout(
+                        margin=dict(l=0, r=0, t=30, b=0),
+                        height=400,
+                        title="Sales Distribution by Day"
+                    )
+                    return fig
+                st.plotly_chart(cached_figure('weekday_share', daily_sales, build_weekday_share), use_container_width=True)
             
             # Best/Worst Days
             best_day = daily_sales.loc[daily_sales['TotalPriceKES'].idxmax()]
@@ -997,25 +1050,23 @@ def main():
         
         elif time_view == "Weekly":
             st.markdown("#### 📆 Sales by Week")
-            weekly_sales = filtered_df.groupby('WeekNumber').agg({
-                'TotalPriceKES': 'sum',
-                'TransactionID': 'count',
-                'ProfitKES': 'sum'
-            }).reset_index()
+            weekly_sales = sales_totals(['WeekNumber'])
             
-            fig = px.line(weekly_sales, x='WeekNumber', y='TotalPriceKES',
-                         color_discrete_sequence=['#006600'],
-                         markers=True)
-            fig.add_scatter(x=weekly_sales['WeekNumber'], y=weekly_sales['ProfitKES'],
-                           mode='lines+markers', name='Profit', line=dict(color='#ffc107'))
-            fig.update_layout(
-                margin=dict(l=0, r=0, t=30, b=0),
-                height=400,
-                title="Weekly Sales & Profit Trend",
-                xaxis_title="Week Number",
-                yaxis_title="Amount (KES)"
-            )
-            st.plotly_chart(fig, use_container_width=True)
+            def build_weekly_trend():
+                fig = px.line(weekly_sales, x='WeekNumber', y='TotalPriceKES',
+                             color_discrete_sequence=['#006600'],
+                             markers=True)
+                fig.add_scatter(x=weekly_sales['WeekNumber'], y=weekly_sales['ProfitKES'],
+                               mode='lines+markers', name='Profit', line=dict(color='#ffc107'))
+                fig.update_layout(
+                    margin=dict(l=0, r=0, t=30, b=0),
+                    height=400,
+                    title="Weekly Sales & Profit Trend",
+                    xaxis_title="Week Number",
+                    yaxis_title="Amount (KES)"
+                )
+                return fig
+            st.plotly_chart(cached_figure('weekly_trend', weekly_sales, build_weekly_trend), use_container_width=True)
             
             # Weekly Stats
             col1, col2, col3 = st.columns(3)
@@ -1028,55 +1079,46 @@ def main():
         
         else:  # Monthly
             st.markdown("#### 📊 Sales by Month")
-            monthly_sales = filtered_df.groupby(['MonthNum', 'Month']).agg({
-                'TotalPriceKES': 'sum',
-                'TransactionID': 'count',
-                'ProfitKES': 'sum'
-            }).reset_index()
+            monthly_sales = sales_totals(['MonthNum', 'Month'])
             monthly_sales = monthly_sales.sort_values('MonthNum')
             
-            fig = go.Figure()
-            fig.add_trace(go.Bar(
-                x=monthly_sales['Month'],
-                y=monthly_sales['TotalPriceKES'],
-                name='Sales',
-                marker_color='#006600'
-            ))
-            fig.add_trace(go.Scatter(
-                x=monthly_sales['Month'],
-                y=monthly_sales['ProfitKES'],
-                name='Profit',
-                mode='lines+markers',
-                line=dict(color='#ffc107', width=3),
-                yaxis='y2'
-            ))
-            fig.update_layout(
-                margin=dict(l=0, r=0, t=30, b=0),
-                height=400,
-                title="Monthly Sales & Profit",
-                yaxis=dict(title='Sales (KES)'),
-                yaxis2=dict(title='Profit (KES)', overlaying='y', side='right'),
-                legend=dict(orientation='h', yanchor='bottom', y=1.02)
-            )
-            st.plotly_chart(fig, use_container_width=True)
+            def build_monthly_sales():
+                fig = go.Figure()
+                fig.add_trace(go.Bar(
+                    x=monthly_sales['Month'],
+                    y=monthly_sales['TotalPriceKES'],
+                    name='Sales',
+                    marker_color='#006600'
+                ))
+                fig.add_trace(go.Scatter(
+                    x=monthly_sales['Month'],
+                    y=monthly_sales['ProfitKES'],
+                    name='Profit',
+                    mode='lines+markers',
+                    line=dict(color='#ffc107', width=3),
+                    yaxis='y2'
+                ))
+                fig.update_layout(
+                    margin=dict(l=0, r=0, t=30, b=0),
+                    height=400,
+                    title="Monthly Sales & Profit",
+                    yaxis=dict(title='Sales (KES)'),
+                    yaxis2=dict(title='Profit (KES)', overlaying='y', side='right'),
+                    legend=dict(orientation='h', yanchor='bottom', y=1.02)
+                )
+                return fig
+            st.plotly_chart(cached_figure('monthly_sales', monthly_sales, build_monthly_sales), use_container_width=True)
         
         st.markdown("---")
         
         # Top & Bottom Products
         st.markdown("### 🏆 Product Performance Rankings")
         
-        product_performance = filtered_df.groupby(['ItemCode', 'ItemName', 'Category']).agg({
-            'Quantity': 'sum',
-            'TotalPriceKES': 'sum',
-            'ProfitKES': 'sum'
-        }).reset_index()
-        product_performance['ProfitMargin'] = (product_performance['ProfitKES'] / product_performance['TotalPriceKES'] * 100).round(1)
-        
         col1, col2 = st.columns(2)
         
         with col1:
             st.markdown("#### 🚀 Top 10 Best Sellers")
-            top_10 = product_performance.nlargest(10, 'TotalPriceKES')
+            top_10 = rank_products(10)
             st.dataframe(
                 top_10[['ItemName', 'Category', 'Quantity', 'TotalPriceKES', 'ProfitMargin']].rename(columns={
                     'ItemName': 'Product',
@@ -1090,7 +1132,7 @@ def main():
         
         with col2:
             st.markdown("#### 📉 Bottom 10 Slow Movers")
-            bottom_10 = product_performance.nsmallest(10, 'TotalPriceKES')
+            bottom_10 = rank_products(10, largest=False)
             st.dataframe(
                 bottom_10[['ItemName', 'Category', 'Quantity', 'TotalPriceKES', 'ProfitMargin']].rename(columns={
                     'ItemName': 'Product',
@@ -1101,67 +1143,188 @@ def main():
                 use_container_width=True,
                 hide_index=True
             )
+        
+        st.markdown("---")
+        
+        # Basket Analysis
+        st.markdown("### 🛒 Basket Analysis")
+        
+        basket_df = baskets.build_baskets(filtered_df)
+        basket_stats = baskets.basket_summary(basket_df)
+        
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("Baskets", f"{basket_stats['Baskets']:,}")
+        with col2:
+            st.metric("Avg Basket Value", f"KES {basket_stats['AvgValue']:,.0f}",
+                      delta=f"Median KES {basket_stats['MedianValue']:,.0f}", delta_color="off")
+        with col3:
+            st.metric("Items per Basket", f"{basket_stats['AvgLines']:.2f}")
+        with col4:
+            st.metric("Multi-item Baskets", f"{basket_stats['MultiItemShare']:.1f}%")
+        
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            size_dist = baskets.basket_size_distribution(basket_df)
+            def build_basket_sizes():
+                fig = px.bar(size_dist, x='Lines', y='Baskets',
+                            color='AvgValue',
+                            color_continuous_scale=['#90EE90', '#006600'])
+                fig.update_layout(
+                    margin=dict(l=0, r=0, t=30, b=0),
+                    height=350,
+                    title="Basket Size Distribution",
+                    xaxis_title="Items in Basket",
+                    yaxis_title="Baskets",
+                    coloraxis_colorbar=dict(title="Avg KES")
+                )
+                return fig
+            st.plotly_chart(cached_figure('basket_sizes', size_dist, build_basket_sizes), use_container_width=True)
+        
+        with col2:
+            value_dist = baskets.basket_value_distribution(basket_df)
+            value_dist['Range'] = value_dist['From'].map('{:,.0f}'.format) + '-' + value_dist['To'].map('{:,.0f}'.format)
+            def build_basket_values():
+                fig = px.bar(value_dist, x='Range', y='Baskets',
+                            color_discrete_sequence=['#006600'])
+                fig.update_layout(
+                    margin=dict(l=0, r=0, t=30, b=0),
+                    height=350,
+                    title="Basket Value Distribution",
+                    xaxis_title="Basket Value (KES)",
+                    yaxis_title="Baskets"
+                )
+                return fig
+            st.plotly_chart(cached_figure('basket_values', value_dist, build_basket_values), use_container_width=True)
+        
+        st.markdown("#### 🔗 Frequently Bought Together")
+        rules = baskets.association_rules(filtered_df)
+        if len(rules) > 0:
+            st.dataframe(
+                rules.head(20).assign(
+                    Support=(rules['Support'].head(20) * 100).round(2),
+                    Confidence=(rules['Confidence'].head(20) * 100).round(1),
+                    Lift=rules['Lift'].head(20).round(2)
+                ).rename(columns={
+                    'Antecedent': 'If Customer Buys',
+                    'Consequent': 'Also Buys',
+                    'Support': 'Support %',
+                    'Confidence': 'Confidence %'
+                }),
+                use_container_width=True,
+                hide_index=True
+            )
+        else:
+            st.info("Not enough multi-item baskets in the current selection to mine product pairs.")
+        
+        st.markdown("---")
+        
+        # Approximate metrics merged from per-(day, outlet) sketches
+        st.markdown("### ⚡ Fast Approximate Metrics")
+        st.caption("Answered from mergeable sketches kept per day and outlet, so only the date and branch filters apply. "
+                   "Distinct counts ±1.6% (1 std. error); basket-value percentiles via t-digest, discount percentiles exact; "
+                   "item units never undercount and overcount by at most the bound shown (99% confidence).")
+        
+        sketch_index = build_sketch_index(sales_df)
+        sketch_filters = dict(date_range=date_range, outlets=outlets)
+        sketch_start = datetime.now()
+        sketch_stats = sketch_index.summary(**sketch_filters)
+        heavy_hitters = sketch_index.heavy_hitters(10, **sketch_filters)
+        sketch_ms = (datetime.now() - sketch_start).total_seconds() * 1000
+        
+        col1, col2, col3, col4, col5 = st.columns(5)
+        with col1:
+            st.metric("≈ Baskets", f"{sketch_stats['Baskets']:,.0f}")
+        with col2:
+            st.metric("≈ Distinct Items", f"{sketch_stats['Items']:,.0f}")
+        with col3:
+            st.metric("Basket Value p50", f"KES {sketch_stats['BasketValueP50']:,.0f}"
+                      if pd.notna(sketch_stats['BasketValueP50']) else "N/A")
+        with col4:
+            st.metric("Basket Value p90 / p99",
+                      f"KES {sketch_stats['BasketValueP90']:,.0f} / {sketch_stats['BasketValueP99']:,.0f}"
+                      if pd.notna(sketch_stats['BasketValueP90']) else "N/A")
+        with col5:
+            st.metric("Discount p90", f"{sketch_stats['DiscountP90']:.0f}%"
+                      if pd.notna(sketch_stats['DiscountP90']) else "N/A")
+        
+        st.markdown(f"**🔥 Heavy Hitters by Units** <span style='color: #666;'>({sketch_ms:.0f} ms)</span>",
+                    unsafe_allow_html=True)
+        st.dataframe(
+            heavy_hitters[['ItemName', 'Category', 'Units', 'MaxOvercount']].rename(columns={
+                'ItemName': 'Product',
+                'Units': '≈ Units',
+                'MaxOvercount': 'Max Overcount'
+            }),
+            use_container_width=True,
+            hide_index=True
+        )
+        
+        st.markdown("---")
+        
+        # Revenue given away in discounts, from a cube over day x outlet x cashier x customer type x SKU
+        st.markdown("### 🏷️ Discount Leakage")
+        st.caption("Forgone revenue is list price minus realized price. Date, outlet and category filters apply.")
+        discount_cube = build_discount_cube(sales_df)
+        leak_selection = {'OutletName': outlets, 'Category': categories}
+        leak_totals = discount_cube.totals(date_range, leak_selection)
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("💸 Forgone Revenue", f"KES {leak_totals['ForgoneKES']:,.0f}")
+        with col2:
+            st.metric("📉 Leakage", f"{leak_totals['LeakagePct']:.2f}% of list")
+        with col3:
+            st.metric("🏷️ Discounted Lines", f"{leak_totals['DiscountedLines']:,.0f}",
+                      delta=f"{leak_totals['DiscountedLines'] / max(leak_totals['Lines'], 1) * 100:.1f}% of lines",
+                      delta_color="off")
+        
+        leak_labels = {'Cashier': 'Cashier', 'CustomerType': 'Customer Type', 'ItemName': 'SKU',
+                       'Category': 'Category', 'OutletName': 'Outlet', 'Day': 'Day', 'Week': 'Week',
+                       'Month': 'Month'}
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            leak_by = st.selectbox("Break down by", discounts.DIMENSIONS, format_func=leak_labels.get,
+                                   key="leak_by")
+        leakage = discount_cube.leakage(leak_by, date_range, leak_selection)
+        with col2:
+            leak_value = st.selectbox(f"Drill into {leak_labels[leak_by].lower()}",
+                                      ['(none)'] + leakage[leak_by].head(50).tolist(), key="leak_value")
+        with col3:
+            leak_then = st.selectbox("Then by", [d for d in discounts.DIMENSIONS if d != leak_by],
+                                     format_func=leak_labels.get, key="leak_then")
+        
+        def build_leakage_chart():
+            top = leakage.head(15)
+            fig = px.bar(top, x=top[leak_by].astype(str), y='ForgoneKES', color='LeakagePct',
+                         color_continuous_scale=['#ffbb33', '#cc0000'],
+                         hover_data={'ListKES': ':,.0f', 'DiscountedLines': True})
+            fig.update_layout(margin=dict(l=0, r=0, t=30, b=0), height=350,
+                              title=f"Forgone Revenue by {leak_labels[leak_by]}",
+                              xaxis_title="", yaxis_title="Forgone (KES)", coloraxis_colorbar_title="Leakage %")
+            return fig
+        st.plotly_chart(cached_figure('discount_leakage', leakage.head(15), build_leakage_chart),
+                        use_container_width=True)
+        
+        if leak_value != '(none)':
+            drill = discount_cube.leakage(leak_then, date_range, {**leak_selection, leak_by: [leak_value]})
+            st.markdown(f"**{leak_value}** by {leak_labels[leak_then].lower()}")
+            st.dataframe(drill.head(100), use_container_width=True, hide_index=True)
+        else:
+            st.dataframe(leakage.head(100), use_container_width=True, hide_index=True)
     
     # ========== TAB 3: EMPLOYEE PERFORMANCE ==========
     with tab3:
         st.markdown("### 👥 Employee Performance Dashboard")
         
         # Employee Rankings
-        employee_stats = filtered_df.groupby(['CashierID', 'CashierName', 'OutletName']).agg({
-            'TotalPriceKES': 'sum',
-            'ProfitKES': 'sum',
-            'TransactionID': 'count',
-            'Quantity': 'sum',
-            'DiscountPercent': 'mean'
-        }).reset_index()
-        employee_stats.columns = ['CashierID', 'Name', 'Branch', 'Sales', 'Profit', 'Transactions', 'Units', 'AvgDiscount']
-        employee_stats['AvgTransaction'] = (employee_stats['Sales'] / employee_stats['Transactions']).round(0)
-        employee_stats['SalesRank'] = employee_stats['Sales'].rank(ascending=False).astype(int)
-        employee_stats = employee_stats.sort_values('Sales', ascending=False)
+        employee_stats = cached('employee_stats', lambda: query_backend.employee_performance(**sidebar_filters)
+                                if query_backend is not None else analytics.employee_performance(filtered_df))
         
         # Top Performers
         st.markdown("#### 🏆 Employee Rankings by Sales")
         
-        col1, col2, col3 = st.columns(3)
-        
-        if len(employee_stats) >= 1:
-            top1 = employee_stats.iloc[0]
-            with col1:
-                st.markdown(f"""
-                <div style="background: linear-gradient(135deg, #FFD700, #FFA500); padding: 1.5rem; border-radius: 15px; text-align: center; color: white;">
-                    <h1 style="margin: 0; font-size: 3rem;">🥇</h1>
-                    <h3 style="margin: 0.5rem 0;">{top1['Name']}</h3>
-                    <p style="margin: 0; font-size: 0.9rem;">{top1['Branch']}</p>
-                    <h2 style="margin: 0.5rem 0;">KES {top1['Sales']:,.0f}</h2>
-                    <p style="margin: 0;">{top1['Transactions']} transactions</p>
-                </div>
-                """, unsafe_allow_html=True)
-        
-        if len(employee_stats) >= 2:
-            top2 = employee_stats.iloc[1]
-            with col2:
-                st.markdown(f"""
-                <div style="background: linear-gradient(135deg, #C0C0C0, #A0A0A0); padding: 1.5rem; border-radius: 15px; text-align: center; color: white;">
-                    <h1 style="margin: 0; font-size: 3rem;">🥈</h1>
-                    <h3 style="margin: 0.5rem 0;">{top2['Name']}</h3>
-                    <p style="margin: 0; font-size: 0.9rem;">{top2['Branch']}</p>
-                    <h2 style="margin: 0.5rem 0;">KES {top2['Sales']:,.0f}</h2>
-                    <p style="margin: 0;">{top2['Transactions']} transactions</p>
-                </div>
-                """, unsafe_allow_html=True)
-        
-        if len(employee_stats) >= 3:
-            top3 = employee_stats.iloc[2]
-            with col3:
-                st.markdown(f"""
-                <div style="background: linear-gradient(135deg, #CD7F32, #8B4513); padding: 1.5rem; border-radius: 15px; text-align: center; color: white;">
-                    <h1 style="margin: 0; font-size: 3rem;">🥉</h1>
-                    <h3 style="margin: 0.5rem 0;">{top3['Name']}</h3>
-                    <p style="margin: 0; font-size: 0.9rem;">{top3['Branch']}</p>
-                    <h2 style="margin: 0.5rem 0;">KES {top3['Sales']:,.0f}</h2>
-                    <p style="margin: 0;">{top3['Transactions']} transactions</p>
-                </div>
-                """, unsafe_allow_html=True)
+        st.markdown(cards.grid(cards.podium_cards(employee_stats), 3), unsafe_allow_html=True)
         
         st.markdown("---")
         
@@ -1193,10 +1356,11 @@ def main():
         attendance_summary = login_filtered.groupby(['CashierID', 'CashierName', 'OutletName']).agg({
             'Status': lambda x: (x == 'Present').sum(),
             'IsLate': 'sum',
-            'HoursWorked': 'sum'
+            'HoursWorked': 'sum',
+            'Date': 'count'
         }).reset_index()
-        attendance_summary.columns = ['CashierID', 'Name', 'Branch', 'DaysPresent', 'DaysLate', 'TotalHours']
-        attendance_summary['AttendanceRate'] = (attendance_summary['DaysPresent'] / 180 * 100).round(1)
+        attendance_summary.columns = ['CashierID', 'Name', 'Branch', 'DaysPresent', 'DaysLate', 'TotalHours', 'DaysRostered']
+        attendance_summary['AttendanceRate'] = (attendance_summary['DaysPresent'] / attendance_summary['DaysRostered'] * 100).round(1)
         attendance_summary['PunctualityRate'] = ((attendance_summary['DaysPresent'] - attendance_summary['DaysLate']) / attendance_summary['DaysPresent'] * 100).round(1)
         
         col1, col2 = st.columns(2)
@@ -1217,37 +1381,87 @@ def main():
             st.markdown("**Today's Status**")
             today_status = login_filtered[login_filtered['Date'] == login_filtered['Date'].max()]
             
-            for _, emp in today_status.iterrows():
-                status_class = "status-online" if emp['Status'] == 'Present' else "status-offline"
-                login_time = emp['LoginTime'].strftime('%H:%M') if pd.notna(emp['LoginTime']) else 'N/A'
-                st.markdown(f"""
-                <div class="rank-card">
-                    <div>
-                        <strong>{emp['CashierName']}</strong> ({emp['OutletName']})<br>
-                        <span class="{status_class}">● {emp['Status']}</span>
-                        {f" | Login: {login_time}" if emp['Status'] == 'Present' else ""}
-                        {" | ⚠️ LATE" if emp['IsLate'] else ""}
-                    </div>
-                </div>
-                """, unsafe_allow_html=True)
+            card_section('today_status', today_status, cards.status_cards, page_size=20)
+        
+        st.markdown("---")
+        
+        # Productivity: baskets joined to the attendance interval they were rung in
+        st.markdown("#### ⏱️ Productivity: Sales per Hour Worked")
+        
+        # Hours worked cover every basket rung in them, so only the date, outlet and employee selection
+        # applies here; category, hour or payment filters would leave false idle gaps
+        productivity_filters = {name: sidebar_filters[name] for name in ['date_range', 'outlets', 'employees']
+                                if name in sidebar_filters}
+        
+        def compute_productivity() -> Dict:
+            shift_logins = login_filtered[login_filtered['OutletName'].isin(outlets)]
+            if len(date_range) == 2:
+                shift_logins = shift_logins[(shift_logins['Date'] >= date_range[0]) & (shift_logins['Date'] <= date_range[1])]
+            shift_sales = analytics.filter_transactions(sales_df, **productivity_filters)
+            return productivity.cashier_productivity(shift_sales, shift_logins)
+        
+        productivity_stats = cached('productivity', compute_productivity,
+                                    key=result_cache.filter_key(dataset=dataset_key, **productivity_filters))
+        cashier_productivity = productivity_stats['cashier']
+        off_shift = productivity_stats['off_shift']
+        
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            total_hours = cashier_productivity['HoursWorked'].sum()
+            st.metric("Sales per Hour Worked",
+                      f"KES {cashier_productivity['OnShiftSales'].sum() / total_hours:,.0f}" if total_hours > 0 else "N/A",
+                      delta=f"{total_hours:,.0f} hours logged", delta_color="off")
+        with col2:
+            st.metric("Sales While Logged Out", f"KES {off_shift['Value'].sum():,.0f}",
+                      delta=f"{len(off_shift):,} transactions", delta_color="inverse" if len(off_shift) > 0 else "off")
+        with col3:
+            idle_rate = cashier_productivity['IdleHours'].sum() / total_hours * 100 if total_hours > 0 else 0
+            st.metric("Idle Time", f"{idle_rate:.1f}%",
+                      delta=f"gaps over {productivity.IDLE_GAP.seconds // 60} min", delta_color="off")
+        
+        st.dataframe(
+            cashier_productivity[['CashierName', 'OutletName', 'Shifts', 'HoursWorked', 'SalesPerHour',
+                                  'OffShiftBaskets', 'OffShiftRate', 'OffShiftSales', 'IdleRate']].rename(columns={
+                'CashierName': 'Name',
+                'OutletName': 'Branch',
+                'HoursWorked': 'Hours',
+                'SalesPerHour': 'KES / Hour',
+                'OffShiftBaskets': 'Logged-out Txns',
+                'OffShiftRate': 'Logged-out %',
+                'OffShiftSales': 'Logged-out Sales',
+                'IdleRate': 'Idle %'
+            }).round({'Hours': 1}),
+            use_container_width=True,
+            hide_index=True
+        )
+        
+        if len(off_shift) > 0:
+            with st.expander(f"🔍 Transactions rung while the cashier was logged out ({len(off_shift):,})"):
+                st.dataframe(
+                    off_shift.rename(columns={'OutletName': 'Branch', 'CashierName': 'Cashier', 'Value': 'Value (KES)'}),
+                    use_container_width=True,
+                    hide_index=True
+                )
         
         st.markdown("---")
         
         # Performance Comparison Chart
         st.markdown("#### 📈 Employee Sales Comparison")
         
-        fig = px.bar(employee_stats.sort_values('Sales', ascending=True), 
-                    x='Sales', y='Name', orientation='h',
-                    color='Branch',
-                    color_discrete_sequence=['#006600', '#28a745', '#90EE90'])
-        fig.update_layout(
-            margin=dict(l=0, r=0, t=30, b=0),
-            height=400,
-            title="Sales by Employee",
-            xaxis_title="Sales (KES)",
-            yaxis_title=""
-        )
-        st.plotly_chart(fig, use_container_width=True)
+        def build_employee_sales():
+            fig = px.bar(employee_stats.sort_values('Sales', ascending=True), 
+                        x='Sales', y='Name', orientation='h',
+                        color='Branch',
+                        color_discrete_sequence=['#006600', '#28a745', '#90EE90'])
+            fig.update_layout(
+                margin=dict(l=0, r=0, t=30, b=0),
+                height=400,
+                title="Sales by Employee",
+                xaxis_title="Sales (KES)",
+                yaxis_title=""
+            )
+            return fig
+        st.plotly_chart(cached_figure('employee_sales', employee_stats, build_employee_sales), use_container_width=True)
     
     # ========== TAB 4: INVENTORY ==========
     with tab4:
@@ -1281,32 +1495,36 @@ def main():
             status_counts = inventory_df['StockStatus'].value_counts().reset_index()
             status_counts.columns = ['Status', 'Count']
             
-            fig = px.pie(status_counts, values='Count', names='Status',
-                        color='Status',
-                        color_discrete_map={'Good': '#28a745', 'Low': '#ffc107', 'Critical': '#dc3545'},
-                        hole=0.4)
-            fig.update_layout(
-                margin=dict(l=0, r=0, t=30, b=0),
-                height=300,
-                title="Stock Status Distribution"
-            )
-            st.plotly_chart(fig, use_container_width=True)
+            def build_stock_status():
+                fig = px.pie(status_counts, values='Count', names='Status',
+                            color='Status',
+                            color_discrete_map={'Good': '#28a745', 'Low': '#ffc107', 'Critical': '#dc3545'},
+                            hole=0.4)
+                fig.update_layout(
+                    margin=dict(l=0, r=0, t=30, b=0),
+                    height=300,
+                    title="Stock Status Distribution"
+                )
+                return fig
+            st.plotly_chart(cached_figure('stock_status', status_counts, build_stock_status), use_container_width=True)
         
         with col2:
             # Stock by Category
             category_stock = inventory_df.groupby('Category')['StockValue'].sum().reset_index()
             
-            fig = px.bar(category_stock.sort_values('StockValue', ascending=True),
-                        x='StockValue', y='Category', orientation='h',
-                        color_discrete_sequence=['#006600'])
-            fig.update_layout(
-                margin=dict(l=0, r=0, t=30, b=0),
-                height=300,
-                title="Stock Value by Category",
-                xaxis_title="Value (KES)",
-                yaxis_title=""
-            )
-            st.plotly_chart(fig, use_container_width=True)
+            def build_stock_by_category():
+                fig = px.bar(category_stock.sort_values('StockValue', ascending=True),
+                            x='StockValue', y='Category', orientation='h',
+                            color_discrete_sequence=['#006600'])
+                fig.update_layout(
+                    margin=dict(l=0, r=0, t=30, b=0),
+                    height=300,
+                    title="Stock Value by Category",
+                    xaxis_title="Value (KES)",
+                    yaxis_title=""
+                )
+                return fig
+            st.plotly_chart(cached_figure('stock_by_category', category_stock, build_stock_by_category), use_container_width=True)
         
         st.markdown("---")
         
@@ -1392,6 +1610,105 @@ def main():
             use_container_width=True,
             hide_index=True
         )
+        
+        st.markdown("---")
+        
+        # Stock History: point-in-time stock and trends from the stock ledger
+        st.markdown("#### 🕰️ Stock History")
+        
+        ledger = build_stock_ledger(df, datasets['receipts'])
+        as_of = st.date_input(
+            "Stock as of",
+            value=df['Date'].max().date(),
+            min_value=df['Date'].min().date(),
+            max_value=df['Date'].max().date(),
+            key="stock_as_of"
+        )
+        shelf_stock = ledger.stock_as_of(as_of, outlets=outlets)
+        shelf_stock = shelf_stock[shelf_stock['Category'].isin(categories)]
+        
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("📦 Units on Hand", f"{shelf_stock['Stock'].sum():,}")
+        with col2:
+            st.metric("🚫 Empty Shelves", f"{(shelf_stock['Stock'] == 0).sum():,}")
+        with col3:
+            st.metric("🔻 At/Below Reorder", f"{(shelf_stock['Stock'] <= shelf_stock['ReorderLevel']).sum():,}")
+        
+        stock_trend = ledger.stock_trend('D', by='Category', outlets=outlets)
+        stock_trend = stock_trend[stock_trend['Category'].isin(categories)]
+        
+        def build_stock_trend():
+            fig = px.area(stock_trend, x='Date', y='Stock', color='Category')
+            fig.add_vline(x=pd.Timestamp(as_of), line_dash="dash", line_color="#666")
+            fig.update_layout(
+                margin=dict(l=0, r=0, t=30, b=0),
+                height=350,
+                title="Closing Stock by Category (units)",
+                xaxis_title="",
+                yaxis_title="Units"
+            )
+            return fig
+        st.plotly_chart(cached_figure('stock_trend', (stock_trend, str(as_of)), build_stock_trend), use_container_width=True)
+        
+        empty_shelves = shelf_stock[shelf_stock['Stock'] == 0]
+        if len(empty_shelves) > 0:
+            st.dataframe(
+                empty_shelves[['OutletName', 'ItemName', 'Category', 'ReorderLevel', 'MaxStock']].rename(columns={
+                    'OutletName': 'Outlet',
+                    'ItemName': 'Product',
+                    'ReorderLevel': 'Reorder At',
+                    'MaxStock': 'Max'
+                }),
+                use_container_width=True,
+                hide_index=True
+            )
+        else:
+            st.success(f"✅ No empty shelves at close on {as_of:%d %b %Y}")
+        
+        st.markdown("---")
+        
+        # Stock-outs and the sales they cost, estimated over all data and narrowed by the sidebar
+        st.markdown("#### 💸 Stock-outs & Lost Sales")
+        
+        lost_sales = cached('lost_sales', lambda: stockouts.estimate_lost_sales(ledger, sales_df),
+                            key=result_cache.filter_key(dataset=dataset_key))
+        in_view = lost_sales['OutletName'].isin(outlets) & lost_sales['Category'].isin(categories)
+        if len(date_range) == 2:
+            in_view &= ((lost_sales['Start'].dt.date <= date_range[1]) &
+                        (lost_sales['End'].dt.date >= date_range[0]))
+        lost_table = stockouts.lost_revenue_table(lost_sales[in_view])
+        
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("🚫 Stock-outs", f"{in_view.sum():,}")
+        with col2:
+            st.metric("⏳ Shelf-Hours Empty", f"{lost_sales.loc[in_view, 'Hours'].sum():,.0f}")
+        with col3:
+            st.metric("💸 Est. Lost Revenue", f"KES {lost_table['LostRevenueKES'].sum():,.0f}")
+        with col4:
+            st.metric("📉 Est. Lost Profit", f"KES {lost_table['LostProfitKES'].sum():,.0f}")
+        
+        if len(lost_table) > 0:
+            st.dataframe(
+                lost_table.head(50)[['Rank', 'OutletName', 'ItemName', 'Category', 'StockOuts', 'HoursOut',
+                                     'StillOut', 'LostUnits', 'LostRevenueKES', 'LostProfitKES']].rename(columns={
+                    'OutletName': 'Outlet',
+                    'ItemName': 'Product',
+                    'StockOuts': 'Stock-outs',
+                    'HoursOut': 'Hours Empty',
+                    'StillOut': 'Still Out',
+                    'LostUnits': 'Lost Units',
+                    'LostRevenueKES': 'Lost Revenue (KES)',
+                    'LostProfitKES': 'Lost Profit (KES)'
+                }).round(1),
+                use_container_width=True,
+                hide_index=True
+            )
+            st.caption("Lost units = each shelf's in-stock sales rate × the demand expected while it was empty, "
+                       "weighted by the day-of-week × hour sales profile.")
+        else:
+            st.success("✅ No stock-outs in this view!")
     
     # ========== TAB 5: TIME ANALYSIS ==========
     with tab5:
@@ -1400,36 +1717,76 @@ def main():
         # Heatmap: Hour vs Day
         st.markdown("#### 🗓️ Sales Heatmap: Hour vs Day of Week")
         
-        heatmap_data = filtered_df.groupby(['DayName', 'Hour'])['TotalPriceKES'].sum().reset_index()
-        heatmap_pivot = heatmap_data.pivot(index='DayName', columns='Hour', values='TotalPriceKES').fillna(0)
-        
-        # Reorder days
-        day_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-        heatmap_pivot = heatmap_pivot.reindex([d for d in day_order if d in heatmap_pivot.index])
-        
-        fig = px.imshow(heatmap_pivot,
-                       color_continuous_scale='Greens',
-                       aspect='auto')
-        fig.update_layout(
-            margin=dict(l=0, r=0, t=30, b=0),
-            height=400,
-            title="Sales Intensity by Hour and Day",
-            xaxis_title="Hour of Day",
-            yaxis_title=""
+        heatmap_view = st.radio(
+            "Heatmap View",
+            ["Day × Hour", "By Outlet", "Calendar"],
+            horizontal=True
         )
-        st.plotly_chart(fig, use_container_width=True)
+        
+        if heatmap_view == "Day × Hour":
+            heatmap_pivot = sharded.day_hour_matrix(**sidebar_filters) if sharded is not None \
+                else analytics.day_hour_matrix(filtered_df)
+            
+            def build_heatmap_day_hour():
+                fig = px.imshow(heatmap_pivot,
+                               color_continuous_scale='Greens',
+                               aspect='auto')
+                fig.update_layout(
+                    margin=dict(l=0, r=0, t=30, b=0),
+                    height=400,
+                    title="Sales Intensity by Hour and Day",
+                    xaxis_title="Hour of Day",
+                    yaxis_title=""
+                )
+                return fig
+            st.plotly_chart(cached_figure('heatmap_day_hour', heatmap_pivot, build_heatmap_day_hour), use_container_width=True)
+        
+        elif heatmap_view == "By Outlet":
+            # Small multiples for the busiest outlets, one day x hour panel each
+            cube, outlet_names, hours = analytics.outlet_day_hour_cube(filtered_df)
+            top = np.argsort(-cube.sum(axis=(1, 2)), kind='stable')[:12]
+            
+            def build_heatmap_outlets():
+                fig = px.imshow(cube[top],
+                               facet_col=0,
+                               facet_col_wrap=3,
+                               x=hours,
+                               y=analytics.DAY_ORDER,
+                               color_continuous_scale='Greens',
+                               aspect='auto')
+                for annotation in fig.layout.annotations:
+                    annotation.text = outlet_names[top[int(annotation.text.split('=')[1])]]
+                fig.update_layout(
+                    margin=dict(l=0, r=0, t=30, b=0),
+                    height=260 * ((len(top) + 2) // 3),
+                    title=f"Sales Intensity by Outlet (top {len(top)} of {len(outlet_names)})"
+                )
+                return fig
+            st.plotly_chart(cached_figure('heatmap_outlets', (cube[top], outlet_names[top], hours, len(outlet_names)), build_heatmap_outlets), use_container_width=True)
+        
+        else:  # Calendar
+            calendar_matrix = analytics.date_hour_matrix(filtered_df)
+            
+            def build_heatmap_calendar():
+                fig = px.imshow(calendar_matrix.T,
+                               color_continuous_scale='Greens',
+                               aspect='auto')
+                fig.update_layout(
+                    margin=dict(l=0, r=0, t=30, b=0),
+                    height=400,
+                    title="Sales Intensity by Date and Hour",
+                    xaxis_title="",
+                    yaxis_title="Hour of Day"
+                )
+                return fig
+            st.plotly_chart(cached_figure('heatmap_calendar', calendar_matrix, build_heatmap_calendar), use_container_width=True)
         
         st.markdown("---")
         
         # Shift Analysis
         st.markdown("#### 🔄 Shift Performance Analysis")
         
-        shift_stats = filtered_df.groupby('Shift').agg({
-            'TotalPriceKES': 'sum',
-            'ProfitKES': 'sum',
-            'TransactionID': 'count',
-            'Quantity': 'sum'
-        }).reset_index()
+        shift_stats = sales_totals(['Shift']).copy()
         shift_stats['AvgTransaction'] = (shift_stats['TotalPriceKES'] / shift_stats['TransactionID']).round(0)
         
         col1, col2, col3 = st.columns(3)
@@ -1499,39 +1856,74 @@ def main():
         st.markdown("### 🏪 Branch Performance Comparison")
         
         # Branch Stats
-        branch_stats = filtered_df.groupby(['OutletID', 'OutletName', 'City']).agg({
-            'TotalPriceKES': 'sum',
-            'ProfitKES': 'sum',
-            'TransactionID': 'count',
-            'Quantity': 'sum',
-            'MonthlyTarget': 'first'
-        }).reset_index()
+        branch_stats = sales_totals(['OutletID', 'OutletName', 'City', 'MonthlyTarget']).copy()
         branch_stats['ProfitMargin'] = (branch_stats['ProfitKES'] / branch_stats['TotalPriceKES'] * 100).round(1)
         branch_stats['AvgTransaction'] = (branch_stats['TotalPriceKES'] / branch_stats['TransactionID']).round(0)
         branch_stats['TargetAchievement'] = (branch_stats['TotalPriceKES'] / (branch_stats['MonthlyTarget'] * 6) * 100).round(1)
         branch_stats = branch_stats.sort_values('TotalPriceKES', ascending=False)
         
         # Branch Cards
-        cols = st.columns(3)
+        card_section('branches', branch_stats, cards.branch_cards, columns=3, page_size=9)
         
-        for i, (_, branch) in enumerate(branch_stats.iterrows()):
-            with cols[i]:
-                rank_emoji = "🥇" if i == 0 else ("🥈" if i == 1 else "🥉")
-                color = "#FFD700" if i == 0 else ("#C0C0C0" if i == 1 else "#CD7F32")
-                
-                st.markdown(f"""
-                <div style="background: white; padding: 1.5rem; border-radius: 15px; border-top: 5px solid {color}; box-shadow: 0 4px 15px rgba(0,0,0,0.1);">
-                    <h2 style="margin: 0; text-align: center;">{rank_emoji} #{i+1}</h2>
-                    <h3 style="margin: 0.5rem 0; text-align: center; color: #006600;">{branch['OutletName']}</h3>
-                    <p style="text-align: center; color: #666;">{branch['City']}</p>
-                    <hr>
-                    <p><strong>💰 Sales:</strong> KES {branch['TotalPriceKES']:,.0f}</p>
-                    <p><strong>📈 Profit:</strong> KES {branch['ProfitKES']:,.0f} ({branch['ProfitMargin']}%)</p>
-                    <p><strong>🧾 Transactions:</strong> {branch['TransactionID']:,}</p>
-                    <p><strong>🛒 Avg Basket:</strong> KES {branch['AvgTransaction']:,.0f}</p>
-                    <p><strong>🎯 Target:</strong> {branch['TargetAchievement']}%</p>
-                </div>
-                """, unsafe_allow_html=True)
+        st.markdown("---")
+        
+        # Month-to-date against MonthlyTarget, projected to month end from the weekly sales profile
+        st.markdown("#### 🎯 Monthly Target Tracking")
+        last_sale = sales_df['Date'].max().date()
+        col1, col2 = st.columns([1, 3])
+        with col1:
+            target_as_of = st.date_input("As of", value=last_sale, min_value=sales_df['Date'].min().date(),
+                                         max_value=last_sale, key="target_as_of")
+        with col2:
+            st.caption("Projection = month-to-date sales + run rate x the share of an average week's sales still "
+                       "to come this month (by day of week and hour). Bars show P10-P90; "
+                       "the diamond is the target. All outlets, ignoring sidebar filters.")
+        target_tracking = cached('target_tracking', lambda: targets.track_targets(sales_df, target_as_of),
+                                 key=result_cache.filter_key(dataset=dataset_key, as_of=target_as_of))
+        month_tracking = targets.current_month(target_tracking)
+        if len(month_tracking) > 0:
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                st.metric("Month", month_tracking['Month'].iloc[0],
+                          delta=f"day {month_tracking['DaysElapsed'].max()} of {month_tracking['DaysInMonth'].max()}",
+                          delta_color="off")
+            with col2:
+                st.metric("MTD Sales", f"KES {month_tracking['MTDSales'].sum():,.0f}",
+                          delta=f"{month_tracking['MTDSales'].sum() / month_tracking['MonthlyTarget'].sum() * 100:.1f}% of target",
+                          delta_color="off")
+            with col3:
+                st.metric("Projected", f"KES {month_tracking['Projected'].sum():,.0f}",
+                          delta=f"{month_tracking['Projected'].sum() / month_tracking['MonthlyTarget'].sum() * 100:.1f}% of target",
+                          delta_color="off")
+            with col4:
+                behind = month_tracking['Status'].isin(['Off track', 'At risk', 'Missed'])
+                st.metric("Behind Target", f"{behind.sum()} of {len(month_tracking)}")
+            
+            def build_target_chart():
+                top = month_tracking.head(30)
+                fig = go.Figure()
+                fig.add_trace(go.Bar(
+                    x=top['OutletName'], y=top['Projected'], name='Projected',
+                    marker_color=top['HitProbability'].map(lambda p: '#28a745' if p >= 0.7 else
+                                                           '#ffbb33' if p >= 0.3 else '#cc0000'),
+                    error_y=dict(type='data', symmetric=False, array=top['P90'] - top['Projected'],
+                                 arrayminus=top['Projected'] - top['P10']),
+                    customdata=top[['HitProbability', 'MTDSales']].values,
+                    hovertemplate="%{x}<br>Projected KES %{y:,.0f}<br>MTD KES %{customdata[1]:,.0f}"
+                                  "<br>P(hit) %{customdata[0]:.0%}<extra></extra>"
+                ))
+                fig.add_trace(go.Scatter(x=top['OutletName'], y=top['MonthlyTarget'], mode='markers', name='Target',
+                                         marker=dict(symbol='diamond', size=10, color='#006600')))
+                fig.update_layout(margin=dict(l=0, r=0, t=10, b=0), height=350, showlegend=False,
+                                  xaxis_title="", yaxis_title="Month-end Sales (KES)")
+                return fig
+            st.plotly_chart(cached_figure('target_tracking', month_tracking.head(30), build_target_chart),
+                            use_container_width=True)
+            st.dataframe(month_tracking.drop(columns=['OutletID', 'Closed']).round(
+                {'MTDSales': 0, 'Projected': 0, 'P10': 0, 'P90': 0, 'ProjectedPct': 1, 'HitProbability': 2}),
+                use_container_width=True, hide_index=True)
+            with st.expander("🗓️ All months", expanded=False):
+                st.dataframe(target_tracking.drop(columns=['OutletID']), use_container_width=True, hide_index=True)
         
         st.markdown("---")
         
@@ -1540,31 +1932,35 @@ def main():
         
         with col1:
             st.markdown("#### 📊 Sales Comparison")
-            fig = px.bar(branch_stats, x='OutletName', y='TotalPriceKES',
-                        color='OutletName',
-                        color_discrete_sequence=['#006600', '#28a745', '#90EE90'])
-            fig.update_layout(
-                margin=dict(l=0, r=0, t=10, b=0),
-                height=300,
-                showlegend=False,
-                xaxis_title="",
-                yaxis_title="Sales (KES)"
-            )
-            st.plotly_chart(fig, use_container_width=True)
+            def build_branch_sales():
+                fig = px.bar(branch_stats, x='OutletName', y='TotalPriceKES',
+                            color='OutletName',
+                            color_discrete_sequence=['#006600', '#28a745', '#90EE90'])
+                fig.update_layout(
+                    margin=dict(l=0, r=0, t=10, b=0),
+                    height=300,
+                    showlegend=False,
+                    xaxis_title="",
+                    yaxis_title="Sales (KES)"
+                )
+                return fig
+            st.plotly_chart(cached_figure('branch_sales', branch_stats, build_branch_sales), use_container_width=True)
         
         with col2:
             st.markdown("#### 📈 Profit Margin Comparison")
-            fig = px.bar(branch_stats, x='OutletName', y='ProfitMargin',
-                        color='OutletName',
-                        color_discrete_sequence=['#006600', '#28a745', '#90EE90'])
-            fig.update_layout(
-                margin=dict(l=0, r=0, t=10, b=0),
-                height=300,
-                showlegend=False,
-                xaxis_title="",
-                yaxis_title="Profit Margin (%)"
-            )
-            st.plotly_chart(fig, use_container_width=True)
+            def build_branch_margin():
+                fig = px.bar(branch_stats, x='OutletName', y='ProfitMargin',
+                            color='OutletName',
+                            color_discrete_sequence=['#006600', '#28a745', '#90EE90'])
+                fig.update_layout(
+                    margin=dict(l=0, r=0, t=10, b=0),
+                    height=300,
+                    showlegend=False,
+                    xaxis_title="",
+                    yaxis_title="Profit Margin (%)"
+                )
+                return fig
+            st.plotly_chart(cached_figure('branch_margin', branch_stats, build_branch_margin), use_container_width=True)
         
         st.markdown("---")
         
@@ -1574,78 +1970,56 @@ def main():
         branch_daily = filtered_df.groupby([filtered_df['Date'].dt.date, 'OutletName'])['TotalPriceKES'].sum().reset_index()
         branch_daily.columns = ['Date', 'Branch', 'Sales']
         
-        fig = px.line(branch_daily, x='Date', y='Sales', color='Branch',
-                     color_discrete_sequence=['#006600', '#28a745', '#90EE90'])
-        fig.update_layout(
-            margin=dict(l=0, r=0, t=10, b=0),
-            height=400,
-            xaxis_title="",
-            yaxis_title="Sales (KES)"
-        )
-        st.plotly_chart(fig, use_container_width=True)
+        def build_branch_trends():
+            fig = px.line(branch_daily, x='Date', y='Sales', color='Branch',
+                         color_discrete_sequence=['#006600', '#28a745', '#90EE90'])
+            fig.update_layout(
+                margin=dict(l=0, r=0, t=10, b=0),
+                height=400,
+                xaxis_title="",
+                yaxis_title="Sales (KES)"
+            )
+            return fig
+        st.plotly_chart(cached_figure('branch_trends', branch_daily, build_branch_trends), use_container_width=True)
         
         st.markdown("---")
         
         # Category Performance by Branch
         st.markdown("#### 📦 Category Performance by Branch")
         
-        category_branch = filtered_df.groupby(['OutletName', 'Category'])['TotalPriceKES'].sum().reset_index()
+        category_branch = sales_totals(['OutletName', 'Category'])
         
-        fig = px.bar(category_branch, x='OutletName', y='TotalPriceKES', color='Category',
-                    color_discrete_sequence=px.colors.qualitative.Set2)
-        fig.update_layout(
-            margin=dict(l=0, r=0, t=10, b=0),
-            height=400,
-            xaxis_title="",
-            yaxis_title="Sales (KES)",
-            barmode='stack'
-        )
-        st.plotly_chart(fig, use_container_width=True)
+        def build_category_by_branch():
+            fig = px.bar(category_branch, x='OutletName', y='TotalPriceKES', color='Category',
+                        color_discrete_sequence=px.colors.qualitative.Set2)
+            fig.update_layout(
+                margin=dict(l=0, r=0, t=10, b=0),
+                height=400,
+                xaxis_title="",
+                yaxis_title="Sales (KES)",
+                barmode='stack'
+            )
+            return fig
+        st.plotly_chart(cached_figure('category_by_branch', category_branch, build_category_by_branch), use_container_width=True)
     
     # ========== TAB 7: ALERTS & FRAUD ==========
     with tab7:
         st.markdown("### 🚨 Alerts & Fraud Detection")
         
         # Fraud Risk Scoring
-        all_df = df.copy()  # Include voided transactions
-        
-        fraud_stats = all_df.groupby(['CashierID', 'CashierName', 'OutletName']).agg({
-            'TransactionID': 'count',
-            'Voided': lambda x: (x == 'Yes').sum(),
-            'IsReturn': lambda x: (x == 'Yes').sum(),
-            'DiscountPercent': 'mean',
-            'ProfitKES': lambda x: (x < 0).sum()
-        }).reset_index()
+        all_df = df  # Include voided transactions
         
-        fraud_stats.columns = ['CashierID', 'Name', 'Branch', 'TotalTxn', 'Voids', 'Returns', 'AvgDiscount', 'NegProfit']
-        fraud_stats['VoidRate'] = (fraud_stats['Voids'] / fraud_stats['TotalTxn'] * 100).round(2)
-        fraud_stats['ReturnRate'] = (fraud_stats['Returns'] / fraud_stats['TotalTxn'] * 100).round(2)
-        fraud_stats['NegProfitRate'] = (fraud_stats['NegProfit'] / fraud_stats['TotalTxn'] * 100).round(2)
-        
-        # Risk Score Calculation
-        fraud_stats['RiskScore'] = (
-            (fraud_stats['VoidRate'] > 5).astype(int) * 35 +
-            (fraud_stats['AvgDiscount'] > 10).astype(int) * 25 +
-            (fraud_stats['NegProfitRate'] > 3).astype(int) * 30 +
-            (fraud_stats['ReturnRate'] > 5).astype(int) * 10
-        )
-        
-        fraud_stats['RiskLevel'] = fraud_stats['RiskScore'].apply(
-            lambda x: '🔴 HIGH' if x >= 50 else ('🟡 MEDIUM' if x >= 25 else '🟢 LOW')
-        )
+        # Scored over all transactions, so one entry per dataset rather than per filter state
+        fraud_stats = cached('fraud_stats', lambda: sharded.fraud_risk() if sharded is not None
+                             else analytics.fraud_risk(all_df),
+                             key=result_cache.filter_key(dataset=dataset_key))
         
         # High Risk Alerts
         high_risk = fraud_stats[fraud_stats['RiskScore'] >= 50]
         
         if len(high_risk) > 0:
             st.markdown("#### ⚠️ HIGH RISK ALERTS")
-            for _, emp in high_risk.iterrows():
-                st.markdown(f"""
-                <div class="alert-critical">
-                    🚨 <strong>{emp['Name']}</strong> ({emp['Branch']}) - Risk Score: {emp['RiskScore']}/100<br>
-                    Void Rate: {emp['VoidRate']:.1f}% | Avg Discount: {emp['AvgDiscount']:.1f}% | Negative Profits: {emp['NegProfit']}
-                </div>
-                """, unsafe_allow_html=True)
+            card_section('high_risk', high_risk, cards.risk_alert_cards, page_size=10)
         
         st.markdown("---")
         
@@ -1655,37 +2029,41 @@ def main():
         col1, col2 = st.columns(2)
         
         with col1:
-            fig = px.scatter(fraud_stats, x='VoidRate', y='AvgDiscount',
-                           size='TotalTxn', color='RiskScore',
-                           hover_name='Name',
-                           color_continuous_scale=['green', 'yellow', 'red'],
-                           size_max=40)
-            fig.add_hline(y=10, line_dash="dash", line_color="red", annotation_text="Discount Threshold")
-            fig.add_vline(x=5, line_dash="dash", line_color="red", annotation_text="Void Threshold")
-            fig.update_layout(
-                margin=dict(l=0, r=0, t=30, b=0),
-                height=400,
-                title="Risk Matrix: Void Rate vs Discount",
-                xaxis_title="Void Rate (%)",
-                yaxis_title="Avg Discount (%)"
-            )
-            st.plotly_chart(fig, use_container_width=True)
+            def build_fraud_matrix():
+                fig = px.scatter(fraud_stats, x='VoidRate', y='AvgDiscount',
+                               size='TotalTxn', color='RiskScore',
+                               hover_name='Name',
+                               color_continuous_scale=['green', 'yellow', 'red'],
+                               size_max=40)
+                fig.add_hline(y=10, line_dash="dash", line_color="red", annotation_text="Discount Threshold")
+                fig.add_vline(x=5, line_dash="dash", line_color="red", annotation_text="Void Threshold")
+                fig.update_layout(
+                    margin=dict(l=0, r=0, t=30, b=0),
+                    height=400,
+                    title="Risk Matrix: Void Rate vs Discount",
+                    xaxis_title="Void Rate (%)",
+                    yaxis_title="Avg Discount (%)"
+                )
+                return fig
+            st.plotly_chart(cached_figure('fraud_matrix', fraud_stats, build_fraud_matrix), use_container_width=True)
         
         with col2:
-            fig = px.bar(fraud_stats.sort_values('RiskScore', ascending=False),
-                        x='Name', y='RiskScore',
-                        color='RiskScore',
-                        color_continuous_scale=['green', 'yellow', 'red'])
-            fig.add_hline(y=50, line_dash="dash", line_color="red", annotation_text="High Risk")
-            fig.add_hline(y=25, line_dash="dash", line_color="orange", annotation_text="Medium Risk")
-            fig.update_layout(
-                margin=dict(l=0, r=0, t=30, b=0),
-                height=400,
-                title="Risk Score by Employee",
-                xaxis_title="",
-                yaxis_title="Risk Score"
-            )
-            st.plotly_chart(fig, use_container_width=True)
+            def build_fraud_scores():
+                fig = px.bar(fraud_stats.sort_values('RiskScore', ascending=False),
+                            x='Name', y='RiskScore',
+                            color='RiskScore',
+                            color_continuous_scale=['green', 'yellow', 'red'])
+                fig.add_hline(y=50, line_dash="dash", line_color="red", annotation_text="High Risk")
+                fig.add_hline(y=25, line_dash="dash", line_color="orange", annotation_text="Medium Risk")
+                fig.update_layout(
+                    margin=dict(l=0, r=0, t=30, b=0),
+                    height=400,
+                    title="Risk Score by Employee",
+                    xaxis_title="",
+                    yaxis_title="Risk Score"
+                )
+                return fig
+            st.plotly_chart(cached_figure('fraud_scores', fraud_stats, build_fraud_scores), use_container_width=True)
         
         st.markdown("---")
         
@@ -1693,13 +2071,14 @@ def main():
         st.markdown("#### 📋 Complete Risk Assessment")
         
         st.dataframe(
-            fraud_stats[['RiskLevel', 'Name', 'Branch', 'TotalTxn', 'VoidRate', 'ReturnRate', 'AvgDiscount', 'NegProfitRate', 'RiskScore']].sort_values('RiskScore', ascending=False).rename(columns={
+            fraud_stats[['RiskLevel', 'Name', 'Branch', 'TotalTxn', 'VoidRate', 'ReturnRate', 'AvgDiscount', 'NegProfitRate', 'PriceAnomalyRate', 'RiskScore']].sort_values('RiskScore', ascending=False).rename(columns={
                 'RiskLevel': 'Risk',
                 'TotalTxn': 'Transactions',
                 'VoidRate': 'Void %',
                 'ReturnRate': 'Return %',
                 'AvgDiscount': 'Avg Discount %',
                 'NegProfitRate': 'Neg Profit %',
+                'PriceAnomalyRate': 'Price Anomaly %',
                 'RiskScore': 'Score'
             }),
             use_container_width=True,
@@ -1708,34 +2087,193 @@ def main():
         
         st.markdown("---")
         
+        # Every sale scored against its SKU's robust price and margin baseline at load
+        st.markdown("#### 💲 Price & Margin Anomalies")
+        st.caption(f"Sales more than {price_anomalies.Z_THRESHOLD} robust deviations from their outlet x SKU median "
+                   f"unit price, or that far below its median margin (chain-wide baseline for SKUs an outlet "
+                   f"sold fewer than {price_anomalies.MIN_BASELINE_LINES} times).")
+        # Baselines and scores stay full-history; the sidebar's dates, outlets and employees pick the lines shown
+        anomaly_filters = {name: sidebar_filters[name] for name in ['date_range', 'outlets', 'employees']
+                           if name in sidebar_filters}
+        all_anomalies = cached('price_anomalies', lambda: price_anomalies.anomaly_lines(df),
+                               key=result_cache.filter_key(dataset=dataset_key))
+        anomalies = cached('price_anomalies:filtered',
+                           lambda: analytics.filter_transactions(all_anomalies, **anomaly_filters).reset_index(drop=True),
+                           key=result_cache.filter_key(dataset=dataset_key, **anomaly_filters))
+        anomaly_base = cached('price_anomalies:sales',
+                              lambda: len(analytics.filter_transactions(sales_df[['Date', 'OutletName', 'CashierName']],
+                                                                        **anomaly_filters)),
+                              key=result_cache.filter_key(dataset=dataset_key, **anomaly_filters))
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("Anomalous Lines", f"{len(anomalies):,}",
+                      delta=f"{len(anomalies) / max(anomaly_base, 1) * 100:.2f}% of sales", delta_color="off")
+        with col2:
+            st.metric("Under-rung Value", f"KES {anomalies['UnderRungKES'].sum():,.0f}")
+        with col3:
+            st.metric("Cashiers Involved", anomalies['CashierName'].nunique())
+        if len(anomalies) > 0:
+            st.dataframe(anomalies.head(500), use_container_width=True, hide_index=True)
+        
+        st.markdown("---")
+        
+        # Sequences the per-cashier averages above hide, each linked to its receipts
+        st.markdown("#### 🔁 Void & Return Patterns")
+        st.caption(f"A void re-rung by the same cashier within {patterns.RERING_MINUTES} minutes, "
+                   f"and {patterns.MIN_RETURNS}+ returns of one item by one cashier within {patterns.RETURN_DAYS} days.")
+        found = cached('void_patterns', lambda: patterns.detect_patterns(df),
+                       key=result_cache.filter_key(dataset=dataset_key))
+        pattern_cases = found['cases']
+        pattern_cols = st.columns(len(patterns.PATTERNS))
+        for col, pattern in zip(pattern_cols, patterns.PATTERNS):
+            matched = pattern_cases[pattern_cases['Pattern'] == pattern]
+            with col:
+                st.metric(pattern, f"{len(matched):,}", delta=f"KES {matched['AmountKES'].sum():,.0f}", delta_color="off")
+        
+        if len(pattern_cases) > 0:
+            col1, col2 = st.columns([2, 3])
+            with col1:
+                st.markdown("**By cashier**")
+                st.dataframe(patterns.pattern_summary(pattern_cases).drop(columns=['CashierID']),
+                             use_container_width=True, hide_index=True)
+            with col2:
+                st.markdown("**Cases** (most recent first)")
+                st.dataframe(pattern_cases.drop(columns=['CashierID', 'ItemCode']),
+                             use_container_width=True, hide_index=True)
+            case_id = st.selectbox("Evidence for case", pattern_cases['CaseID'].tolist(), key="pattern_case")
+            evidence = found['evidence']
+            st.dataframe(evidence[evidence['CaseID'] == case_id].drop(columns=['CaseID']),
+                         use_container_width=True, hide_index=True)
+        else:
+            st.success("✅ No void/re-ring or burst-return patterns found")
+        
+        st.markdown("---")
+        
+        # Each return linked to the sale it reverses; no such sale, or a different cashier, is a red flag
+        st.markdown("#### ↩️ Return Matching")
+        st.caption(f"Returns matched to the latest earlier sale at the same outlet of the same item, quantity "
+                   f"and amount within {returns.LOOKBACK_DAYS} days.")
+        matched_returns = cached('return_matches', lambda: returns.match_returns(df),
+                                 key=result_cache.filter_key(dataset=dataset_key))
+        return_table = matched_returns['returns']
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("Returns", f"{len(return_table):,}",
+                      delta=f"KES {return_table['TotalPriceKES'].abs().sum():,.0f}", delta_color="off")
+        for col, status in zip([col2, col3, col4], returns.STATUSES):
+            flagged = return_table[return_table['Status'] == status]
+            with col:
+                st.metric(status, f"{len(flagged):,}", delta=f"KES {flagged['TotalPriceKES'].abs().sum():,.0f}",
+                          delta_color="off" if status == returns.STATUSES[0] else "inverse")
+        
+        col1, col2 = st.columns([2, 3])
+        with col1:
+            st.markdown("**By cashier** (most flagged value first)")
+            st.dataframe(matched_returns['cashier'].drop(columns=['CashierID']),
+                         use_container_width=True, hide_index=True)
+        with col2:
+            st.markdown("**Flagged returns**")
+            st.dataframe(return_table[return_table['Status'] != returns.STATUSES[0]]
+                         .drop(columns=['CashierID', 'ItemCode', 'SaleCashierID']),
+                         use_container_width=True, hide_index=True)
+        
+        st.markdown("---")
+        
+        # Alert rules: what is breaching now and everything fired so far
+        st.markdown("#### 🔔 Alert Rules & Log")
+        fired_alerts = alert_engine.fired()
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("Rules", len(alert_engine.rules))
+        with col2:
+            st.metric("Breaching Now", len(active_alerts),
+                      delta=f"{(active_alerts['Severity'] == 'critical').sum()} critical", delta_color="inverse")
+        with col3:
+            st.metric("Alerts Fired", f"{len(fired_alerts):,}",
+                      delta=f"last: {fired_alerts['WindowEnd'].iloc[0]}" if len(fired_alerts) else None,
+                      delta_color="off")
+        
+        with st.expander("📜 Rules", expanded=False):
+            st.caption("Set PHARMA_ALERT_RULES to a CSV with these columns (see config/alerts.csv) to change them.")
+            st.dataframe(alert_engine.rules, use_container_width=True, hide_index=True)
+        
+        if len(active_alerts) > 0:
+            st.markdown("**Breaching on the latest day**")
+            st.dataframe(active_alerts[['Severity', 'Name', 'Scope', 'ScopeValue', 'Metric', 'Value', 'Operator',
+                                        'Threshold', 'WindowDays', 'Lines']],
+                         use_container_width=True, hide_index=True)
+        st.markdown("**Fired alerts** (newest first)")
+        st.dataframe(fired_alerts[['WindowEnd', 'Severity', 'Name', 'Scope', 'ScopeValue', 'Value', 'Threshold',
+                                   'Lines', 'RuleID']].head(200),
+                     use_container_width=True, hide_index=True)
+        
+        st.markdown("---")
+        
         # Reconciliation
         st.markdown("#### 💵 Payment Reconciliation")
         
         daily_payments = filtered_df.groupby([filtered_df['Date'].dt.date, 'PaymentType'])['TotalPriceKES'].sum().unstack(fill_value=0).reset_index()
         
-        # Simulate variances
-        np.random.seed(42)
-        if 'M-Pesa' in daily_payments.columns:
-            daily_payments['MPesa_Statement'] = daily_payments['M-Pesa'] + np.random.randint(-500, 500, len(daily_payments))
-            daily_payments['MPesa_Variance'] = daily_payments['MPesa_Statement'] - daily_payments['M-Pesa']
+        # M-Pesa: statement lines matched to transactions, scoped to the selected dates and outlets
+        recon = reconcile_payments(df, MPESA_STATEMENT)
+        recon_daily = recon['daily']
+        if len(date_range) == 2:
+            recon_daily = recon_daily[(recon_daily['Date'] >= date_range[0]) & (recon_daily['Date'] <= date_range[1])]
+        recon_daily = recon_daily[recon_daily['OutletName'].isin(outlets) | recon_daily['OutletName'].isna()]
+        recon_cashier = recon['cashier'][recon['cashier']['OutletName'].isin(outlets)]
         
+        # Simulate cash count variances
+        np.random.seed(42)
         if 'Cash' in daily_payments.columns:
             daily_payments['Cash_Count'] = daily_payments['Cash'] + np.random.randint(-300, 300, len(daily_payments))
             daily_payments['Cash_Variance'] = daily_payments['Cash_Count'] - daily_payments['Cash']
         
-        col1, col2 = st.columns(2)
+        col1, col2, col3 = st.columns(3)
         
         with col1:
-            if 'MPesa_Variance' in daily_payments.columns:
-                total_mpesa_var = daily_payments['MPesa_Variance'].sum()
-                st.metric("M-Pesa Variance", f"KES {total_mpesa_var:,.0f}", 
-                         delta="Investigate if > KES 5,000", delta_color="inverse" if abs(total_mpesa_var) > 5000 else "normal")
+            total_mpesa_var = recon_daily['Variance'].sum()
+            st.metric("M-Pesa Variance", f"KES {total_mpesa_var:,.0f}", 
+                     delta="Investigate if > KES 5,000", delta_color="inverse" if abs(total_mpesa_var) > 5000 else "normal")
         
         with col2:
             if 'Cash_Variance' in daily_payments.columns:
                 total_cash_var = daily_payments['Cash_Variance'].sum()
                 st.metric("Cash Variance", f"KES {total_cash_var:,.0f}",
                          delta="Investigate if > KES 2,000", delta_color="inverse" if abs(total_cash_var) > 2000 else "normal")
+        
+        with col3:
+            unmatched_lines = int(recon_daily['UnmatchedLines'].sum())
+            unmatched_txns = int(recon_cashier['UnmatchedTxns'].sum())
+            st.metric("Unmatched M-Pesa", f"{unmatched_lines:,} lines",
+                     delta=f"{unmatched_txns:,} sales with no payment", delta_color="inverse" if unmatched_txns > 0 else "off")
+        
+        with st.expander("🔍 M-Pesa reconciliation details"):
+            st.markdown("**Variance by Cashier**")
+            st.dataframe(
+                recon_cashier[['CashierName', 'OutletName', 'Transactions', 'Recorded', 'Received', 'Variance', 'UnmatchedTxns']].rename(columns={
+                    'CashierName': 'Cashier',
+                    'OutletName': 'Branch',
+                    'Recorded': 'POS M-Pesa (KES)',
+                    'Received': 'Statement (KES)',
+                    'Variance': 'Variance (KES)',
+                    'UnmatchedTxns': 'Unpaid Sales'
+                }),
+                use_container_width=True,
+                hide_index=True
+            )
+            
+            st.markdown("**Daily Variance**")
+            st.dataframe(
+                recon_daily[recon_daily['Variance'] != 0][['Date', 'OutletName', 'Recorded', 'Statement', 'Variance', 'UnmatchedLines']].rename(columns={
+                    'OutletName': 'Branch',
+                    'Recorded': 'POS M-Pesa (KES)',
+                    'Statement': 'Statement (KES)',
+                    'Variance': 'Variance (KES)',
+                    'UnmatchedLines': 'Unmatched Lines'
+                }),
+                use_container_width=True,
+                hide_index=True
+            )
     
     # ========== TAB 8: REPORTS ==========
     with tab8:
@@ -1743,7 +2281,7 @@ def main():
         
         report_type = st.selectbox(
             "Select Report Type",
-            ["Daily Sales Report", "Employee Performance Report", "Inventory Report", "Expiry Alert Report", "Fraud Risk Report"]
+            analytics.REPORT_TYPES
         )
         
         st.markdown("---")
@@ -1751,13 +2289,8 @@ def main():
         if report_type == "Daily Sales Report":
             st.markdown("#### 📊 Daily Sales Summary")
             
-            daily_report = filtered_df.groupby(filtered_df['Date'].dt.date).agg({
-                'TotalPriceKES': 'sum',
-                'ProfitKES': 'sum',
-                'TransactionID': 'count',
-                'Quantity': 'sum'
-            }).reset_index()
-            daily_report.columns = ['Date', 'Total Sales', 'Profit', 'Transactions', 'Units Sold']
+            daily_report = query_backend.daily_sales_report(**sidebar_filters) if query_backend is not None \
+                else analytics.daily_sales_report(filtered_df)
             
             st.dataframe(daily_report, use_container_width=True, hide_index=True)
             
@@ -1799,9 +2332,7 @@ def main():
         elif report_type == "Expiry Alert Report":
             st.markdown("#### ⏰ Products Expiring Within 90 Days")
             
-            expiry_report = inventory_df[inventory_df['DaysToExpiry'] <= 90][
-                ['ItemName', 'Category', 'CurrentStock', 'DaysToExpiry', 'StockValue']
-            ].sort_values('DaysToExpiry')
+            expiry_report = analytics.expiry_report(inventory_df, days=90)
             
             st.dataframe(expiry_report, use_container_width=True, hide_index=True)
             
@@ -1826,6 +2357,43 @@ def main():
                 mime="text/csv"
             )
     
+    # ========== RESULT CACHE COUNTERS ==========
+    cache_stats = results.stats()
+    with cache_panel.expander("🗄️ Result Cache"):
+        st.caption(f"{cache_stats['Entries']:,} views, {cache_stats['Bytes'] / 1024 ** 2:,.1f} / "
+                   f"{cache_stats['MaxBytes'] / 1024 ** 2:,.0f} MB, TTL {RESULT_CACHE_TTL // 60} min")
+        st.dataframe(
+            pd.DataFrame({
+                'Counter': ['Hits', 'Misses', 'Hit Rate %', 'Evictions', 'Expirations'],
+                'Value': [cache_stats['Hits'], cache_stats['Misses'], round(cache_stats['HitRate'], 1),
+                          cache_stats['Evictions'], cache_stats['Expirations']]
+            }),
+            use_container_width=True,
+            hide_index=True
+        )
+    
+    figure_log = figures.timings()
+    with chart_panel.expander("📈 Chart Timings"):
+        figure_stats = figures.stats()
+        st.caption(f"{figure_stats['Entries']:,} cached figures; "
+                   f"{figure_stats['Hits']:,} hits, {figure_stats['Misses']:,} builds")
+        built = figure_log[~figure_log['Hit']]
+        st.dataframe(
+            figure_log.groupby('Figure').agg(
+                Lookups=('Hit', 'size'),
+                Hits=('Hit', 'sum'),
+                HashMs=('HashMs', 'mean'),
+            ).join(
+                built.groupby('Figure').agg(
+                    BuildMs=('BuildMs', 'last'),
+                    SerializeMs=('SerializeMs', 'last'),
+                    SpecKB=('SpecBytes', lambda b: b.iloc[-1] / 1024),
+                )
+            ).round(1).reset_index(),
+            use_container_width=True,
+            hide_index=True
+        )
+    
     # ========== FOOTER ==========
     st.markdown("---")
     st.markdown("""
@@ -0,0 +1,131 @@
+"""
+BiasharaFlow Pharma - Basket analytics
+Groups line items into baskets (one per TransactionID), describes basket
+size and value, and mines item co-occurrence / association rules on a
+sparse basket x item matrix.
+"""
+
+import pandas as pd
+import numpy as np
+from scipy import sparse
+from typing import Tuple
+
+
+# Columns shared by every line of a basket
+BASKET_HEADER = ['TransactionID', 'Date', 'OutletID', 'OutletName', 'CashierID', 'CashierName',
+                 'PaymentType', 'CustomerType']
+
+
+# ============================================================================
+# SECTION 1: BASKETS
+# ============================================================================
+
+def build_baskets(df: pd.DataFrame) -> pd.DataFrame:
+    """One row per TransactionID with its lines, units, value and profit.
+
+    Header fields (date, outlet, cashier, payment, customer) are shared by
+    every line of a basket and are taken from its first line.
+    """
+    codes, _ = pd.factorize(df['TransactionID'])
+    n = codes.max() + 1 if len(codes) else 0
+    first = np.full(n, len(df), dtype=np.int64)
+    np.minimum.at(first, codes, np.arange(len(df)))
+
+    baskets = df.iloc[first][BASKET_HEADER] \
+        .reset_index(drop=True)
+    baskets['Lines'] = np.bincount(codes, minlength=n)
+    baskets['Units'] = np.bincount(codes, weights=df['Quantity'].values, minlength=n).astype(int)
+    baskets['Value'] = np.bincount(codes, weights=df['TotalPriceKES'].values, minlength=n)
+    baskets['Profit'] = np.bincount(codes, weights=df['ProfitKES'].values, minlength=n)
+    return baskets
+
+
+def basket_summary(baskets: pd.DataFrame) -> dict:
+    """Headline basket metrics: count, mean/median value, lines per basket, multi-item share."""
+    if len(baskets) == 0:
+        return {'Baskets': 0, 'AvgValue': 0.0, 'MedianValue': 0.0, 'AvgLines': 0.0, 'MultiItemShare': 0.0}
+    return {
+        'Baskets': len(baskets),
+        'AvgValue': baskets['Value'].mean(),
+        'MedianValue': baskets['Value'].median(),
+        'AvgLines': baskets['Lines'].mean(),
+        'MultiItemShare': (baskets['Lines'] > 1).mean() * 100,
+    }
+
+
+def basket_size_distribution(baskets: pd.DataFrame, max_lines: int = 10) -> pd.DataFrame:
+    """Basket counts and value by number of lines; the last bucket is ``max_lines``+."""
+    lines = np.minimum(baskets['Lines'].values, max_lines)
+    counts = np.bincount(lines, minlength=max_lines + 1)[1:]
+    values = np.bincount(lines, weights=baskets['Value'].values, minlength=max_lines + 1)[1:]
+    labels = [str(i) for i in range(1, max_lines)] + [f'{max_lines}+']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        avg = np.where(counts > 0, values / counts, 0.0)
+    return pd.DataFrame({'Lines': labels, 'Baskets': counts, 'AvgValue': avg})
+
+
+def basket_value_distribution(baskets: pd.DataFrame, bins: int = 20) -> pd.DataFrame:
+    """Histogram of basket value on log-spaced bins (values are heavily right-skewed)."""
+    values = baskets['Value'].values
+    values = values[values > 0]
+    if len(values) == 0:
+        return pd.DataFrame({'From': [], 'To': [], 'Baskets': []})
+    edges = np.unique(np.geomspace(max(values.min(), 1.0), values.max() + 1, bins + 1).round())
+    counts, edges = np.histogram(values, bins=edges)
+    return pd.DataFrame({'From': edges[:-1], 'To': edges[1:], 'Baskets': counts})
+
+
+# ============================================================================
+# SECTION 2: MARKET-BASKET ASSOCIATION MINING
+# ============================================================================
+
+def basket_item_matrix(df: pd.DataFrame) -> Tuple[sparse.csr_matrix, pd.Index]:
+    """Binary CSR matrix of baskets x items, plus the item labels for its columns."""
+    basket_codes, _ = pd.factorize(df['TransactionID'])
+    item_codes, items = pd.factorize(df['ItemName'])
+    matrix = sparse.csr_matrix(
+        (np.ones(len(df), dtype=np.int32), (basket_codes, item_codes)),
+        shape=(basket_codes.max() + 1 if len(df) else 0, len(items))
+    )
+    matrix.data[:] = 1  # repeated lines of one item count once
+    return matrix, items
+
+
+def association_rules(df: pd.DataFrame, min_support: float = 0.001, min_confidence: float = 0.05,
+                      min_count: int = 3) -> pd.DataFrame:
+    """Pairwise rules A -> B with support, confidence and lift.
+
+    Co-occurrence counts come from X.T @ X on the sparse basket x item
+    matrix, so memory follows the number of distinct pairs actually seen,
+    not items squared. Only multi-item baskets contribute pairs, but
+    support is measured against all baskets.
+    """
+    columns = ['Antecedent', 'Consequent', 'Baskets', 'Support', 'Confidence', 'Lift']
+    matrix, items = basket_item_matrix(df)
+    n_baskets = matrix.shape[0]
+    if n_baskets == 0:
+        return pd.DataFrame(columns=columns)
+
+    item_count = np.asarray(matrix.sum(axis=0)).ravel()
+    multi = matrix[np.asarray(matrix.sum(axis=1)).ravel() > 1]
+    pairs = sparse.triu(multi.T @ multi, k=1).tocoo()
+
+    keep = (pairs.data >= max(min_count, min_support * n_baskets))
+    a, b, count = pairs.row[keep], pairs.col[keep], pairs.data[keep]
+    # Each unordered pair yields both directions
+    ante = np.concatenate([a, b])
+    cons = np.concatenate([b, a])
+    count = np.concatenate([count, count]).astype(int)
+
+    confidence = count / item_count[ante]
+    lift = confidence / (item_count[cons] / n_baskets)
+    rules = pd.DataFrame({
+        'Antecedent': items[ante],
+        'Consequent': items[cons],
+        'Baskets': count,
+        'Support': count / n_baskets,
+        'Confidence': confidence,
+        'Lift': lift,
+    })
+    rules = rules[rules['Confidence'] >= min_confidence]
+    return rules.sort_values(['Lift', 'Baskets'], ascending=False).reset_index(drop=True)
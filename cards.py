@@ -0,0 +1,105 @@
+"""
+BiasharaFlow Pharma - Card grids
+Builds the dashboard's HTML card lists (employee podium and status, branch
+cards, risk alerts) with column-wise string operations and joins each list
+into one grid, so a section is a single Streamlit element however many rows
+it shows.
+"""
+
+import pandas as pd
+import numpy as np
+
+
+# ============================================================================
+# SECTION 1: COLUMN FORMATTING
+# ============================================================================
+
+def text(values: pd.Series) -> pd.Series:
+    """HTML-escaped strings."""
+    return (values.astype(str)
+            .str.replace('&', '&amp;', regex=False)
+            .str.replace('<', '&lt;', regex=False)
+            .str.replace('>', '&gt;', regex=False)
+            .str.replace('"', '&quot;', regex=False))
+
+
+def whole(values: pd.Series) -> pd.Series:
+    """Numbers rounded to integers with thousands separators (like f'{x:,.0f}')."""
+    digits = values.astype(float).round().astype('int64').astype(str)
+    return digits.str.replace(r'\B(?=(\d{3})+(?!\d))', ',', regex=True)
+
+
+def fixed(values: pd.Series, decimals: int = 1) -> pd.Series:
+    """Numbers with a fixed number of decimals (like f'{x:.1f}')."""
+    return pd.Series(np.char.mod(f'%.{decimals}f', values.to_numpy(dtype=float)), index=values.index)
+
+
+def grid(cards: pd.Series, columns: int = 1) -> str:
+    """One HTML block laying the cards out in ``columns`` equal columns."""
+    return (f'<div class="card-grid" style="grid-template-columns: repeat({columns}, minmax(0, 1fr));">'
+            + ''.join(cards) + '</div>')
+
+
+# ============================================================================
+# SECTION 2: DASHBOARD CARDS
+# ============================================================================
+
+PODIUM = pd.DataFrame({
+    'Medal': ['🥇', '🥈', '🥉'],
+    'Gradient': ['#FFD700, #FFA500', '#C0C0C0, #A0A0A0', '#CD7F32, #8B4513'],
+})
+
+
+def podium_cards(employee_stats: pd.DataFrame) -> pd.Series:
+    """Gold/silver/bronze cards for the top three rows of the employee ranking."""
+    top = employee_stats.head(3).reset_index(drop=True)
+    podium = PODIUM.head(len(top))
+    return ('<div style="background: linear-gradient(135deg, ' + podium['Gradient']
+            + '); padding: 1.5rem; border-radius: 15px; text-align: center; color: white;">'
+            + '<h1 style="margin: 0; font-size: 3rem;">' + podium['Medal'] + '</h1>'
+            + '<h3 style="margin: 0.5rem 0;">' + text(top['Name']) + '</h3>'
+            + '<p style="margin: 0; font-size: 0.9rem;">' + text(top['Branch']) + '</p>'
+            + '<h2 style="margin: 0.5rem 0;">KES ' + whole(top['Sales']) + '</h2>'
+            + '<p style="margin: 0;">' + top['Transactions'].astype(str) + ' transactions</p>'
+            + '</div>')
+
+
+def status_cards(today_status: pd.DataFrame) -> pd.Series:
+    """One presence card per cashier: status, login time and lateness."""
+    present = today_status['Status'] == 'Present'
+    login = today_status['LoginTime'].dt.strftime('%H:%M').fillna('N/A')
+    return ('<div class="rank-card"><div>'
+            + '<strong>' + text(today_status['CashierName']) + '</strong> (' + text(today_status['OutletName']) + ')<br>'
+            + '<span class="' + np.where(present, 'status-online', 'status-offline') + '">● '
+            + text(today_status['Status']) + '</span>'
+            + np.where(present, ' | Login: ' + login, '')
+            + np.where(today_status['IsLate'].astype(bool), ' | ⚠️ LATE', '')
+            + '</div></div>')
+
+
+def branch_cards(branch_stats: pd.DataFrame) -> pd.Series:
+    """Ranked branch cards; ``branch_stats`` is sorted by sales, best first."""
+    rank = pd.Series(np.arange(1, len(branch_stats) + 1), index=branch_stats.index)
+    medal = np.select([rank == 1, rank == 2, rank == 3], ['🥇', '🥈', '🥉'], '🏅')
+    color = np.select([rank == 1, rank == 2, rank == 3], ['#FFD700', '#C0C0C0', '#CD7F32'], '#006600')
+    return ('<div style="background: white; padding: 1.5rem; border-radius: 15px; border-top: 5px solid '
+            + color + '; box-shadow: 0 4px 15px rgba(0,0,0,0.1);">'
+            + '<h2 style="margin: 0; text-align: center;">' + medal + ' #' + rank.astype(str) + '</h2>'
+            + '<h3 style="margin: 0.5rem 0; text-align: center; color: #006600;">' + text(branch_stats['OutletName']) + '</h3>'
+            + '<p style="text-align: center; color: #666;">' + text(branch_stats['City']) + '</p><hr>'
+            + '<p><strong>💰 Sales:</strong> KES ' + whole(branch_stats['TotalPriceKES']) + '</p>'
+            + '<p><strong>📈 Profit:</strong> KES ' + whole(branch_stats['ProfitKES'])
+            + ' (' + branch_stats['ProfitMargin'].astype(str) + '%)</p>'
+            + '<p><strong>🧾 Transactions:</strong> ' + whole(branch_stats['TransactionID']) + '</p>'
+            + '<p><strong>🛒 Avg Basket:</strong> KES ' + whole(branch_stats['AvgTransaction']) + '</p>'
+            + '<p><strong>🎯 Target:</strong> ' + branch_stats['TargetAchievement'].astype(str) + '%</p>'
+            + '</div>')
+
+
+def risk_alert_cards(high_risk: pd.DataFrame) -> pd.Series:
+    """One critical alert per high-risk cashier."""
+    return ('<div class="alert-critical">🚨 <strong>' + text(high_risk['Name']) + '</strong> ('
+            + text(high_risk['Branch']) + ') - Risk Score: ' + high_risk['RiskScore'].astype(str) + '/100<br>'
+            + 'Void Rate: ' + fixed(high_risk['VoidRate']) + '% | Avg Discount: ' + fixed(high_risk['AvgDiscount'])
+            + '% | Negative Profits: ' + high_risk['NegProfit'].astype(str)
+            + '</div>')
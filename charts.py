@@ -0,0 +1,121 @@
+"""
+BiasharaFlow Pharma - Cached chart building
+Keeps built Plotly figures keyed by chart name and a hash of the data they
+are drawn from, so a rerun whose aggregates have not changed reuses the
+figure instead of rebuilding it. Logs build and serialize time per figure.
+"""
+
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Callable, Dict
+
+import pandas as pd
+import numpy as np
+import plotly.graph_objects as go
+import plotly.io as pio
+
+
+logger = logging.getLogger(__name__)
+
+
+def _update(digest, value: Any) -> None:
+    """Feed one chart input into the hash."""
+    if isinstance(value, pd.DataFrame):
+        digest.update(repr((list(value.columns), list(value.dtypes.astype(str)), value.shape)).encode())
+        digest.update(pd.util.hash_pandas_object(value, index=True).values.tobytes())
+    elif isinstance(value, (pd.Series, pd.Index)):
+        digest.update(pd.util.hash_pandas_object(pd.Series(value), index=False).values.tobytes())
+    elif isinstance(value, np.ndarray):
+        digest.update(repr((value.dtype.str, value.shape)).encode())
+        digest.update(np.ascontiguousarray(value).tobytes() if value.dtype != object else repr(value.tolist()).encode())
+    elif isinstance(value, (list, tuple)):
+        digest.update(b'(')
+        for item in value:
+            _update(digest, item)
+        digest.update(b')')
+    else:
+        digest.update(repr(value).encode())
+
+
+def fingerprint(name: str, data: Any) -> str:
+    """Hash of a chart's name and input data (frames, arrays, scalars or tuples of them)."""
+    digest = hashlib.sha1(name.encode())
+    _update(digest, data)
+    return digest.hexdigest()
+
+
+class FigureCache:
+    """LRU cache of built figures, shared across sessions.
+
+    ``get(name, data, build)`` returns the cached figure for that chart and
+    data, or calls ``build()`` and stores the result. ``data`` must cover
+    everything ``build`` draws from; layout options written inline in
+    ``build`` are covered by ``name``. Figures are shared and must not be
+    modified after they are returned.
+    """
+
+    def __init__(self, max_entries: int = 256, log_size: int = 500):
+        self.max_entries = max_entries
+        self._figures: 'OrderedDict[str, go.Figure]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._log = deque(maxlen=log_size)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, name: str, data: Any, build: Callable[[], go.Figure]) -> go.Figure:
+        t0 = time.perf_counter()
+        key = fingerprint(name, data)
+        hash_ms = (time.perf_counter() - t0) * 1000
+        with self._lock:
+            fig = self._figures.get(key)
+            if fig is not None:
+                self._figures.move_to_end(key)
+                self.hits += 1
+                self._record(name, True, hash_ms, 0.0, 0.0, 0)
+                return fig
+
+        t0 = time.perf_counter()
+        fig = build()
+        build_ms = (time.perf_counter() - t0) * 1000
+        # Serialized once per entry to log its cost and size; Streamlit serializes on every render
+        t0 = time.perf_counter()
+        spec_bytes = len(pio.to_json(fig, validate=False))
+        serialize_ms = (time.perf_counter() - t0) * 1000
+
+        with self._lock:
+            self.misses += 1
+            self._figures[key] = fig
+            while len(self._figures) > self.max_entries:
+                self._figures.popitem(last=False)
+            self._record(name, False, hash_ms, build_ms, serialize_ms, spec_bytes)
+        logger.info("figure %s built in %.1f ms, serialized in %.1f ms (%d bytes)",
+                    name, build_ms, serialize_ms, spec_bytes)
+        return fig
+
+    def _record(self, name: str, hit: bool, hash_ms: float, build_ms: float,
+                serialize_ms: float, spec_bytes: int) -> None:
+        self._log.append({
+            'Figure': name,
+            'Hit': hit,
+            'HashMs': hash_ms,
+            'BuildMs': build_ms,
+            'SerializeMs': serialize_ms,
+            'SpecBytes': spec_bytes,
+        })
+
+    def timings(self) -> pd.DataFrame:
+        """Recent lookups, newest last."""
+        with self._lock:
+            return pd.DataFrame(list(self._log),
+                                columns=['Figure', 'Hit', 'HashMs', 'BuildMs', 'SerializeMs', 'SpecBytes'])
+
+    def clear(self) -> None:
+        with self._lock:
+            self._figures.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'Entries': len(self._figures), 'Hits': self.hits, 'Misses': self.misses}
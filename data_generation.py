@@ -0,0 +1,553 @@
+"""
+BiasharaFlow Pharma - Synthetic data generation
+Streamlit-free generators for transactions, employee logins and inventory,
+shared by the dashboard and the headless batch tools.
+
+Generation is partitioned by outlet and month. Every partition draws from
+its own RNG stream spawned from one master SeedSequence, so the output is
+bit-identical whether partitions run in-process or across any number of
+worker processes.
+"""
+
+import pandas as pd
+import numpy as np
+from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor
+import calendar
+from typing import Dict, List, Optional, Tuple
+
+import dimensions
+from stock_ledger import StockLedger
+
+
+# Independent streams spawned from the master seed, one per generator
+TRANSACTION_STREAM = 0
+LOGIN_STREAM = 1
+STOCK_STREAM = 2
+
+# Date range: 6 months
+END_DATE = datetime(2024, 12, 31)
+START_DATE = END_DATE - timedelta(days=180)
+
+# More transactions during lunch (12-2) and evening (5-7)
+HOURS = np.arange(7, 23)
+HOUR_WEIGHTS = [0.02, 0.02, 0.03, 0.05, 0.06, 0.08, 0.10, 0.12, 0.10, 0.08, 0.08, 0.06, 0.05, 0.05, 0.05, 0.05]
+SEASONAL_MONTHS = [10, 11, 12, 4, 5]
+
+# Shift hours per shift (Morning, Afternoon, Evening), as transactions are assigned to them by hour
+EXPECTED_LOGIN = np.array([7, 14, 19])
+EXPECTED_LOGOUT = np.array([14, 19, 23])
+# Minutes a cashier logs in before the shift starts and out after it ends
+TILL_MARGIN_MINUTES = (5, 30)
+# Rostered days a cashier misses, and days they log in late (by LATE_MINUTES); sales rung
+# on those days, or before the late login, are sales while logged out
+ABSENCE_RATE = 0.03
+LATE_RATE = 0.08
+LATE_MINUTES = (5, 45)
+
+_DAY_NAMES = np.array(list(calendar.day_name))
+_MONTH_NAMES = np.array(list(calendar.month_name))
+
+
+def _stream(seed: int, stream: int) -> np.random.SeedSequence:
+    """Child SeedSequence for one generator, independent of the others."""
+    return np.random.SeedSequence(seed, spawn_key=(stream,))
+
+
+def _month_partitions(start: datetime, days: int) -> List[np.ndarray]:
+    """Split ``days`` consecutive days from ``start`` into per-month arrays of datetime64[D]."""
+    all_days = np.datetime64(start.date()) + np.arange(days)
+    months = all_days.astype('datetime64[M]')
+    bounds = np.flatnonzero(np.diff(months.astype(int))) + 1
+    return np.split(all_days, bounds)
+
+
+def _run_partitions(func, tasks: List, workers: int, initializer=None, initargs=()) -> List:
+    """Run ``func`` over ``tasks`` in order, in-process or on a process pool."""
+    if workers is None or workers <= 1:
+        if initializer is not None:
+            initializer(*initargs)
+        return [func(task) for task in tasks]
+    with ProcessPoolExecutor(max_workers=workers, initializer=initializer, initargs=initargs) as pool:
+        return list(pool.map(func, tasks, chunksize=max(1, len(tasks) // (workers * 4))))
+
+
+# ============================================================================
+# SECTION 1: ENHANCED DATA GENERATION
+# ============================================================================
+
+# Labels of the coded text columns
+PAYMENT_TYPES = ['M-Pesa', 'Cash', 'Card', 'Insurance']
+CUSTOMER_TYPES = ['Walk-in', 'Regular', 'Corporate', 'Hospital']
+YES_NO = ['No', 'Yes']
+
+# Catalog arrays shared by every partition; set once per process
+_CATALOG: Dict[str, np.ndarray] = {}
+
+
+def _set_catalog(catalog: Dict[str, np.ndarray]) -> None:
+    global _CATALOG
+    _CATALOG = catalog
+
+
+def _catalog_arrays(catalog: pd.DataFrame) -> Dict[str, np.ndarray]:
+    weights = catalog['Weight'].values.astype(float)
+    arrays = {col: catalog[col].values for col in ['UnitPriceKES', 'CostPriceKES']}
+    arrays['cdf'] = np.cumsum(weights) / weights.sum()
+    arrays['seasonal_idx'] = np.flatnonzero(catalog['Seasonal'].values == 'Yes')
+    # Items grouped by category, for picking a companion line from the same shelf
+    category_code, _ = pd.factorize(catalog['Category'])
+    arrays['category_code'] = category_code
+    arrays['by_category'] = np.argsort(category_code, kind='stable')
+    arrays['category_start'] = np.searchsorted(category_code[arrays['by_category']], np.arange(category_code.max() + 1))
+    arrays['category_size'] = np.bincount(category_code)
+    return arrays
+
+
+def _generate_transaction_partition(task: Tuple) -> Dict[str, np.ndarray]:
+    """Generate the transactions of one outlet x month partition from its own RNG stream.
+
+    Returns plain column arrays, cheap to send back from a worker: text
+    columns come as integer codes into the outlet, staff, catalog and label
+    tables (the underscored keys), decoded once over all partitions.
+    """
+    outlet, staff, days, num_rows, seed_seq = task
+    staff_rows, staff_shift, staff_high_risk = staff
+    rng = np.random.default_rng(seed_seq)
+    cat = _CATALOG
+    n = num_rows
+
+    # Group lines into baskets (mean ~1.8 lines); a basket shares one receipt,
+    # timestamp, cashier, payment and customer, taken from its first line
+    basket_sizes = rng.geometric(0.55, size=n)
+    basket = np.repeat(np.arange(n), basket_sizes)[:n]
+    head = np.flatnonzero(np.r_[True, basket[1:] != basket[:-1]])[basket]
+
+    # Random date and time of day with realistic distribution
+    day = days[rng.integers(0, len(days), size=n)][head]
+    hour = rng.choice(HOURS, size=n, p=HOUR_WEIGHTS)[head]
+    minute = rng.integers(0, 60, size=n)[head]
+    second = rng.integers(0, 60, size=n)[head]
+    date = (day.astype('datetime64[s]') + (hour * 3600 + minute * 60 + second).astype('timedelta64[s]')).astype('datetime64[ns]')
+    month = day.astype('datetime64[M]').astype(int) % 12 + 1
+    day_of_week = (day.astype('datetime64[D]').astype(int) + 3) % 7
+
+    # Determine shift based on hour
+    shift_idx = np.where(hour < 14, 0, np.where(hour < 19, 1, 2))
+    shift = np.array(dimensions.SHIFTS)[shift_idx]
+
+    # Select cashier based on shift, falling back to the whole outlet roster
+    cashier_pos = np.empty(n, dtype=int)
+    for s, name in enumerate(dimensions.SHIFTS):
+        rows = np.flatnonzero(shift_idx == s)
+        roster = np.flatnonzero(staff_shift == name)
+        if len(roster) == 0:
+            roster = np.arange(len(staff_rows))
+        cashier_pos[rows] = roster[rng.integers(0, len(roster), size=len(rows))]
+    cashier_pos = cashier_pos[head]
+    high_risk = staff_high_risk[cashier_pos]
+
+    # Select medicine by popularity, boosting seasonal lines in the rainy months
+    med_idx = np.minimum(np.searchsorted(cat['cdf'], rng.random(n)), len(cat['cdf']) - 1)
+    seasonal = np.isin(month, SEASONAL_MONTHS) & (rng.random(n) < 0.3)
+    if len(cat['seasonal_idx']) > 0:
+        med_idx = np.where(seasonal, rng.choice(cat['seasonal_idx'], size=n), med_idx)
+    # Later lines often come from the same category as the basket's first item
+    companion = (head != np.arange(n)) & (rng.random(n) < 0.35)
+    head_category = cat['category_code'][med_idx[head]]
+    same_shelf = cat['by_category'][cat['category_start'][head_category] +
+                                    (rng.random(n) * cat['category_size'][head_category]).astype(int)]
+    med_idx = np.where(companion, same_shelf, med_idx)
+    unit_price = cat['UnitPriceKES'][med_idx]
+    cost_price = cat['CostPriceKES'][med_idx]
+
+    quantity = rng.choice([1, 1, 1, 2, 2, 3, 5, 10], size=n, p=[0.35, 0.2, 0.15, 0.1, 0.08, 0.07, 0.03, 0.02])
+    payment_type = rng.choice(len(PAYMENT_TYPES), size=n, p=[0.70, 0.18, 0.07, 0.05])[head]
+    customer_type = rng.choice(len(CUSTOMER_TYPES), size=n, p=[0.50, 0.30, 0.12, 0.08])[head]
+
+    # Discount
+    corporate = customer_type == CUSTOMER_TYPES.index('Corporate')
+    regular = (customer_type == CUSTOMER_TYPES.index('Regular')) & (rng.random(n) < 0.3)
+    occasional = ~corporate & ~regular & (rng.random(n) < 0.05)
+    discount = np.select(
+        [corporate, regular, occasional],
+        [rng.choice([10, 15, 20], size=n), rng.choice([5, 10], size=n), rng.choice([5, 10, 15], size=n)],
+        default=0
+    )
+
+    # Expiry date
+    days_to_expiry = rng.choice(
+        [7, 15, 30, 45, 60, 90, 180, 365, 730], size=n,
+        p=[0.01, 0.02, 0.05, 0.05, 0.08, 0.15, 0.24, 0.25, 0.15]
+    )
+
+    # Void transactions
+    voided = rng.random(n) < np.where(high_risk, 0.08, 0.02)
+
+    # Fraud patterns
+    fraud = high_risk & (rng.random(n) < 0.05)
+    discount = np.where(fraud, 50, discount)
+
+    # Calculate amounts
+    total_price = unit_price * quantity * (1 - discount / 100)
+    total_cost = cost_price * quantity
+    profit = total_price - total_cost
+
+    # Return transactions
+    is_return = rng.random(n) < 0.03
+    total_price = np.where(is_return, -np.abs(total_price), total_price)
+    profit = np.where(is_return, -np.abs(profit), profit)
+
+    dates = pd.DatetimeIndex(date)
+    return {
+        '_Basket': basket,
+        'Date': date,
+        'Hour': hour,
+        'DayOfWeek': day_of_week,
+        'WeekNumber': dates.isocalendar().week.values.astype(int),
+        'MonthNum': month,
+        'Year': dates.year.values,
+        '_Shift': shift_idx,
+        '_Outlet': np.full(n, outlet),
+        '_Cashier': staff_rows[cashier_pos],
+        '_PaymentType': payment_type,
+        '_CustomerType': customer_type,
+        '_Item': med_idx,
+        'Quantity': quantity,
+        'UnitPriceKES': unit_price,
+        'TotalPriceKES': total_price,
+        'CostPriceKES': total_cost,
+        'ProfitKES': profit,
+        'DiscountPercent': discount,
+        'ExpiryDate': date + days_to_expiry.astype('timedelta64[D]'),
+        'DaysToExpiry': days_to_expiry,
+        '_Voided': voided.astype(np.int8),
+        '_IsReturn': is_return.astype(np.int8),
+    }
+
+
+def _transaction_columns(columns: Dict[str, np.ndarray], dims: Dict[str, pd.DataFrame]) -> Dict[str, object]:
+    """Final transaction columns, in order, with the partitions' codes decoded against their tables."""
+    def decode(values, codes: np.ndarray):
+        # One gather per column over all rows; text is converted to the string dtype once, per label
+        return pd.Series(values).values.take(codes)
+
+    outlets, staff, catalog = dims['outlets'], dims['staff'], dims['catalog']
+    outlet, cashier, item = columns['_Outlet'], columns['_Cashier'], columns['_Item']
+    return {
+        'Date': columns['Date'],
+        'Hour': columns['Hour'],
+        'DayOfWeek': columns['DayOfWeek'],
+        'DayName': decode(_DAY_NAMES, columns['DayOfWeek']),
+        'WeekNumber': columns['WeekNumber'],
+        'Month': decode(_MONTH_NAMES, columns['MonthNum']),
+        'MonthNum': columns['MonthNum'],
+        'Year': columns['Year'],
+        'Shift': decode(dimensions.SHIFTS, columns['_Shift']),
+        **{col: decode(outlets[col].values, outlet) for col in ['OutletID', 'OutletName', 'City', 'MonthlyTarget']},
+        'CashierID': decode(staff['CashierID'].values, cashier),
+        'CashierName': decode(staff['CashierName'].values, cashier),
+        'CashierShift': decode(staff['Shift'].values, cashier),
+        'HireDate': decode(staff['HireDate'].values, cashier),
+        'Salary': decode(staff['Salary'].values, cashier),
+        'TransactionID': columns['TransactionID'],
+        'PaymentType': decode(PAYMENT_TYPES, columns['_PaymentType']),
+        'CustomerType': decode(CUSTOMER_TYPES, columns['_CustomerType']),
+        **{col: decode(catalog[col].values, item) for col in ['ItemCode', 'ItemName', 'Category']},
+        **{col: columns[col] for col in ['Quantity', 'UnitPriceKES', 'TotalPriceKES', 'CostPriceKES', 'ProfitKES',
+                                         'DiscountPercent']},
+        'PrescriptionRequired': decode(catalog['PrescriptionRequired'].values, item),
+        'ExpiryDate': columns['ExpiryDate'],
+        'DaysToExpiry': columns['DaysToExpiry'],
+        'Voided': decode(YES_NO, columns['_Voided']),
+        'IsReturn': decode(YES_NO, columns['_IsReturn']),
+    }
+
+
+# Replenishment policy per outlet x item: lead time and demand cover in days,
+# and how often a supplier delivers late, by how many extra days
+LEAD_DAYS = (1, 5)
+SAFETY_DAYS = (0.5, 3.0)
+COVER_DAYS = (14, 42)
+MIN_ORDER = 10
+LATE_DELIVERY_RATE = 0.15
+LATE_DAYS = (2, 10)
+DELIVERY_HOUR = 6
+
+
+def _serve_from_stock(df: pd.DataFrame, seed: int) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Run every outlet x item shelf through a reorder-point policy and keep the lines it could serve.
+
+    Each shelf opens at its order-up-to level (MaxStock). Deliveries land
+    before opening; sales are served in time order while the day's opening
+    stock lasts: a sale arriving at a short shelf takes what is left (its
+    amounts scaled to the quantity served), and at an empty shelf it is
+    lost demand and dropped. Returns restock the shelf. At close, a shelf at or
+    below its ReorderLevel with nothing on order orders back up to MaxStock,
+    arriving after its lead time (sometimes late).
+
+    Simulated day by day, vectorized across shelves. Returns the served
+    lines with consistent StockLevelBefore/After and per-shelf
+    ReorderLevel/MaxStock, and the stock receipts: one 'Opening' row per
+    shelf plus every 'Delivery' that landed.
+    """
+    rng = np.random.default_rng(_stream(seed, STOCK_STREAM))
+    by_shelf = df.groupby(['OutletID', 'ItemCode'], sort=True)
+    shelf = by_shelf.ngroup().values
+    shelves = by_shelf[['OutletName', 'ItemName', 'Category']].first().reset_index()
+    num_shelves = len(shelves)
+
+    num_days = (END_DATE - START_DATE).days + 1
+    day = (df['Date'].values.astype('datetime64[D]') - np.datetime64(START_DATE.date())).astype(np.int64)
+    live = df['Voided'].values == 'No'
+    sale = live & (df['IsReturn'].values == 'No')
+    returned = live & ~sale
+    qty = df['Quantity'].values.astype(np.int64)
+
+    # Policy sized to each shelf's demand rate
+    rate = np.bincount(shelf, weights=qty * sale, minlength=num_shelves) / num_days
+    lead = rng.integers(LEAD_DAYS[0], LEAD_DAYS[1] + 1, num_shelves)
+    cover = rng.integers(COVER_DAYS[0], COVER_DAYS[1] + 1, num_shelves)
+    reorder_level = np.ceil(rate * (lead + rng.uniform(*SAFETY_DAYS, num_shelves))).astype(np.int64)
+    max_stock = reorder_level + np.maximum(np.ceil(rate * cover).astype(np.int64), MIN_ORDER)
+
+    # Lines by day, shelf and time, with the quantity asked for and returned so far
+    # within each (day, shelf) group
+    order = np.lexsort((df['Date'].values, shelf, day))
+    s_shelf, s_qty, s_sale, s_returned = shelf[order], qty[order], sale[order], returned[order]
+    key = day[order] * num_shelves + s_shelf
+    first = np.r_[True, key[1:] != key[:-1]]
+    group = np.cumsum(first) - 1
+    group_start = np.flatnonzero(first)
+
+    def running(values: np.ndarray) -> np.ndarray:
+        total = np.cumsum(values)
+        return total - (total - values)[group_start][group]
+
+    wanted = running(s_qty * s_sale)
+    back = running(s_qty * s_returned)
+    day_start = np.searchsorted(day[order], np.arange(num_days + 1))
+
+    on_hand = max_stock.copy()
+    arrival = np.full(num_shelves, -1)
+    on_order = np.zeros(num_shelves, dtype=np.int64)
+    opening = np.zeros(len(df), dtype=np.int64)
+    after = np.zeros(len(df), dtype=np.int64)
+    deliveries = []
+    for d in range(num_days):
+        landing = np.flatnonzero(arrival == d)
+        on_hand[landing] += on_order[landing]
+        arrival[landing] = -1
+        lo, hi = day_start[d], day_start[d + 1]
+        if lo == hi:
+            continue
+
+        # Sold so far is the asked-for total capped at the day's opening stock
+        opening[lo:hi] = on_hand[s_shelf[lo:hi]]
+        after[lo:hi] = opening[lo:hi] - np.minimum(wanted[lo:hi], opening[lo:hi]) + back[lo:hi]
+        starts = group_start[group[lo]:group[hi - 1] + 1] - lo
+
+        touched = s_shelf[lo:hi][starts]
+        on_hand[touched] = after[lo:hi][np.r_[starts[1:], hi - lo] - 1]
+        due = touched[(on_hand[touched] <= reorder_level[touched]) & (arrival[touched] < 0)]
+        if len(due):
+            late = rng.random(len(due)) < LATE_DELIVERY_RATE
+            delay = np.where(late, rng.integers(LATE_DAYS[0], LATE_DAYS[1] + 1, len(due)), 0)
+            arrival[due] = d + lead[due] + delay
+            on_order[due] = max_stock[due] - on_hand[due]
+            deliveries.append(pd.DataFrame({'Shelf': due, 'OrderDay': d, 'Day': arrival[due], 'Quantity': on_order[due]}))
+
+    # Each sale gets what was left when it came, at most its quantity; returns and voids are unchanged
+    filled = np.where(s_sale, np.clip(opening - (wanted - s_qty * s_sale), 0, s_qty), s_qty)
+    before = after + np.where(s_sale, filled, 0) - np.where(s_returned, s_qty, 0)
+    stock_before, stock_after, quantity = np.empty_like(before), np.empty_like(after), np.empty_like(filled)
+    stock_before[order], stock_after[order], quantity[order] = before, after, filled
+    kept = quantity > 0
+
+    df = df.copy()
+    # Short-filled sales are re-priced at the quantity served (only sales are ever short)
+    short = kept & (quantity < qty)
+    if short.any():
+        total, cost = df['TotalPriceKES'].values.copy(), df['CostPriceKES'].values.astype(float)
+        total[short] = df['UnitPriceKES'].values[short] * quantity[short] * (1 - df['DiscountPercent'].values[short] / 100)
+        cost[short] = cost[short] / qty[short] * quantity[short]
+        df['Quantity'], df['TotalPriceKES'], df['CostPriceKES'] = quantity, total, cost
+        df['ProfitKES'] = np.where(short, total - cost, df['ProfitKES'].values)
+    position = df.columns.get_loc('Voided')
+    df.insert(position, 'StockLevelBefore', stock_before)
+    df.insert(position + 1, 'StockLevelAfter', stock_after)
+    df.insert(position + 2, 'ReorderLevel', reorder_level[shelf])
+    df.insert(position + 3, 'MaxStock', max_stock[shelf])
+
+    shelves['ReorderLevel'] = reorder_level
+    shelves['MaxStock'] = max_stock
+    delivered = (pd.concat(deliveries, ignore_index=True) if deliveries
+                 else pd.DataFrame({c: np.array([], dtype=np.int64) for c in ['Shelf', 'OrderDay', 'Day', 'Quantity']}))
+    delivered = delivered[delivered['Day'] < num_days]
+    start = pd.Timestamp(START_DATE)
+    receipts = pd.concat([
+        shelves.assign(Date=start, Kind='Opening', Quantity=max_stock, OrderDate=pd.NaT),
+        shelves.iloc[delivered['Shelf'].values].assign(
+            Date=(start + pd.to_timedelta(delivered['Day'].values, unit='D')
+                  + pd.Timedelta(hours=DELIVERY_HOUR)),
+            Kind='Delivery',
+            Quantity=delivered['Quantity'].values,
+            OrderDate=start + pd.to_timedelta(delivered['OrderDay'].values, unit='D')
+        )
+    ], ignore_index=True)
+    receipts = receipts[['Date', 'Kind', 'OutletID', 'OutletName', 'ItemCode', 'ItemName', 'Category',
+                         'Quantity', 'OrderDate', 'ReorderLevel', 'MaxStock']]
+
+    return (df[kept].reset_index(drop=True),
+            receipts.sort_values(['Date', 'OutletID', 'ItemCode'], kind='mergesort').reset_index(drop=True))
+
+
+def generate_pharmacy_data(num_rows: int = 2500, seed: int = 42,
+                           dims: Optional[Dict[str, pd.DataFrame]] = None,
+                           workers: int = 1, with_receipts: bool = False):
+    """Generate comprehensive Kenyan pharmacy data with employee shifts and detailed tracking.
+
+    One row per line item; lines bought together share a TransactionID.
+    ``num_rows`` counts lines of demand, not rows returned: the demand is
+    served from simulated shelf stock (see _serve_from_stock), so sales that
+    found the shelf empty are missing and the result has fewer rows. With ``with_receipts`` the
+    stock receipts are returned too, as ``(transactions, receipts)``.
+
+    ``dims`` holds the outlet, staff and catalog tables (see dimensions.py);
+    the three-outlet defaults in config/ are used when it is omitted. Rows are
+    allotted to outlet x month partitions by outlet weight and days in the
+    month, then each partition is generated on its own spawned RNG stream,
+    on ``workers`` processes, as column arrays joined once here. The stock
+    simulation runs in this process, so it bounds the gain from workers.
+    """
+    dims = dims if dims is not None else dimensions.default_dimensions()
+    outlets = dims['outlets']
+    staff = dims['staff']
+    months = _month_partitions(START_DATE, (END_DATE - START_DATE).days + 1)
+
+    # Partition sizes: one multinomial draw from the allocation stream
+    alloc_seq, part_seq = _stream(seed, TRANSACTION_STREAM).spawn(2)
+    outlet_share = outlets['Weight'].values / outlets['Weight'].sum()
+    month_share = np.array([len(m) for m in months]) / sum(len(m) for m in months)
+    sizes = np.random.default_rng(alloc_seq).multinomial(num_rows, np.outer(outlet_share, month_share).ravel())
+
+    # Each outlet's roster as staff table rows, with the shift and risk flag its partitions draw on
+    rosters = {oid: (rows, staff['Shift'].values[rows], staff['HighRisk'].values[rows] == 'Yes')
+               for oid, rows in staff.groupby('OutletID', sort=False).indices.items()}
+    seeds = part_seq.spawn(len(sizes))
+    tasks = []
+    for p, (outlet, days) in enumerate((o, m) for o in range(len(outlets)) for m in months):
+        if sizes[p] > 0:
+            tasks.append((outlet, rosters[outlets['OutletID'].iloc[outlet]], days, int(sizes[p]), seeds[p]))
+
+    parts = _run_partitions(_generate_transaction_partition, tasks, workers,
+                            initializer=_set_catalog, initargs=(_catalog_arrays(dims['catalog']),))
+    # Number baskets globally, in partition order, so every line of a basket shares its TransactionID
+    offsets = np.cumsum([0] + [part['_Basket'][-1] + 1 for part in parts[:-1]])
+    basket_no = np.concatenate([part['_Basket'] + offset for part, offset in zip(parts, offsets)])
+    order = np.argsort(np.concatenate([part['Date'] for part in parts]), kind='stable')
+    columns = {col: np.concatenate([part[col] for part in parts])[order] for col in parts[0] if col != '_Basket'}
+    del parts
+    columns['TransactionID'] = ('TXN' + pd.Series(basket_no[order] + 10001).astype(str)).values
+    df = pd.DataFrame(_transaction_columns(columns, dims))
+
+    df, receipts = _serve_from_stock(df, seed)
+    return (df, receipts) if with_receipts else df
+
+
+def _generate_login_partition(task: Tuple) -> pd.DataFrame:
+    """Generate login/logout records for one outlet's staff over one month."""
+    employees, days, seed_seq = task
+    rng = np.random.default_rng(seed_seq)
+    n_emp, n_days = len(employees), len(days)
+    n = n_emp * n_days
+
+    emp_pos = np.repeat(np.arange(n_emp), n_days)
+    day = np.tile(days, n_emp).astype('datetime64[ns]')
+    shift_idx = np.array([dimensions.SHIFTS.index(s) for s in employees['Shift']])[emp_pos]
+
+    # Rostered every day on their shift: in a little before it starts, out a little after it ends,
+    # except on the days they are absent or late
+    present = rng.random(n) >= ABSENCE_RATE
+    late = rng.random(n) < LATE_RATE
+    early_minutes = rng.integers(TILL_MARGIN_MINUTES[0], TILL_MARGIN_MINUTES[1] + 1, size=n)
+    late_minutes = rng.integers(LATE_MINUTES[0], LATE_MINUTES[1] + 1, size=n)
+    stay_minutes = rng.integers(TILL_MARGIN_MINUTES[0], TILL_MARGIN_MINUTES[1] + 1, size=n)
+    login_time = day + (EXPECTED_LOGIN[shift_idx] * 60 + np.where(late, late_minutes, -early_minutes)).astype('timedelta64[m]')
+    logout_time = day + (EXPECTED_LOGOUT[shift_idx] * 60 + stay_minutes).astype('timedelta64[m]')
+    hours_worked = (logout_time - login_time).astype('timedelta64[s]').astype(float) / 3600
+
+    return pd.DataFrame({
+        'Date': pd.DatetimeIndex(day).date,
+        'CashierID': employees['CashierID'].values[emp_pos],
+        'CashierName': employees['CashierName'].values[emp_pos],
+        'OutletName': employees['OutletName'].values[emp_pos],
+        'Shift': employees['Shift'].values[emp_pos],
+        'LoginTime': pd.DatetimeIndex(np.where(present, login_time, np.datetime64('NaT'))),
+        'LogoutTime': pd.DatetimeIndex(np.where(present, logout_time, np.datetime64('NaT'))),
+        'HoursWorked': np.where(present, hours_worked, 0.0),
+        'IsLate': present & late,
+        'Status': np.where(present, 'Present', 'Absent')
+    })
+
+
+def generate_employee_logins(dims: Optional[Dict[str, pd.DataFrame]] = None, seed: int = 42,
+                             workers: int = 1) -> pd.DataFrame:
+    """Generate employee login/logout records over the sales window, partitioned by outlet x month.
+
+    Drawn from the staff roster alone, so it needs no transactions and can
+    run alongside them. Every cashier is rostered every day on their shift,
+    which covers the hours transactions assign to it; ABSENCE_RATE of those
+    days they do not log in and LATE_RATE they log in late, so sales rung
+    then show up as sales while logged out.
+    """
+    dims = dims if dims is not None else dimensions.default_dimensions()
+    employees = dims['staff'].merge(dims['outlets'][['OutletID', 'OutletName']], on='OutletID') \
+        .sort_values('CashierID', kind='mergesort')
+    months = _month_partitions(START_DATE, (END_DATE - START_DATE).days + 1)
+    groups = [g for _, g in employees.groupby('OutletName', sort=True)]
+    seeds = _stream(seed, LOGIN_STREAM).spawn(len(groups) * len(months))
+    tasks = [(g, m, seeds[i * len(months) + j]) for i, g in enumerate(groups) for j, m in enumerate(months)]
+
+    parts = _run_partitions(_generate_login_partition, tasks, workers)
+    logins = pd.concat(parts, ignore_index=True)
+    return logins.sort_values(['CashierID', 'Date'], kind='mergesort').reset_index(drop=True)
+
+
+def generate_inventory_data(df: pd.DataFrame, receipts: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+    """Current inventory status per item, summed over outlets.
+
+    Stock on hand comes from the stock ledger (see stock_ledger.py) when the
+    receipts are given; otherwise it is each shelf's StockLevelAfter on its
+    last line in ``df``, which misses deliveries landed since that line.
+    """
+    if receipts is not None:
+        shelves = StockLedger.from_transactions(df, receipts).closing_stock()
+    else:
+        shelves = df.groupby(['OutletID', 'ItemCode'], sort=False).agg(
+            Stock=('StockLevelAfter', 'last'), ReorderLevel=('ReorderLevel', 'first'), MaxStock=('MaxStock', 'first')
+        ).reset_index()
+    stock = shelves.groupby('ItemCode')[['Stock', 'ReorderLevel', 'MaxStock']].sum()
+
+    inventory = df.groupby(['ItemCode', 'ItemName', 'Category', 'UnitPriceKES']).agg({
+        'Quantity': 'sum',
+        'CostPriceKES': 'first',
+        'ExpiryDate': 'min',
+        'DaysToExpiry': 'min'
+    }).reset_index()
+    inventory.insert(4, 'ReorderLevel', inventory['ItemCode'].map(stock['ReorderLevel']).values)
+    inventory.insert(5, 'MaxStock', inventory['ItemCode'].map(stock['MaxStock']).values)
+    inventory['CurrentStock'] = inventory['ItemCode'].map(stock['Stock']).values
+
+    inventory['StockValue'] = inventory['CurrentStock'] * inventory['UnitPriceKES']
+    inventory['StockStatus'] = np.select(
+        [inventory['CurrentStock'] <= inventory['ReorderLevel'] * 0.5,
+         inventory['CurrentStock'] <= inventory['ReorderLevel']],
+        ['Critical', 'Low'],
+        default='Good'
+    )
+
+    inventory['NeedsReorder'] = inventory['CurrentStock'] <= inventory['ReorderLevel']
+    inventory['ReorderQty'] = np.where(inventory['NeedsReorder'], inventory['MaxStock'] - inventory['CurrentStock'], 0)
+
+    return inventory
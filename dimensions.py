@@ -0,0 +1,175 @@
+"""
+BiasharaFlow Pharma - Outlet, staff and catalog dimensions
+Dimension tables driving the data generator. They come from the shipped
+CSV files in config/, from CSV files in another directory, or from a
+synthetic scale-out.
+"""
+
+import os
+import pandas as pd
+import numpy as np
+from typing import Dict, Optional
+
+
+OUTLET_COLUMNS = ['OutletID', 'OutletName', 'City', 'Rent', 'MonthlyTarget', 'Weight']
+STAFF_COLUMNS = ['CashierID', 'CashierName', 'OutletID', 'Shift', 'HireDate', 'Salary', 'HighRisk']
+CATALOG_COLUMNS = ['ItemCode', 'ItemName', 'Category', 'UnitPriceKES', 'CostPriceKES',
+                   'PrescriptionRequired', 'ReorderLevel', 'MaxStock', 'Weight', 'Seasonal']
+
+SHIFTS = ['Morning', 'Afternoon', 'Evening']
+
+# The shipped dimension tables, used when no other directory or scale is given
+DEFAULT_DIMENSIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config')
+
+
+# ============================================================================
+# SECTION 1: DEFAULT DIMENSIONS
+# ============================================================================
+
+def default_dimensions() -> Dict[str, pd.DataFrame]:
+    """The original three outlets, nine cashiers and thirty medicines, from config/."""
+    return load_dimensions(DEFAULT_DIMENSIONS_DIR)
+
+
+# ============================================================================
+# SECTION 2: FILE-BASED DIMENSIONS
+# ============================================================================
+
+def _check_columns(table: pd.DataFrame, required, name: str) -> None:
+    missing = [c for c in required if c not in table.columns]
+    if missing:
+        raise ValueError(f"{name} is missing columns: {', '.join(missing)}")
+
+
+def load_dimensions(directory: str) -> Dict[str, pd.DataFrame]:
+    """Load outlets.csv, staff.csv and catalog.csv from ``directory``.
+
+    Weight columns are optional and default to uniform; HighRisk and
+    Seasonal default to 'No'.
+    """
+    outlets = pd.read_csv(os.path.join(directory, 'outlets.csv'))
+    staff = pd.read_csv(os.path.join(directory, 'staff.csv'), dtype={'HireDate': str})
+    catalog = pd.read_csv(os.path.join(directory, 'catalog.csv'))
+
+    outlets = outlets if 'Weight' in outlets.columns else outlets.assign(Weight=1.0)
+    staff = staff if 'HighRisk' in staff.columns else staff.assign(HighRisk='No')
+    catalog = catalog if 'Weight' in catalog.columns else catalog.assign(Weight=1.0)
+    catalog = catalog if 'Seasonal' in catalog.columns else catalog.assign(Seasonal='No')
+
+    _check_columns(outlets, OUTLET_COLUMNS, 'outlets.csv')
+    _check_columns(staff, STAFF_COLUMNS, 'staff.csv')
+    _check_columns(catalog, CATALOG_COLUMNS, 'catalog.csv')
+
+    unknown = set(staff['OutletID']) - set(outlets['OutletID'])
+    if unknown:
+        raise ValueError(f"staff.csv references unknown outlets: {', '.join(sorted(unknown))}")
+    repeated = staff.loc[staff['CashierName'].duplicated(), 'CashierName']
+    if len(repeated):
+        raise ValueError(f"staff.csv repeats cashier names (filters and alerts go by name): "
+                         f"{', '.join(sorted(set(repeated)))}")
+
+    return {
+        'outlets': outlets[OUTLET_COLUMNS],
+        'staff': staff[STAFF_COLUMNS],
+        'catalog': catalog[CATALOG_COLUMNS],
+    }
+
+
+def save_dimensions(dims: Dict[str, pd.DataFrame], directory: str) -> None:
+    """Write dimension tables to ``directory`` in the load_dimensions layout."""
+    os.makedirs(directory, exist_ok=True)
+    for name, table in dims.items():
+        table.to_csv(os.path.join(directory, f'{name}.csv'), index=False)
+
+
+# ============================================================================
+# SECTION 3: SYNTHETIC SCALE-OUT
+# ============================================================================
+
+CITIES = ['Nairobi', 'Mombasa', 'Kisumu', 'Nakuru', 'Eldoret', 'Thika', 'Machakos', 'Nyeri',
+          'Meru', 'Kericho', 'Kakamega', 'Malindi', 'Kitale', 'Garissa', 'Embu', 'Naivasha']
+FIRST_NAMES = ['Jane', 'Peter', 'Grace', 'Hassan', 'Fatma', 'Kevin', 'Lucy', 'James', 'Mary',
+               'Brian', 'Faith', 'Dennis', 'Mercy', 'Collins', 'Esther', 'Moses', 'Agnes', 'Samuel']
+LAST_NAMES = ['Wanjiku', 'Omondi', 'Muthoni', 'Ali', 'Said', 'Otieno', 'Achieng', 'Kiprop', 'Nekesa',
+              'Kamau', 'Njeri', 'Mutua', 'Chebet', 'Wafula', 'Akinyi', 'Kariuki', 'Barasa', 'Cheruiyot']
+
+
+def synthesize_dimensions(num_outlets: int, staff_per_outlet: int, num_skus: int,
+                          seed: int = 42) -> Dict[str, pd.DataFrame]:
+    """Build N outlets x M staff x K SKUs with skewed, realistic weights.
+
+    Outlet traffic is log-normal (a few flagship branches dominate), SKU
+    popularity follows a Zipf curve over a shuffled catalog, and prices are
+    log-normal within each category, sampled around the default catalog.
+    Cashier names are unique: a name drawn again gets a number ('Jane Wanjiku 2').
+    """
+    for name, value in [('num_outlets', num_outlets), ('staff_per_outlet', staff_per_outlet), ('num_skus', num_skus)]:
+        if value < 1:
+            raise ValueError(f"{name} must be at least 1, got {value}")
+    rng = np.random.default_rng(seed)
+    base = default_dimensions()
+
+    # Outlets: log-normal traffic share, targets and rent proportional to it
+    weight = rng.lognormal(mean=0.0, sigma=0.6, size=num_outlets)
+    weight = weight / weight.sum()
+    city = rng.choice(CITIES, size=num_outlets)
+    outlets = pd.DataFrame({
+        'OutletID': [f'OUT{i + 1:03d}' for i in range(num_outlets)],
+        'OutletName': [f'{c} {i + 1:03d}' for i, c in enumerate(city)],
+        'City': city,
+        'Rent': (60000 + weight * num_outlets * 60000).round(-3).astype(int),
+        'MonthlyTarget': (300000 + weight * num_outlets * 400000).round(-4).astype(int),
+        'Weight': weight,
+    })
+
+    # Staff: shifts rotate within each outlet, a small share carry a high-risk profile
+    n_staff = num_outlets * staff_per_outlet
+    staff_outlet = np.repeat(outlets['OutletID'].values, staff_per_outlet)
+    shift = np.tile(np.resize(SHIFTS, staff_per_outlet), num_outlets)
+    hire_days = rng.integers(0, 4 * 365, size=n_staff)
+    names = pd.Series([f'{f} {l}' for f, l in zip(rng.choice(FIRST_NAMES, size=n_staff),
+                                                 rng.choice(LAST_NAMES, size=n_staff))])
+    repeat = names.groupby(names).cumcount().values
+    staff = pd.DataFrame({
+        'CashierID': [f'C{i + 1:04d}' for i in range(n_staff)],
+        'CashierName': np.where(repeat > 0, names + ' ' + (repeat + 1).astype(str), names),
+        'OutletID': staff_outlet,
+        'Shift': shift,
+        'HireDate': (pd.Timestamp('2020-01-01') + pd.to_timedelta(hire_days, unit='D')).strftime('%Y-%m-%d'),
+        'Salary': rng.integers(38, 55, size=n_staff) * 1000,
+        'HighRisk': np.where(rng.random(n_staff) < 0.05, 'Yes', 'No'),
+    })
+
+    # Catalog: variants of the default lines with Zipf popularity
+    template = base['catalog'].iloc[rng.integers(0, len(base['catalog']), size=num_skus)].reset_index(drop=True)
+    price = (template['UnitPriceKES'].values * rng.lognormal(0.0, 0.35, size=num_skus)).round().clip(10)
+    margin = rng.uniform(0.30, 0.45, size=num_skus)
+    ranks = rng.permutation(num_skus) + 1
+    popularity = 1.0 / ranks ** 1.1
+    catalog = pd.DataFrame({
+        'ItemCode': [f'MED{i + 1:05d}' for i in range(num_skus)],
+        'ItemName': [f'{name} #{i + 1}' for i, name in enumerate(template['ItemName'])],
+        'Category': template['Category'],
+        'UnitPriceKES': price.astype(int),
+        'CostPriceKES': (price * (1 - margin)).round().astype(int),
+        'PrescriptionRequired': template['PrescriptionRequired'],
+        'ReorderLevel': template['ReorderLevel'],
+        'MaxStock': template['MaxStock'],
+        'Weight': popularity / popularity.sum(),
+        'Seasonal': template['Seasonal'],
+    })
+
+    return {'outlets': outlets, 'staff': staff, 'catalog': catalog}
+
+
+def parse_scale(spec: str) -> Optional[Dict[str, int]]:
+    """Parse an 'OUTLETSxSTAFFxSKUS' spec such as '200x10x10000'."""
+    if not spec:
+        return None
+    parts = spec.lower().split('x')
+    if len(parts) != 3 or not all(p.strip().isdigit() for p in parts):
+        raise ValueError(f"Scale must look like OUTLETSxSTAFFxSKUS, got {spec!r}")
+    num_outlets, staff_per_outlet, num_skus = (int(p) for p in parts)
+    if min(num_outlets, staff_per_outlet, num_skus) < 1:
+        raise ValueError(f"Scale needs at least 1 outlet, 1 staff per outlet and 1 SKU, got {spec!r}")
+    return {'num_outlets': num_outlets, 'staff_per_outlet': staff_per_outlet, 'num_skus': num_skus}
@@ -0,0 +1,215 @@
+"""
+BiasharaFlow Pharma - Discount leakage
+Revenue forgone to discounts (list price minus realized price) rolled up
+once into a cube over day x outlet x cashier x customer type x SKU, so any
+breakdown or drill-down is a masked bincount over the cube's cells rather
+than a scan of the line items. Breakdowns that need neither the SKU nor the
+day read whole months from a month x outlet x cashier x customer type
+rollup, a small fraction of the cube's size.
+
+Usage:
+    python discounts.py --rows 1000000 --scale 200x10x10000
+"""
+
+import argparse
+import time
+from datetime import date
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import pandas as pd
+import numpy as np
+
+
+# Cube axes; Category comes from the SKU, Week and Month from the day. Cashiers are
+# labelled 'Name (ID)', since names alone can repeat across a large chain
+AXES = ['Day', 'OutletName', 'Cashier', 'CustomerType', 'ItemName']
+DIMENSIONS = ['Cashier', 'CustomerType', 'ItemName', 'Category', 'OutletName', 'Day', 'Week', 'Month']
+MEASURES = ['ListKES', 'RealizedKES', 'ForgoneKES', 'Lines', 'DiscountedLines']
+
+# The month rollup drops the SKU and the day, so it answers only these dimensions
+ROLLUP_AXES = ['Month', 'OutletName', 'Cashier', 'CustomerType']
+
+
+class DiscountCube:
+    """List and realized revenue of completed sales per (day, outlet, cashier, customer type, SKU) cell.
+
+    Built with one grouped aggregation over integer-coded axes. Each cell
+    keeps its axis codes and measure totals as flat arrays, sorted by day; a
+    query masks the cells its filters allow and sums the measures per code
+    of the requested dimension with bincount. When the query involves only
+    ROLLUP_AXES, whole months in the date range come from the month rollup
+    and only the days of partly covered months from the cube itself.
+    """
+
+    def __init__(self, codes: Dict[str, np.ndarray], labels: Dict[str, np.ndarray], measures: Dict[str, np.ndarray],
+                 derived: Dict[str, Tuple[str, np.ndarray]],
+                 rollup: Tuple[Dict[str, np.ndarray], Dict[str, np.ndarray]]):
+        self.codes = codes
+        self.labels = labels
+        self.measures = measures
+        # Dimension -> (axis it rolls up, axis code -> dimension code)
+        self._derived = derived
+        self._rollup_codes, self._rollup_measures = rollup
+        # Cells of day code d are rows _day_starts[d]:_day_starts[d + 1]; months are runs of days
+        n_days, n_months = len(labels['Day']), len(labels['Month'])
+        self._day_starts = np.searchsorted(codes['Day'], np.arange(n_days + 1))
+        month_of_day = derived['Month'][1]
+        self._month_days = (np.searchsorted(month_of_day, np.arange(n_months)),
+                            np.searchsorted(month_of_day, np.arange(n_months), side='right') - 1)
+
+    @classmethod
+    def from_transactions(cls, sales_df: pd.DataFrame) -> 'DiscountCube':
+        """Roll completed sales (no voids or returns) up to cube cells."""
+        day = sales_df['Date'].values.astype('datetime64[D]')
+        axis_codes, labels = [], {}
+        cashier = (sales_df['CashierName'] + ' (' + sales_df['CashierID'] + ')').values
+        columns = [day, sales_df['OutletName'].values, cashier, sales_df['CustomerType'].values,
+                   sales_df['ItemName'].values]
+        for axis, values in zip(AXES, columns):
+            code, uniques = pd.factorize(values, sort=True)
+            axis_codes.append(code)
+            labels[axis] = np.asarray(uniques)
+
+        list_value = sales_df['UnitPriceKES'].values * sales_df['Quantity'].values
+        realized = sales_df['TotalPriceKES'].values
+        lines = pd.DataFrame({axis: code for axis, code in zip(AXES, axis_codes)})
+        lines['ListKES'] = list_value
+        lines['RealizedKES'] = realized
+        lines['ForgoneKES'] = list_value - realized
+        lines['Lines'] = 1
+        lines['DiscountedLines'] = (sales_df['DiscountPercent'].values > 0).astype(np.int64)
+        cells = lines.groupby(AXES, sort=False).sum().reset_index().sort_values('Day', kind='stable')
+
+        # Roll-ups: SKU -> Category, day -> ISO week start and month
+        item_category = sales_df.drop_duplicates('ItemName').set_index('ItemName')['Category']
+        category, labels['Category'] = pd.factorize(item_category.reindex(labels['ItemName']).values, sort=True)
+        days = pd.DatetimeIndex(labels['Day'])
+        week, labels['Week'] = pd.factorize((days - pd.to_timedelta(days.dayofweek, unit='D')).date, sort=True)
+        month, labels['Month'] = pd.factorize(days.strftime('%Y-%m'), sort=True)
+        labels['Day'] = days.date
+        labels = {name: np.asarray(values) for name, values in labels.items()}
+        derived = {'Category': ('ItemName', category), 'Week': ('Day', week), 'Month': ('Day', month)}
+
+        codes = {axis: cells[axis].values.astype(np.int32) for axis in AXES}
+        measures = {m: cells[m].values.astype(np.float64) for m in MEASURES}
+
+        months = cells[ROLLUP_AXES[1:] + MEASURES].assign(Month=month[codes['Day']])
+        months = months.groupby(ROLLUP_AXES, sort=False).sum().reset_index()
+        rollup = ({axis: months[axis].values.astype(np.int32) for axis in ROLLUP_AXES},
+                  {m: months[m].values.astype(np.float64) for m in MEASURES})
+        return cls(codes, labels, measures, derived, rollup)
+
+    def __len__(self) -> int:
+        return len(self.measures['Lines'])
+
+    def _dimension_codes(self, dimension: str, codes: Dict[str, np.ndarray]) -> np.ndarray:
+        if dimension not in codes and dimension in self._derived:
+            axis, mapping = self._derived[dimension]
+            return mapping[codes[axis]]
+        return codes[dimension]
+
+    def _cells(self, by: str, date_range: Optional[Tuple[date, date]] = None,
+               selections: Optional[Dict[str, Sequence]] = None) -> List[Tuple[np.ndarray, Dict[str, np.ndarray]]]:
+        """Codes of ``by`` and measures of the cells in the selection, as pieces to be summed."""
+        # Selections that keep every value don't restrict the query (or keep it off the rollup)
+        allowed = {d: np.isin(self.labels[d], np.asarray(list(values), dtype=object))
+                   for d, values in (selections or {}).items() if values is not None}
+        allowed = {d: keep for d, keep in allowed.items() if not keep.all()}
+        first, last = 0, len(self.labels['Day']) - 1
+        if date_range is not None and len(date_range) == 2:
+            days = self.labels['Day']
+            first = int(np.searchsorted(days, date_range[0], side='left'))
+            last = int(np.searchsorted(days, date_range[1], side='right')) - 1
+
+        # Whole months come from the rollup when it has every dimension involved
+        day_runs, pieces = [(first, last)], []
+        month_first, month_last = self._month_days
+        whole = np.flatnonzero((month_first >= first) & (month_last <= last))
+        if len(whole) and {by, *allowed} <= set(ROLLUP_AXES):
+            day_runs = [(first, month_first[whole[0]] - 1), (month_last[whole[-1]] + 1, last)]
+            in_rollup = np.isin(self._rollup_codes['Month'], whole)
+            pieces.append((self._rollup_codes, self._rollup_measures, in_rollup))
+        for start, end in day_runs:
+            if start <= end:
+                rows = slice(self._day_starts[start], self._day_starts[end + 1])
+                codes = {axis: code[rows] for axis, code in self.codes.items()}
+                measures = {m: values[rows] for m, values in self.measures.items()}
+                pieces.append((codes, measures, np.ones(len(codes['Day']), dtype=bool)))
+
+        cells = []
+        for codes, measures, mask in pieces:
+            for dimension, keep in allowed.items():
+                mask &= keep[self._dimension_codes(dimension, codes)]
+            cells.append((self._dimension_codes(by, codes)[mask], {m: values[mask] for m, values in measures.items()}))
+        return cells
+
+    def leakage(self, by: str, date_range: Optional[Tuple[date, date]] = None,
+                selections: Optional[Dict[str, Sequence]] = None) -> pd.DataFrame:
+        """Forgone revenue per value of ``by`` within the selection, biggest leak first.
+
+        ``selections`` maps dimensions (any of DIMENSIONS) to the values to
+        keep, e.g. {'OutletName': [...], 'CustomerType': ['Corporate']};
+        a drill-down pins one more dimension per step. LeakagePct is forgone
+        revenue as a share of list revenue.
+        """
+        n = len(self.labels[by])
+        totals = {m: np.zeros(n) for m in MEASURES}
+        for code, measures in self._cells(by, date_range, selections):
+            for m in MEASURES:
+                totals[m] += np.bincount(code, weights=measures[m], minlength=n)
+        table = pd.DataFrame({by: self.labels[by], **totals})
+        table = table[table['Lines'] > 0]
+        table[['Lines', 'DiscountedLines']] = table[['Lines', 'DiscountedLines']].astype(np.int64)
+        table['LeakagePct'] = np.divide(table['ForgoneKES'] * 100, table['ListKES'],
+                                        out=np.zeros(len(table)), where=table['ListKES'].values > 0)
+        table['ShareOfLeakage'] = table['ForgoneKES'] / max(table['ForgoneKES'].sum(), 1e-9) * 100
+        return table.sort_values('ForgoneKES', ascending=False, kind='mergesort').reset_index(drop=True)
+
+    def totals(self, date_range: Optional[Tuple[date, date]] = None,
+               selections: Optional[Dict[str, Sequence]] = None) -> Dict[str, float]:
+        """Headline list, realized and forgone revenue, lines and leakage % of the selection."""
+        cells = self._cells('OutletName', date_range, selections)
+        totals = {m: float(sum(measures[m].sum() for _, measures in cells)) for m in MEASURES}
+        totals['LeakagePct'] = totals['ForgoneKES'] / totals['ListKES'] * 100 if totals['ListKES'] > 0 else 0.0
+        return totals
+
+    def values(self, dimension: str) -> List:
+        """Every label of ``dimension``, for drill-down pickers."""
+        return self.labels[dimension].tolist()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    import data_generation
+    import dimensions
+    import analytics
+
+    parser = argparse.ArgumentParser(description="Build the discount cube and time drill-down queries.")
+    parser.add_argument('--rows', type=int, default=2500, help="Synthetic transactions to generate")
+    parser.add_argument('--seed', type=int, default=42, help="Generator seed")
+    parser.add_argument('--scale', default='', help="Synthetic OUTLETSxSTAFFxSKUS, e.g. 200x10x10000")
+    args = parser.parse_args(argv)
+
+    dims = dimensions.synthesize_dimensions(**dimensions.parse_scale(args.scale), seed=args.seed) \
+        if args.scale else None
+    sales_df = analytics.sales_only(data_generation.generate_pharmacy_data(args.rows, args.seed, dims))
+
+    t0 = time.perf_counter()
+    cube = DiscountCube.from_transactions(sales_df)
+    print(f"Rolled {len(sales_df):,} sales into {len(cube):,} cells and {len(cube._rollup_measures['Lines']):,} "
+          f"month rollup cells in {time.perf_counter() - t0:.2f}s")
+
+    totals = cube.totals()
+    print(f"Forgone KES {totals['ForgoneKES']:,.0f} of {totals['ListKES']:,.0f} list ({totals['LeakagePct']:.2f}%)")
+    selections: Dict[str, Sequence] = {}
+    for dimension in ['CustomerType', 'OutletName', 'Cashier', 'ItemName']:
+        t0 = time.perf_counter()
+        table = cube.leakage(dimension, selections=selections)
+        ms = (time.perf_counter() - t0) * 1000
+        top = table.iloc[0]
+        print(f"  by {dimension:<12} {len(table):>6,} rows in {ms:6.1f} ms; top: {top[dimension]} "
+              f"(KES {top['ForgoneKES']:,.0f}, {top['LeakagePct']:.1f}%)")
+        selections[dimension] = [top[dimension]]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+BiasharaFlow Pharma - Startup loader
+Resolves the dataset loads (transactions, stock receipts, logins, inventory and the frames
+derived from them) as a small dependency DAG and runs independent loads
+concurrently, reporting each load's time and critical path.
+"""
+
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import pandas as pd
+
+import analytics
+import data_generation
+import price_anomalies
+
+
+# ============================================================================
+# SECTION 1: DAG EXECUTION
+# ============================================================================
+
+# name -> (function of its dependencies' results, dependency names)
+Stages = Dict[str, Tuple[Callable[..., Any], Sequence[str]]]
+
+
+def _check_dag(stages: Stages) -> None:
+    """Raise ValueError on unknown dependencies or cycles."""
+    for name, (_, deps) in stages.items():
+        unknown = [d for d in deps if d not in stages]
+        if unknown:
+            raise ValueError(f"Load stage '{name}' depends on unknown stage(s): {', '.join(unknown)}")
+    resolved, pending = set(), dict(stages)
+    while pending:
+        ready = [n for n, (_, deps) in pending.items() if set(deps) <= resolved]
+        if not ready:
+            raise ValueError(f"Load stages form a cycle: {', '.join(sorted(pending))}")
+        resolved.update(ready)
+        for n in ready:
+            del pending[n]
+
+
+def critical_paths(timings: pd.DataFrame, stages: Stages) -> pd.DataFrame:
+    """Add each stage's critical path: the longest chain of stage times ending in it.
+
+    ``CriticalPath`` is what the stage would finish at with unlimited
+    workers; ``Finish`` is what it actually finished at, so the gap between
+    them is time spent waiting for a free worker.
+    """
+    seconds = dict(zip(timings['Stage'], timings['Seconds']))
+    longest: Dict[str, Tuple[float, List[str]]] = {}
+
+    def chain(name: str) -> Tuple[float, List[str]]:
+        if name not in longest:
+            before = max((chain(d) for d in stages[name][1]), default=(0.0, []), key=lambda c: c[0])
+            longest[name] = (before[0] + seconds[name], before[1] + [name])
+        return longest[name]
+
+    timings = timings.copy()
+    timings['CriticalPath'] = [chain(n)[0] for n in timings['Stage']]
+    timings['Path'] = [' → '.join(chain(n)[1]) for n in timings['Stage']]
+    slowest = max(longest.values(), key=lambda c: c[0])[1] if longest else []
+    timings['OnCriticalPath'] = timings['Stage'].isin(slowest)
+    return timings.reset_index(drop=True)
+
+
+def run_dag(stages: Stages, max_workers: Optional[int] = None) -> Tuple[Dict[str, Any], pd.DataFrame]:
+    """Run every stage once its dependencies are done, independent stages in parallel threads.
+
+    Each stage function is called with its dependencies' results as
+    positional arguments, in the order listed. Returns the results by stage
+    name and a timing table with Start/Finish (seconds since the loader
+    started), Seconds, CriticalPath, Path and OnCriticalPath.
+    """
+    _check_dag(stages)
+    results: Dict[str, Any] = {}
+    records = []
+    t0 = time.perf_counter()
+
+    def timed(name: str) -> Tuple[str, float, float, Any]:
+        func, deps = stages[name]
+        start = time.perf_counter()
+        value = func(*(results[d] for d in deps))
+        return name, start - t0, time.perf_counter() - t0, value
+
+    pending = dict(stages)
+    running = set()
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while pending or running:
+            ready = [n for n, (_, deps) in pending.items() if all(d in results for d in deps)]
+            for name in ready:
+                running.add(pool.submit(timed, name))
+                del pending[name]
+            done, running = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name, start, finish, value = future.result()
+                results[name] = value
+                records.append({'Stage': name, 'Start': start, 'Finish': finish, 'Seconds': finish - start})
+
+    timings = pd.DataFrame(records, columns=['Stage', 'Start', 'Finish', 'Seconds']).sort_values('Start')
+    return results, critical_paths(timings, stages)
+
+
+# ============================================================================
+# SECTION 2: DASHBOARD DATASETS
+# ============================================================================
+
+def dataset_stages(num_rows: int = 2500, seed: int = 42,
+                   dims: Optional[Dict[str, pd.DataFrame]] = None, workers: int = 1) -> Stages:
+    """The dashboard's loads and what each one needs.
+
+    Transactions and stock receipts come out of one simulation ('stock');
+    transactions are scored against their SKU price baselines on the way out.
+    Logins are drawn from the staff roster alone, so they run alongside the
+    simulation, scoring, inventory and the sales-only view.
+    """
+    return {
+        'stock': (lambda: data_generation.generate_pharmacy_data(num_rows, seed, dims, workers=workers,
+                                                                 with_receipts=True), []),
+        'transactions': (lambda stock: price_anomalies.score_lines(stock[0]), ['stock']),
+        'receipts': (lambda stock: stock[1], ['stock']),
+        'logins': (lambda: data_generation.generate_employee_logins(dims, seed, workers=workers), []),
+        'inventory': (data_generation.generate_inventory_data, ['transactions', 'receipts']),
+        'sales': (analytics.sales_only, ['transactions']),
+    }
+
+
+def load_datasets(num_rows: int = 2500, seed: int = 42,
+                  dims: Optional[Dict[str, pd.DataFrame]] = None, workers: int = 1,
+                  max_workers: Optional[int] = None) -> Tuple[Dict[str, pd.DataFrame], pd.DataFrame]:
+    """Load transactions, receipts, logins, inventory and sales concurrently; returns (frames, timings)."""
+    results, timings = run_dag(dataset_stages(num_rows, seed, dims, workers), max_workers)
+    return {name: results[name] for name in ['transactions', 'receipts', 'logins', 'inventory', 'sales']}, timings
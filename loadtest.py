@@ -0,0 +1,371 @@
+"""
+BiasharaFlow Pharma - Concurrent session load test
+Starts app.py under `streamlit run` and drives it with N scripted websocket
+clients, each a simulated branch manager changing sidebar filters and every
+tab's view selectors, then reports rerun latency percentiles, throughput
+and the server's memory per session.
+
+Usage:
+    python loadtest.py --sessions 8 --steps 12 --rows 50000 --scale 40x10x2000
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+import numpy as np
+import websockets
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app.py')
+
+WIDGET_KINDS = ('multiselect', 'date_input', 'slider', 'radio', 'selectbox', 'button')
+
+
+# ============================================================================
+# SECTION 1: SERVER
+# ============================================================================
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(port: int, env: Dict[str, str], timeout: float = 60) -> subprocess.Popen:
+    """Run app.py headless on ``port`` and wait until its health check answers."""
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'streamlit', 'run', APP_PATH,
+         '--server.headless', 'true', '--server.port', str(port),
+         '--server.enableXsrfProtection', 'false', '--server.fileWatcherType', 'none',
+         '--browser.gatherUsageStats', 'false', '--logger.level', 'error'],
+        env={**os.environ, **env}, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"streamlit exited with code {server.returncode} before serving")
+        try:
+            with urllib.request.urlopen(f'http://127.0.0.1:{port}/_stcore/health', timeout=1):
+                return server
+        except OSError:
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError(f"streamlit did not answer on port {port} within {timeout:.0f}s")
+
+
+def rss_mb(pid: int) -> float:
+    """Resident memory of a process in MB (0 where /proc is unavailable)."""
+    try:
+        with open(f'/proc/{pid}/status') as status:
+            for line in status:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+
+# ============================================================================
+# SECTION 2: SCRIPTED SESSIONS
+# ============================================================================
+
+@dataclass
+class Widget:
+    """A widget as the server last described it, and the value this client holds for it."""
+    kind: str
+    id: str
+    label: str
+    options: List = field(default_factory=list)
+    bounds: Tuple = ()
+    value: object = None
+
+
+def _widget_from_element(kind: str, proto) -> Widget:
+    """Client-side widget holding the server's default value."""
+    widget = Widget(kind, proto.id, proto.label)
+    if kind == 'multiselect':
+        widget.options = list(proto.options)
+        widget.value = [widget.options[i] for i in proto.default]
+    elif kind in ('radio', 'selectbox'):
+        widget.options = list(proto.options)
+        widget.value = widget.options[proto.default] if proto.HasField('default') else None
+    elif kind in ('date_input', 'slider'):
+        widget.bounds = (proto.min, proto.max)
+        widget.value = list(proto.default)
+    return widget
+
+
+class Session:
+    """One browser tab: a websocket to the server and the widget values it sends on each rerun."""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.widgets: Dict[str, Widget] = {}
+        self.clicked: Optional[str] = None
+        self._ws = None
+
+    async def connect(self) -> None:
+        self._ws = await websockets.connect(self.url, subprotocols=['streamlit'], max_size=None)
+
+    async def close(self) -> None:
+        await self._ws.close()
+
+    def widget(self, label: str) -> Widget:
+        for widget in self.widgets.values():
+            if widget.label == label:
+                return widget
+        raise LookupError(f"No widget labelled '{label}' on the page")
+
+    def _rerun_msg(self) -> BackMsg:
+        msg = BackMsg()
+        msg.rerun_script.query_string = ''
+        msg.rerun_script.page_script_hash = ''
+        for widget in self.widgets.values():
+            state = msg.rerun_script.widget_states.widgets.add()
+            state.id = widget.id
+            if widget.kind == 'button':
+                state.trigger_value = widget.id == self.clicked
+            elif widget.kind in ('multiselect', 'date_input'):
+                state.string_array_value.data.extend(widget.value)
+            elif widget.kind == 'slider':
+                state.double_array_value.data.extend(widget.value)
+            elif widget.value is not None:
+                state.string_value = widget.value
+        return msg
+
+    async def rerun(self) -> Dict:
+        """Send every widget's value, as a browser does, and wait for the script to finish."""
+        t0 = time.perf_counter()
+        await self._ws.send(self._rerun_msg().SerializeToString())
+        self.clicked = None
+        seen, messages, received, errors = {}, 0, 0, 0
+        while True:
+            raw = await self._ws.recv()
+            messages += 1
+            received += len(raw)
+            msg = ForwardMsg()
+            msg.ParseFromString(raw)
+            kind = msg.WhichOneof('type')
+            if kind == 'delta' and msg.delta.WhichOneof('type') == 'new_element':
+                element = msg.delta.new_element
+                element_kind = element.WhichOneof('type')
+                if element_kind == 'exception':
+                    errors += 1
+                elif element_kind in WIDGET_KINDS:
+                    proto = getattr(element, element_kind)
+                    seen[proto.id] = self.widgets.get(proto.id) or _widget_from_element(element_kind, proto)
+            elif kind == 'script_finished':
+                # st.rerun() ends the run early and starts another; wait for that one
+                if msg.script_finished == ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                    seen = {}
+                    continue
+                break
+        self.widgets = seen
+        return {'Seconds': time.perf_counter() - t0, 'Messages': messages,
+                'KB': received / 1024, 'Errors': errors}
+
+
+# ============================================================================
+# SECTION 3: ACTIONS
+# ============================================================================
+
+def _subset(label: str) -> Callable[[Session, random.Random], None]:
+    def action(session: Session, rng: random.Random) -> None:
+        widget = session.widget(label)
+        widget.value = rng.sample(widget.options, rng.randint(1, len(widget.options)))
+    return action
+
+
+def _choose(label: str) -> Callable[[Session, random.Random], None]:
+    def action(session: Session, rng: random.Random) -> None:
+        widget = session.widget(label)
+        widget.value = rng.choice(widget.options)
+    return action
+
+
+def _date_window(session: Session, rng: random.Random) -> None:
+    widget = session.widget('Select Period')
+    first, last = (pd.Timestamp(b) for b in widget.bounds)
+    start = first + pd.Timedelta(days=rng.randint(0, max((last - first).days - 7, 0)))
+    end = min(last, start + pd.Timedelta(days=rng.choice([7, 30, 90, 180])))
+    widget.value = [start.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d')]
+
+
+def _hours(session: Session, rng: random.Random) -> None:
+    widget = session.widget('Operating Hours')
+    low, high = (int(b) for b in widget.bounds)
+    start = rng.randint(low, high - 1)
+    widget.value = [float(start), float(rng.randint(start + 1, high))]
+
+
+def _show_more(session: Session, rng: random.Random) -> None:
+    buttons = [w for w in session.widgets.values() if w.kind == 'button' and w.label.startswith('Show ')]
+    if buttons:
+        session.clicked = rng.choice(buttons).id
+
+
+def _reset(session: Session, rng: random.Random) -> None:
+    """Back to the default view: every option selected, full date and hour range."""
+    for widget in session.widgets.values():
+        if widget.kind == 'multiselect':
+            widget.value = list(widget.options)
+        elif widget.kind == 'date_input':
+            widget.value = list(widget.bounds)
+        elif widget.kind == 'slider':
+            widget.value = [float(b) for b in widget.bounds]
+
+
+# Every tab's body runs on each rerun, so visiting a tab means driving its
+# selectors; tabs without widgets are exercised by every step
+ACTIONS: Dict[str, Callable[[Session, random.Random], None]] = {
+    'dates': _date_window,
+    'outlets': _subset('Select Outlets'),
+    'categories': _subset('Select Categories'),
+    'employees': _subset('Select Employees'),
+    'shifts': _subset('Shifts'),
+    'hours': _hours,
+    'payments': _subset('Select Payment Types'),
+    'sales_view': _choose('Select Time View'),
+    'expiry_view': _choose('Expiry Timeline'),
+    'heatmap_view': _choose('Heatmap View'),
+    'report': _choose('Select Report Type'),
+    'show_more': _show_more,
+    'reset': _reset,
+}
+
+
+async def run_session(url: str, session_id: int, steps: int, seed: int,
+                      start: Optional[asyncio.Event] = None) -> List[Dict]:
+    """One simulated manager: open the dashboard, then take ``steps`` random actions."""
+    rng = random.Random(seed * 1000 + session_id)
+    session = Session(url)
+    await session.connect()
+    if start is not None:
+        await start.wait()
+    try:
+        records = [{'Session': session_id, 'Step': 0, 'Action': 'open', **await session.rerun()}]
+        names = list(ACTIONS)
+        for step in range(1, steps + 1):
+            action = rng.choice(names)
+            ACTIONS[action](session, rng)
+            records.append({'Session': session_id, 'Step': step, 'Action': action, **await session.rerun()})
+    finally:
+        await session.close()
+    return records
+
+
+async def _run_sessions(url: str, sessions: int, steps: int, seed: int) -> Tuple[List[Dict], float]:
+    """Connect every session, then start them together; returns their reruns and the wall time."""
+    start = asyncio.Event()
+    tasks = [asyncio.create_task(run_session(url, s, steps, seed, start)) for s in range(sessions)]
+    await asyncio.sleep(0.5)
+    t0 = time.perf_counter()
+    start.set()
+    results = await asyncio.gather(*tasks)
+    return [r for records in results for r in records], time.perf_counter() - t0
+
+
+# ============================================================================
+# SECTION 4: LOAD TEST
+# ============================================================================
+
+def latency_table(reruns: pd.DataFrame) -> pd.DataFrame:
+    """p50/p95/p99 rerun latency in ms per action, plus an 'all' row."""
+    def row(group: pd.DataFrame) -> Dict:
+        ms = group['Seconds'].to_numpy() * 1000
+        return {'Reruns': len(ms), 'p50': np.percentile(ms, 50), 'p95': np.percentile(ms, 95),
+                'p99': np.percentile(ms, 99), 'Max': ms.max(),
+                'Msgs': group['Messages'].mean(), 'KB': group['KB'].mean()}
+
+    table = pd.DataFrame({action: row(group) for action, group in reruns.groupby('Action')}).T
+    table.loc['all'] = row(reruns)
+    table['Reruns'] = table['Reruns'].astype(int)
+    return table.round(1)
+
+
+def run_load_test(sessions: int, steps: int, seed: int = 42, env: Optional[Dict[str, str]] = None,
+                  port: Optional[int] = None) -> Tuple[pd.DataFrame, Dict[str, float]]:
+    """Start a server, warm its shared caches with one session, then run ``sessions`` at once.
+
+    Returns every rerun and a summary with throughput and the server's
+    memory: what the data and shared caches took after the warm-up, and
+    the growth per concurrent session on top of that.
+    """
+    port = port or free_port()
+    server = start_server(port, env or {})
+    url = f'ws://127.0.0.1:{port}/_stcore/stream'
+    try:
+        rss_start = rss_mb(server.pid)
+        warm, _ = asyncio.run(_run_sessions(url, 1, 0, seed))
+        rss_warm = rss_mb(server.pid)
+        records, wall = asyncio.run(_run_sessions(url, sessions, steps, seed))
+        rss_end = rss_mb(server.pid)
+    finally:
+        server.terminate()
+        server.wait()
+
+    reruns = pd.DataFrame(records)
+    summary = {
+        'Sessions': sessions,
+        'Reruns': len(reruns),
+        'Errors': int(reruns['Errors'].sum()),
+        'WallSeconds': wall,
+        'RerunsPerSecond': len(reruns) / wall,
+        'ColdOpenSeconds': warm[0]['Seconds'],
+        'ServerStartMB': rss_start,
+        'SharedMB': rss_warm - rss_start,
+        'PerSessionMB': max(rss_end - rss_warm, 0.0) / sessions,
+        'ServerEndMB': rss_end,
+    }
+    return reruns, summary
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Simulate concurrent dashboard sessions and report rerun latency.")
+    parser.add_argument('--sessions', type=int, default=4, help="Concurrent simulated sessions")
+    parser.add_argument('--steps', type=int, default=10, help="Actions per session after opening the dashboard")
+    parser.add_argument('--rows', type=int, default=2500, help="Synthetic transactions to generate")
+    parser.add_argument('--scale', default='', help="Synthetic OUTLETSxSTAFFxSKUS, e.g. 200x10x10000")
+    parser.add_argument('--dimensions', default='', help="Directory with outlets.csv, staff.csv, catalog.csv")
+    parser.add_argument('--backend', default='', help="Query backend for app.py (pandas, sqlite, duckdb, sharded)")
+    parser.add_argument('--seed', type=int, default=42, help="Seed for each session's action sequence")
+    parser.add_argument('--port', type=int, default=None, help="Server port (default: any free port)")
+    parser.add_argument('--csv', default='', help="Also write every rerun's timing to this CSV")
+    args = parser.parse_args(argv)
+
+    env = {'PHARMA_ROWS': str(args.rows)}
+    for name, value in [('PHARMA_SCALE', args.scale), ('PHARMA_DIMENSIONS', args.dimensions),
+                        ('PHARMA_BACKEND', args.backend)]:
+        if value:
+            env[name] = value
+
+    print(f"Load test: {args.sessions} sessions x {args.steps} steps, {args.rows:,} rows"
+          f"{' at scale ' + args.scale if args.scale else ''}")
+    reruns, summary = run_load_test(args.sessions, args.steps, args.seed, env, args.port)
+
+    print(latency_table(reruns).to_string())
+    print(f"\n{summary['Reruns']} reruns in {summary['WallSeconds']:.2f}s "
+          f"({summary['RerunsPerSecond']:.2f} reruns/s), {summary['Errors']} with errors")
+    print(f"Cold open {summary['ColdOpenSeconds']:.2f}s; server memory {summary['ServerStartMB']:.0f} MB at start, "
+          f"+{summary['SharedMB']:.0f} MB data and shared caches, "
+          f"+{summary['PerSessionMB']:.1f} MB per session, {summary['ServerEndMB']:.0f} MB at end")
+    if args.csv:
+        reruns.to_csv(args.csv, index=False)
+    if summary['Errors']:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+"""
+BiasharaFlow Pharma - Void and return patterns
+Finds theft patterns that per-cashier averages hide: a line voided and the
+same item re-rung by the same cashier minutes later (at a bigger discount
+or not), and bursts of returns of one item by one cashier. One sort by
+(cashier, item, time) and linear passes over it, with every case linked to
+the TransactionIDs behind it.
+
+Usage:
+    python patterns.py --rows 1000000 --scale 200x10x10000
+"""
+
+import argparse
+import time
+from typing import Dict, List, Optional
+
+import pandas as pd
+import numpy as np
+
+
+RERING_MINUTES = 10
+RETURN_DAYS = 7
+MIN_RETURNS = 3
+
+PATTERNS = ['Discount after void', 'Void and re-ring', 'Burst returns']
+CASE_COLUMNS = ['CaseID', 'Pattern', 'CashierID', 'CashierName', 'OutletName', 'ItemCode', 'ItemName',
+                'Start', 'End', 'Lines', 'AmountKES', 'TransactionIDs']
+DETECT_COLUMNS = ['Voided', 'IsReturn', 'DiscountPercent', 'UnitPriceKES', 'Quantity', 'TotalPriceKES']
+EVIDENCE_COLUMNS = ['CaseID', 'Pattern', 'Role', 'TransactionID', 'Date', 'CashierName', 'OutletName', 'ItemName',
+                    'Quantity', 'UnitPriceKES', 'DiscountPercent', 'TotalPriceKES', 'Voided', 'IsReturn']
+
+
+def _sorted_lines(df: pd.DataFrame) -> pd.DataFrame:
+    """The columns the detectors read, sorted by cashier, item and time.
+
+    Adds a group code per cashier x item, the time as integer nanoseconds
+    and each line's row position in ``df``.
+    """
+    cashier, _ = pd.factorize(df['CashierID'])
+    item, _ = pd.factorize(df['ItemCode'])
+    times = df['Date'].values.astype('datetime64[ns]').astype(np.int64)
+    order = np.lexsort((times, item, cashier))
+    lines = pd.DataFrame({col: df[col].values[order] for col in DETECT_COLUMNS})
+    lines['_Row'] = order
+    group = cashier[order].astype(np.int64) * (item.max() + 1 if len(item) else 1) + item[order]
+    lines['_Group'] = group
+    lines['_Time'] = times[order]
+    return lines
+
+
+# ============================================================================
+# SECTION 1: DETECTORS
+# ============================================================================
+
+def _next_index(flag: np.ndarray) -> np.ndarray:
+    """For each position, the first flagged position strictly after it (len(flag) if none)."""
+    n = len(flag)
+    at = np.where(flag, np.arange(n), n)
+    from_here = np.minimum.accumulate(at[::-1])[::-1]
+    return np.r_[from_here[1:], n]
+
+
+def _rerings(lines: pd.DataFrame, window: pd.Timedelta) -> pd.DataFrame:
+    """Each void paired with the same cashier's next sale of the same item within ``window``.
+
+    Only the last void before a re-ring is paired, so a line voided twice
+    and rung once is one case. The re-ring is a 'Discount after void' when
+    it carries a bigger discount than the voided line; its amount is then
+    the extra discount given, otherwise the value of the voided line.
+    """
+    voided = lines['Voided'].values == 'Yes'
+    sale = ~voided & (lines['IsReturn'].values == 'No')
+    n = len(lines)
+    next_sale, next_void = _next_index(sale), _next_index(voided)
+    void = np.flatnonzero(voided)
+    rering = next_sale[void]
+    group, times = lines['_Group'].values, lines['_Time'].values
+    safe = np.minimum(rering, n - 1)
+    keep = ((rering < n) & (next_void[void] > rering) & (group[safe] == group[void]) &
+            (times[safe] - times[void] <= window.value))
+    void, rering = void[keep], rering[keep]
+
+    discount = lines['DiscountPercent'].values.astype(float)
+    gross = lines['UnitPriceKES'].values * lines['Quantity'].values
+    deeper = discount[rering] > discount[void]
+    return pd.DataFrame({
+        'Pattern': np.where(deeper, PATTERNS[0], PATTERNS[1]),
+        'First': void,
+        'Last': rering,
+        'AmountKES': np.where(deeper, gross[rering] * (discount[rering] - discount[void]) / 100, gross[void]),
+    })
+
+
+def _return_bursts(lines: pd.DataFrame, window: pd.Timedelta, min_returns: int) -> pd.DataFrame:
+    """Runs of returns of one item by one cashier with at least ``min_returns`` inside ``window``.
+
+    A return qualifies when ``min_returns`` returns (itself included) fall
+    within ``window`` ending at it; the returns of overlapping qualifying
+    windows merge into one burst.
+    """
+    returned = np.flatnonzero((lines['Voided'].values == 'No') & (lines['IsReturn'].values == 'Yes'))
+    empty = pd.DataFrame({'Pattern': [], 'First': [], 'Last': [], 'AmountKES': [], 'Rows': []})
+    if len(returned) == 0:
+        return empty
+    group = lines['_Group'].values[returned]
+    seconds = (lines['_Time'].values[returned] - lines['_Time'].values[returned].min()) // 10 ** 9
+    # (group, time) as one sortable key, so the window start is a single searchsorted
+    span = int(seconds.max()) + int(window.total_seconds()) + 1
+    key = group * span + seconds
+    start = np.searchsorted(key, key - int(window.total_seconds()), side='left')
+    qualifies = np.arange(len(returned)) - start + 1 >= min_returns
+
+    cover = np.zeros(len(returned) + 1, dtype=np.int64)
+    np.add.at(cover, start[qualifies], 1)
+    np.add.at(cover, np.flatnonzero(qualifies) + 1, -1)
+    covered = np.cumsum(cover[:-1]) > 0
+    opens = covered & np.r_[True, ~covered[:-1] | (group[1:] != group[:-1])]
+    if not opens.any():
+        return empty
+    burst = np.cumsum(opens) - 1
+    members = np.flatnonzero(covered)
+    amount = np.abs(lines['TotalPriceKES'].values[returned])
+    first = np.flatnonzero(opens)
+    last = members[np.r_[np.flatnonzero(np.diff(burst[members])), len(members) - 1]]
+    return pd.DataFrame({
+        'Pattern': PATTERNS[2],
+        'First': returned[first],
+        'Last': returned[last],
+        'AmountKES': np.bincount(burst[members], weights=amount[members]),
+        'Rows': [returned[a:b + 1] for a, b in zip(first, last)],
+    })
+
+
+def detect_patterns(df: pd.DataFrame, rering_minutes: float = RERING_MINUTES, return_days: float = RETURN_DAYS,
+                    min_returns: int = MIN_RETURNS) -> Dict[str, pd.DataFrame]:
+    """Void/re-ring, discount-after-void and burst-return cases over all transactions, voids included.
+
+    Returns 'cases' (one row per case, most recent first, with the
+    TransactionIDs involved) and 'evidence' (every line of every case,
+    tagged with its CaseID and role).
+    """
+    lines = _sorted_lines(df)
+    rerings = _rerings(lines, pd.Timedelta(minutes=rering_minutes))
+    bursts = _return_bursts(lines, pd.Timedelta(days=return_days), min_returns)
+    rerings['Rows'] = list(np.stack([rerings['First'].values, rerings['Last'].values], axis=1))
+    found = pd.concat([rerings, bursts], ignore_index=True)
+
+    position = lines['_Row'].values
+    first = position[found['First'].values.astype(np.int64)]
+    last = position[found['Last'].values.astype(np.int64)]
+    cases = df.iloc[first][['CashierID', 'CashierName', 'OutletName', 'ItemCode', 'ItemName']].reset_index(drop=True)
+    cases.insert(0, 'Pattern', found['Pattern'].values)
+    cases['Start'] = df['Date'].values[first]
+    cases['End'] = df['Date'].values[last]
+    cases['Lines'] = found['Rows'].map(len).values
+    cases['AmountKES'] = found['AmountKES'].values.astype(float)
+    cases['_Rows'] = found['Rows'].values
+    cases = cases.sort_values('End', ascending=False, kind='mergesort').reset_index(drop=True)
+    cases.insert(0, 'CaseID', [f"PC{i:06d}" for i in range(1, len(cases) + 1)])
+
+    rows = np.concatenate(cases['_Rows'].tolist()).astype(np.int64) if len(cases) else np.array([], dtype=np.int64)
+    case_of = np.repeat(np.arange(len(cases)), cases['Lines'].values)
+    evidence = df.iloc[position[rows]].reset_index(drop=True)
+    evidence.insert(0, 'CaseID', cases['CaseID'].values[case_of])
+    evidence.insert(1, 'Pattern', cases['Pattern'].values[case_of])
+    evidence['Role'] = np.where(evidence['Voided'] == 'Yes', 'Void',
+                                np.where(evidence['IsReturn'] == 'Yes', 'Return', 'Re-ring'))
+    transaction_ids = evidence.groupby('CaseID', sort=False)['TransactionID'].agg(lambda ids: ', '.join(dict.fromkeys(ids)))
+    cases['TransactionIDs'] = transaction_ids.reindex(cases['CaseID']).values
+    return {'cases': cases[CASE_COLUMNS], 'evidence': evidence[EVIDENCE_COLUMNS]}
+
+
+def pattern_summary(cases: pd.DataFrame) -> pd.DataFrame:
+    """Cases and amount per cashier and pattern, cashiers with the most cases first."""
+    summary = cases.pivot_table(index=['CashierID', 'CashierName', 'OutletName'], columns='Pattern',
+                                values='CaseID', aggfunc='count', fill_value=0)
+    summary = summary.reindex(columns=PATTERNS, fill_value=0)
+    summary['Cases'] = summary.sum(axis=1)
+    summary['AmountKES'] = cases.groupby(['CashierID', 'CashierName', 'OutletName'])['AmountKES'].sum()
+    return summary.sort_values(['Cases', 'AmountKES'], ascending=False).reset_index().rename_axis(columns=None)
+
+
+# ============================================================================
+# SECTION 2: COMMAND LINE
+# ============================================================================
+
+def main(argv: Optional[List[str]] = None) -> None:
+    import data_generation
+    import dimensions
+
+    parser = argparse.ArgumentParser(description="Find void/re-ring and burst-return patterns and time the scan.")
+    parser.add_argument('--rows', type=int, default=2500, help="Synthetic transactions to generate")
+    parser.add_argument('--seed', type=int, default=42, help="Generator seed")
+    parser.add_argument('--scale', default='', help="Synthetic OUTLETSxSTAFFxSKUS, e.g. 200x10x10000")
+    parser.add_argument('--rering-minutes', type=float, default=RERING_MINUTES, help="Void to re-ring window")
+    parser.add_argument('--return-days', type=float, default=RETURN_DAYS, help="Burst-return window")
+    parser.add_argument('--min-returns', type=int, default=MIN_RETURNS, help="Returns within the window to flag")
+    parser.add_argument('--out', default='', help="Write cases and evidence CSVs with this path prefix")
+    args = parser.parse_args(argv)
+
+    dims = dimensions.synthesize_dimensions(**dimensions.parse_scale(args.scale), seed=args.seed) \
+        if args.scale else None
+    df = data_generation.generate_pharmacy_data(args.rows, args.seed, dims)
+
+    t0 = time.perf_counter()
+    found = detect_patterns(df, args.rering_minutes, args.return_days, args.min_returns)
+    seconds = time.perf_counter() - t0
+    cases = found['cases']
+    print(f"Scanned {len(df):,} lines in {seconds:.2f}s ({len(df) / max(seconds, 1e-9) / 1e6:.2f}M lines/s): "
+          f"{len(cases):,} cases, {len(found['evidence']):,} evidence lines")
+    print(cases.groupby('Pattern')['AmountKES'].agg(['size', 'sum']).reindex(PATTERNS).fillna(0).to_string())
+    if args.out:
+        cases.to_csv(f"{args.out}cases.csv", index=False)
+        found['evidence'].to_csv(f"{args.out}evidence.csv", index=False)
+        print(f"Wrote {args.out}cases.csv and {args.out}evidence.csv")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+BiasharaFlow Pharma - Price and margin anomalies
+Robust per-SKU baselines (median and MAD of effective unit price and
+margin, per outlet, falling back to the chain-wide SKU baseline where an
+outlet sells too little of it) and a score for every sale line against its
+baseline, catching under-ringing, price overrides and deep discounts.
+"""
+
+from typing import Tuple
+
+import pandas as pd
+import numpy as np
+
+
+# Modified z-score: 0.6745 * (x - median) / MAD, flagged beyond 3.5 (Iglewicz & Hoaglin)
+MAD_SCALE = 1.4826
+Z_THRESHOLD = 3.5
+# Outlet x SKU baselines need this many sales, else the SKU's chain-wide baseline is used
+MIN_BASELINE_LINES = 20
+# MAD floors, so a SKU that nearly always sells at list price does not flag every small discount
+PRICE_MAD_FLOOR = 0.05
+MARGIN_MAD_FLOOR = 5.0
+
+BASELINE_COLUMNS = ['Lines', 'MedianPrice', 'PriceMAD', 'MedianMargin', 'MarginMAD']
+
+
+def line_measures(df: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+    """Effective unit price paid (after discount) and margin in percent of the line's revenue."""
+    total = df['TotalPriceKES'].values.astype(float)
+    price = np.abs(total) / np.maximum(df['Quantity'].values, 1)
+    margin = np.divide(df['ProfitKES'].values * 100.0, total, out=np.zeros(len(df)), where=total != 0)
+    return price, margin
+
+
+def _baselines(code: np.ndarray, price: np.ndarray, margin: np.ndarray, groups: int) -> np.ndarray:
+    """Lines, median and MAD of price and margin per group code (groups x 5, NaN where empty)."""
+    values = pd.DataFrame({'Group': code, 'Price': price, 'Margin': margin})
+    stats = values.groupby('Group').agg(Lines=('Price', 'size'), MedianPrice=('Price', 'median'),
+                                        MedianMargin=('Margin', 'median'))
+    median_price = stats['MedianPrice'].reindex(np.arange(groups)).values
+    median_margin = stats['MedianMargin'].reindex(np.arange(groups)).values
+    deviations = pd.DataFrame({'Group': code, 'Price': np.abs(price - median_price[code]),
+                               'Margin': np.abs(margin - median_margin[code])})
+    mad = deviations.groupby('Group').median().reindex(np.arange(groups))
+    return np.column_stack([stats['Lines'].reindex(np.arange(groups), fill_value=0).values, median_price,
+                            mad['Price'].values, median_margin, mad['Margin'].values])
+
+
+def _shelf_baselines(df: pd.DataFrame, min_lines: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Shelf code per line, and per outlet x SKU shelf its baseline row and whether it fell back to the chain."""
+    outlet, _ = pd.factorize(df['OutletID'])
+    item, items = pd.factorize(df['ItemCode'])
+    shelf, shelves = pd.factorize(outlet.astype(np.int64) * len(items) + item)
+    shelf_item = shelves % max(len(items), 1)
+
+    sale = ((df['Voided'] == 'No') & (df['IsReturn'] == 'No')).values
+    price, margin = line_measures(df)
+    own = _baselines(shelf[sale], price[sale], margin[sale], len(shelves))
+    chain = _baselines(item[sale], price[sale], margin[sale], len(items))
+    thin = own[:, 0] < min_lines
+    stats = np.where(thin[:, None], np.column_stack([own[:, :1], chain[shelf_item, 1:]]), own)
+    return shelf, stats, thin
+
+
+def price_baselines(df: pd.DataFrame, min_lines: int = MIN_BASELINE_LINES) -> pd.DataFrame:
+    """Baseline per outlet x SKU: median/MAD of unit price and margin over its live sales.
+
+    ``Level`` is 'Outlet' where the outlet made at least ``min_lines``
+    sales of the SKU and 'Chain' where its chain-wide baseline stands in.
+    """
+    shelf, stats, thin = _shelf_baselines(df, min_lines)
+    _, first = np.unique(shelf, return_index=True)
+    baselines = df[['OutletID', 'OutletName', 'ItemCode', 'ItemName']].iloc[first].reset_index(drop=True)
+    baselines[BASELINE_COLUMNS] = stats
+    baselines['Lines'] = baselines['Lines'].astype(np.int64)
+    baselines['Level'] = np.where(thin, 'Chain', 'Outlet')
+    return baselines.sort_values(['OutletID', 'ItemCode'], kind='mergesort').reset_index(drop=True)
+
+
+def score_lines(df: pd.DataFrame, min_lines: int = MIN_BASELINE_LINES) -> pd.DataFrame:
+    """``df`` with each live sale's price and margin scored against its outlet x SKU baseline.
+
+    Adds UnitPricePaid, MarginPct, robust PriceZ and MarginZ, and a 0/1
+    PriceAnomaly: a price more than Z_THRESHOLD robust deviations either
+    side of the baseline, or a margin that far below it. Voids and returns
+    are not scored (NaN z-scores, no flag).
+    """
+    shelf, stats, _ = _shelf_baselines(df, min_lines)
+    base = stats[shelf]
+    sale = ((df['Voided'] == 'No') & (df['IsReturn'] == 'No')).values & ~np.isnan(base[:, 1])
+
+    price, margin = line_measures(df)
+    price_spread = MAD_SCALE * np.maximum(base[:, 2], PRICE_MAD_FLOOR * base[:, 1])
+    margin_spread = MAD_SCALE * np.maximum(base[:, 4], MARGIN_MAD_FLOOR)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        price_z = np.where(sale, (price - base[:, 1]) / price_spread, np.nan)
+        margin_z = np.where(sale, (margin - base[:, 3]) / margin_spread, np.nan)
+    anomaly = sale & ((np.abs(price_z) > Z_THRESHOLD) | (margin_z < -Z_THRESHOLD))
+    return df.assign(UnitPricePaid=price, MarginPct=margin, PriceZ=price_z, MarginZ=margin_z,
+                     PriceAnomaly=anomaly.astype(np.int64))
+
+
+def anomaly_lines(scored: pd.DataFrame) -> pd.DataFrame:
+    """Flagged lines with their baseline, worst first (largest deviation on either measure)."""
+    flagged = scored[scored['PriceAnomaly'] == 1]
+    baselines = price_baselines(scored)
+    flagged = flagged.merge(baselines[['OutletID', 'ItemCode', 'MedianPrice', 'MedianMargin', 'Level']],
+                            on=['OutletID', 'ItemCode'], how='left')
+    flagged['Severity'] = np.maximum(np.abs(flagged['PriceZ']), -flagged['MarginZ'])
+    flagged['UnderRungKES'] = np.maximum(flagged['MedianPrice'] - flagged['UnitPricePaid'], 0) * flagged['Quantity']
+    return flagged.sort_values('Severity', ascending=False, kind='mergesort')[[
+        'TransactionID', 'Date', 'OutletName', 'CashierName', 'ItemName', 'Quantity', 'DiscountPercent',
+        'UnitPricePaid', 'MedianPrice', 'MarginPct', 'MedianMargin', 'PriceZ', 'MarginZ', 'UnderRungKES', 'Level',
+    ]].reset_index(drop=True)
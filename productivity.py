@@ -0,0 +1,147 @@
+"""
+BiasharaFlow Pharma - Cashier productivity
+Assigns every basket to the attendance interval (LoginTime-LogoutTime) of its
+cashier with a sorted as-of join, then derives sales per hour worked, sales
+rung while logged out, and idle time within shifts.
+"""
+
+import pandas as pd
+import numpy as np
+from typing import Dict
+
+from baskets import build_baskets
+
+
+# Gaps between baskets longer than this count as idle time
+IDLE_GAP = pd.Timedelta(minutes=30)
+
+
+# ============================================================================
+# SECTION 1: INTERVAL JOIN
+# ============================================================================
+
+def _shifts(login_df: pd.DataFrame) -> pd.DataFrame:
+    """Attended shifts with a ShiftID, sorted by login time for the as-of join."""
+    shifts = login_df[login_df['LoginTime'].notna()].reset_index(drop=True)
+    return pd.DataFrame({
+        'ShiftID': np.arange(len(shifts)),
+        'CashierID': shifts['CashierID'].values,
+        'LoginTime': shifts['LoginTime'].values.astype('datetime64[ns]'),
+        'LogoutTime': shifts['LogoutTime'].values.astype('datetime64[ns]'),
+        'HoursWorked': shifts['HoursWorked'].values,
+    }).sort_values('LoginTime', kind='mergesort')
+
+
+def assign_shifts(df: pd.DataFrame, login_df: pd.DataFrame) -> pd.DataFrame:
+    """One row per basket with the ShiftID it was rung in (-1 if the cashier was logged out).
+
+    A backward ``merge_asof`` by CashierID finds each basket's latest login
+    at or before its timestamp; the basket is on shift if it also falls
+    before that shift's logout. Shifts of one cashier never overlap, so
+    this is an exact interval join in O(n log n) with no cartesian merge.
+    ``Scored`` is False for baskets on days the login records do not
+    cover, which are neither on nor off shift.
+    """
+    baskets = build_baskets(df)
+    baskets['Date'] = baskets['Date'].astype('datetime64[ns]')
+    shifts = _shifts(login_df)
+
+    joined = pd.merge_asof(
+        baskets.reset_index().sort_values('Date', kind='mergesort'),
+        shifts[['CashierID', 'LoginTime', 'LogoutTime', 'ShiftID']],
+        left_on='Date', right_on='LoginTime', by='CashierID', direction='backward'
+    ).sort_values('index').set_index('index')
+    on_shift = (joined['Date'] <= joined['LogoutTime']).values
+
+    baskets['ShiftID'] = np.where(on_shift, joined['ShiftID'].fillna(-1).values, -1).astype(int)
+    baskets['OnShift'] = on_shift
+    covered = pd.to_datetime(pd.Series(login_df['Date'].unique())).values.astype('datetime64[D]')
+    baskets['Scored'] = np.isin(baskets['Date'].values.astype('datetime64[D]'), covered)
+    return baskets
+
+
+# ============================================================================
+# SECTION 2: PRODUCTIVITY
+# ============================================================================
+
+def shift_idle_hours(baskets: pd.DataFrame, login_df: pd.DataFrame,
+                     idle_gap: pd.Timedelta = IDLE_GAP) -> pd.DataFrame:
+    """Per attended shift: baskets rung and idle hours.
+
+    Idle time is the part of every gap longer than ``idle_gap`` between
+    login, consecutive baskets and logout. A shift with no sales is idle
+    apart from the allowance at each end.
+    """
+    shifts = _shifts(login_df).sort_values('ShiftID')
+    on = baskets[baskets['ShiftID'] >= 0].sort_values(['ShiftID', 'Date'], kind='mergesort')
+
+    # Event stream per shift: login, each basket, logout
+    shift_ids = np.concatenate([shifts['ShiftID'].values, on['ShiftID'].values, shifts['ShiftID'].values])
+    times = np.concatenate([shifts['LoginTime'].values, on['Date'].values.astype('datetime64[ns]'),
+                            shifts['LogoutTime'].values])
+    order = np.lexsort((times, shift_ids))
+    shift_ids, times = shift_ids[order], times[order]
+
+    gaps = np.diff(times).astype('timedelta64[s]').astype(float)
+    same_shift = shift_ids[1:] == shift_ids[:-1]
+    idle = np.where(same_shift, np.maximum(gaps - idle_gap.total_seconds(), 0), 0) / 3600
+
+    n = len(shifts)
+    return pd.DataFrame({
+        'ShiftID': np.arange(n),
+        'CashierID': shifts['CashierID'].values,
+        'HoursWorked': shifts['HoursWorked'].values,
+        'Baskets': np.bincount(on['ShiftID'].values, minlength=n),
+        'IdleHours': np.bincount(shift_ids[1:], weights=idle, minlength=n),
+    })
+
+
+def cashier_productivity(df: pd.DataFrame, login_df: pd.DataFrame,
+                         idle_gap: pd.Timedelta = IDLE_GAP) -> Dict[str, pd.DataFrame]:
+    """Sales per hour worked, off-shift sales and idle time per cashier.
+
+    ``df`` should hold completed sales (no voids or returns). Returns a dict
+    with 'cashier' (one row per cashier), 'shifts' (one row per attended
+    shift) and 'off_shift' (baskets rung while the cashier was logged out).
+    Only baskets on days covered by ``login_df`` are scored (ScoredBaskets);
+    OffShiftRate is a share of those.
+    """
+    baskets = assign_shifts(df, login_df)
+    shifts = shift_idle_hours(baskets, login_df, idle_gap)
+
+    on = baskets['OnShift']
+    off = baskets['Scored'] & ~on
+    per_cashier = baskets.assign(
+        OnShiftSales=baskets['Value'].where(on, 0.0),
+        OffShiftSales=baskets['Value'].where(off, 0.0),
+        OffShiftBaskets=off
+    ).groupby(['CashierID', 'CashierName', 'OutletName']).agg(
+        Sales=('Value', 'sum'),
+        OnShiftSales=('OnShiftSales', 'sum'),
+        OffShiftSales=('OffShiftSales', 'sum'),
+        Baskets=('TransactionID', 'count'),
+        ScoredBaskets=('Scored', 'sum'),
+        OffShiftBaskets=('OffShiftBaskets', 'sum')
+    ).reset_index()
+    worked = shifts.groupby('CashierID').agg(
+        Shifts=('ShiftID', 'count'),
+        HoursWorked=('HoursWorked', 'sum'),
+        IdleHours=('IdleHours', 'sum')
+    ).reset_index()
+
+    cashier = per_cashier.merge(worked, on='CashierID', how='left')
+    cashier[['Shifts', 'HoursWorked', 'IdleHours']] = cashier[['Shifts', 'HoursWorked', 'IdleHours']].fillna(0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cashier['SalesPerHour'] = np.where(cashier['HoursWorked'] > 0,
+                                           cashier['OnShiftSales'] / cashier['HoursWorked'], 0.0).round(0)
+        cashier['OffShiftRate'] = np.where(cashier['ScoredBaskets'] > 0,
+                                           cashier['OffShiftBaskets'] / cashier['ScoredBaskets'] * 100, 0.0).round(1)
+        cashier['IdleRate'] = np.where(cashier['HoursWorked'] > 0,
+                                       cashier['IdleHours'] / cashier['HoursWorked'] * 100, 0.0).round(1)
+
+    off_shift = baskets.loc[off, ['TransactionID', 'Date', 'OutletName', 'CashierName', 'Lines', 'Value']]
+    return {
+        'cashier': cashier.sort_values('SalesPerHour', ascending=False).reset_index(drop=True),
+        'shifts': shifts,
+        'off_shift': off_shift.sort_values('Date').reset_index(drop=True),
+    }
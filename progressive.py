@@ -0,0 +1,259 @@
+"""
+BiasharaFlow Pharma - Progressive results
+Instant approximate answers from a stratified sample of baskets (a fixed share
+of every outlet x day), with 95% error margins, while the exact result is
+computed on a background thread and replaces the estimate when it lands.
+
+Usage:
+    python progressive.py --rows 2000000 --scale 200x10x10000
+"""
+
+import argparse
+import math
+import threading
+import time
+from datetime import timedelta
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+import pandas as pd
+import numpy as np
+
+import analytics
+from result_cache import ResultCache
+
+
+# Share of each outlet x day's baskets kept, and the floor per stratum (two are needed for a variance)
+SAMPLE_FRACTION = 0.01
+MIN_PER_STRATUM = 2
+Z_95 = 1.96
+# Line columns the sidebar filters and the overview measures read
+SAMPLE_COLUMNS = ['Date', 'Hour', 'Shift', 'OutletName', 'Category', 'CashierName', 'PaymentType',
+                  'TotalPriceKES', 'ProfitKES', 'Quantity']
+MEASURES = ['Sales', 'Profit', 'Transactions', 'Units', 'MpesaSales']
+
+
+# ============================================================================
+# SECTION 1: STRATIFIED SAMPLE
+# ============================================================================
+
+class StratifiedSample:
+    """A random sample of whole baskets from every outlet x day, with the population size of each.
+
+    Estimates are stratified expansion estimates over baskets: a stratum's
+    total is its basket count times its sampled baskets' mean, and the
+    variance adds up per stratum with the finite population correction.
+    Filters are applied to the sampled lines with the same function as the
+    exact views; baskets with no matching line count as zero, so date and
+    outlet filters drop whole strata exactly and the other filters are
+    estimated with their sampling error. A basket is counted as a
+    transaction when any of its lines match, as COUNT(DISTINCT) does.
+    """
+
+    def __init__(self, lines: pd.DataFrame, basket_stratum: np.ndarray, population: np.ndarray,
+                 sampled: np.ndarray, stratum_day: np.ndarray, days: np.ndarray, source_lines: int):
+        self.lines = lines
+        self.basket_stratum = basket_stratum
+        self.population = population
+        self.sampled = sampled
+        self.stratum_day = stratum_day
+        self.days = days
+        self.source_lines = source_lines
+
+    @classmethod
+    def from_transactions(cls, sales_df: pd.DataFrame, fraction: float = SAMPLE_FRACTION,
+                          min_per_stratum: int = MIN_PER_STRATUM, seed: int = 0) -> 'StratifiedSample':
+        """Draw ``fraction`` of every outlet x day's baskets (at least ``min_per_stratum``) without replacement."""
+        basket, basket_ids = pd.factorize(sales_df['TransactionID'])
+        _, first = np.unique(basket, return_index=True)
+        day = sales_df['Date'].values[first].astype('datetime64[D]')
+        outlet, _ = pd.factorize(sales_df['OutletID'].values[first])
+        day_code, days = pd.factorize(day, sort=True)
+        stratum, strata = pd.factorize(day_code.astype(np.int64) * (outlet.max() + 1) + outlet)
+        population = np.bincount(stratum, minlength=len(strata))
+        sampled = np.minimum(population, np.maximum(min_per_stratum, np.ceil(fraction * population))).astype(np.int64)
+
+        # A random order within each stratum; the first ``sampled`` baskets of each are kept
+        rng = np.random.default_rng(seed)
+        order = np.argsort(stratum + rng.random(len(stratum)), kind='stable')
+        starts = np.r_[0, np.cumsum(population)[:-1]]
+        rank = np.arange(len(order)) - starts[stratum[order]]
+        chosen = np.sort(order[rank < sampled[stratum[order]]])
+
+        # Sampled baskets are renumbered 0..n-1; the lines keep that number
+        renumber = np.full(len(basket_ids), -1, dtype=np.int64)
+        renumber[chosen] = np.arange(len(chosen))
+        line_basket = renumber[basket]
+        keep = line_basket >= 0
+        lines = pd.DataFrame({col: sales_df[col].values[keep] for col in SAMPLE_COLUMNS})
+        lines['_Basket'] = line_basket[keep]
+        return cls(lines, stratum[chosen], population, sampled, (strata // (outlet.max() + 1)).astype(np.int64),
+                   np.asarray(days), len(sales_df))
+
+    def __len__(self) -> int:
+        return len(self.basket_stratum)
+
+    def _basket_values(self, **filters) -> Dict[str, np.ndarray]:
+        """Per sampled basket: each measure over its lines that pass ``filters`` (zero if none do)."""
+        lines = analytics.filter_transactions(self.lines, **filters)
+        basket = lines['_Basket'].values
+        n = len(self)
+        return {
+            'Sales': np.bincount(basket, weights=lines['TotalPriceKES'].values, minlength=n),
+            'Profit': np.bincount(basket, weights=lines['ProfitKES'].values, minlength=n),
+            'Transactions': (np.bincount(basket, minlength=n) > 0).astype(float),
+            'Units': np.bincount(basket, weights=lines['Quantity'].values, minlength=n),
+            'MpesaSales': np.bincount(basket, weights=np.where(lines['PaymentType'].values == 'M-Pesa',
+                                                               lines['TotalPriceKES'].values, 0.0), minlength=n),
+        }
+
+    def _stratum_totals(self, y: np.ndarray) -> tuple:
+        """Estimated total and its variance in every stratum, for basket values ``y``."""
+        strata = len(self.population)
+        first = np.bincount(self.basket_stratum, weights=y, minlength=strata)
+        second = np.bincount(self.basket_stratum, weights=y * y, minlength=strata)
+        n = np.maximum(self.sampled, 1)
+        total = self.population / n * first
+        spread = np.divide(second - first * first / n, n - 1, out=np.zeros(strata), where=n > 1)
+        variance = self.population ** 2 * (1 - self.sampled / np.maximum(self.population, 1)) / n * spread
+        return total, np.maximum(variance, 0.0)
+
+    def _total(self, y: np.ndarray) -> tuple:
+        total, variance = self._stratum_totals(y)
+        return total.sum(), Z_95 * math.sqrt(variance.sum())
+
+    def _ratio(self, num: np.ndarray, den: np.ndarray) -> tuple:
+        """Ratio of two estimated totals, with its margin from the linearized residual num - ratio x den."""
+        top, _ = self._total(num)
+        bottom, _ = self._total(den)
+        if bottom <= 0:
+            return 0.0, 0.0
+        ratio = top / bottom
+        _, residual_margin = self._total(num - ratio * den)
+        return ratio, residual_margin / bottom
+
+    def kpis(self, **filters) -> pd.DataFrame:
+        """Overview headline estimates (index: measure) with a 95% Margin, plus AvgBasket and MpesaPct."""
+        values = self._basket_values(**filters)
+        rows = {m: self._total(values[m]) for m in MEASURES}
+        rows['AvgBasket'] = self._ratio(values['Sales'], values['Transactions'])
+        share, margin = self._ratio(values['MpesaSales'], values['Sales'])
+        rows['MpesaPct'] = (share * 100, margin * 100)
+        return pd.DataFrame.from_dict(rows, orient='index', columns=['Estimate', 'Margin'])
+
+    def daily(self, measure: str = 'Sales', **filters) -> pd.DataFrame:
+        """Estimated ``measure`` per day with its 95% Margin, days with no estimate left out."""
+        total, variance = self._stratum_totals(self._basket_values(**filters)[measure])
+        day_total = np.bincount(self.stratum_day, weights=total, minlength=len(self.days))
+        day_margin = Z_95 * np.sqrt(np.bincount(self.stratum_day, weights=variance, minlength=len(self.days)))
+        table = pd.DataFrame({'Date': pd.DatetimeIndex(self.days).date, measure: day_total, 'Margin': day_margin})
+        return table[table[measure] != 0].reset_index(drop=True)
+
+    def by(self, column: str, measure: str = 'Sales', **filters) -> pd.DataFrame:
+        """Estimated ``measure`` per value of a line column (e.g. PaymentType) with its 95% Margin."""
+        lines = analytics.filter_transactions(self.lines, **filters)
+        code, labels = pd.factorize(lines[column], sort=True)
+        source = {'Sales': 'TotalPriceKES', 'Profit': 'ProfitKES', 'Units': 'Quantity'}[measure]
+        per_basket = analytics.bincount_matrix((lines['_Basket'].values, code), (len(self), len(labels)),
+                                               lines[source].values)
+        rows = [self._total(per_basket[:, g]) for g in range(len(labels))]
+        return pd.DataFrame({column: np.asarray(labels), measure: [r[0] for r in rows],
+                             'Margin': [r[1] for r in rows]})
+
+
+# ============================================================================
+# SECTION 2: BACKGROUND REFINEMENT
+# ============================================================================
+
+class Refiner:
+    """Computes exact results on background threads into a shared result cache.
+
+    ``submit(key, compute)`` returns a future for the cached value: already
+    done if it is cached, else the running computation of ``key``, started
+    in the background if there is none.
+    A result keeps computing after the page that asked for it has moved on,
+    so a later visit to the same view finds it exact straight away.
+    ``workers`` threads are shared by every caller (default: the thread
+    pool's own sizing), so one slow view does not hold up the others.
+    """
+
+    def __init__(self, cache: ResultCache, workers: Optional[int] = None):
+        self.cache = cache
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='refine')
+        self._running: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, key: Hashable, compute: Callable[[], Any]) -> Future:
+        found, value = self.cache.peek(key)
+        if found:
+            future = Future()
+            future.set_result(value)
+            return future
+        with self._lock:
+            running = self._running.get(key)
+            if running is not None:
+                return running
+            future = self._executor.submit(self.cache.get_or_compute, key, compute)
+            self._running[key] = future
+        future.add_done_callback(lambda _: self._forget(key))
+        return future
+
+    def _forget(self, key: Hashable) -> None:
+        with self._lock:
+            self._running.pop(key, None)
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._running)
+
+
+# ============================================================================
+# SECTION 3: COMMAND LINE
+# ============================================================================
+
+def main(argv: Optional[List[str]] = None) -> None:
+    import data_generation
+    import dimensions
+
+    parser = argparse.ArgumentParser(description="Time sample estimates against exact overview numbers.")
+    parser.add_argument('--rows', type=int, default=2500, help="Synthetic transactions to generate")
+    parser.add_argument('--seed', type=int, default=42, help="Generator seed")
+    parser.add_argument('--scale', default='', help="Synthetic OUTLETSxSTAFFxSKUS, e.g. 200x10x10000")
+    parser.add_argument('--fraction', type=float, default=SAMPLE_FRACTION, help="Share of baskets sampled")
+    args = parser.parse_args(argv)
+
+    dims = dimensions.synthesize_dimensions(**dimensions.parse_scale(args.scale), seed=args.seed) \
+        if args.scale else None
+    sales_df = analytics.sales_only(data_generation.generate_pharmacy_data(args.rows, args.seed, dims))
+
+    t0 = time.perf_counter()
+    sample = StratifiedSample.from_transactions(sales_df, args.fraction)
+    print(f"Sampled {len(sample):,} baskets ({len(sample.lines):,} lines) of {len(sales_df):,} lines "
+          f"from {len(sample.population):,} outlet-days in {time.perf_counter() - t0:.2f}s")
+
+    start = sales_df['Date'].min().date()
+    views = {
+        'all': {},
+        'last month': {'date_range': (sales_df['Date'].max().date().replace(day=1), sales_df['Date'].max().date())},
+        'one category': {'categories': [sales_df['Category'].iloc[0]]},
+        'M-Pesa, 8-12h': {'payment_types': ['M-Pesa'], 'hour_range': (8, 12),
+                          'date_range': (start, start + timedelta(days=60))},
+    }
+    for name, filters in views.items():
+        t0 = time.perf_counter()
+        estimate = sample.kpis(**filters)
+        approx_ms = (time.perf_counter() - t0) * 1000
+        t0 = time.perf_counter()
+        exact = analytics.filter_transactions(sales_df, **filters)
+        exact_sales = exact['TotalPriceKES'].sum()
+        exact_baskets = exact['TransactionID'].nunique()
+        exact_ms = (time.perf_counter() - t0) * 1000
+        sales, sales_margin = estimate.loc['Sales']
+        baskets, basket_margin = estimate.loc['Transactions']
+        print(f"  {name:<14} approx {approx_ms:6.1f} ms, exact {exact_ms:8.1f} ms | "
+              f"sales {sales:,.0f} ± {sales_margin:,.0f} (exact {exact_sales:,.0f}) | "
+              f"baskets {baskets:,.0f} ± {basket_margin:,.0f} (exact {exact_baskets:,})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""
+BiasharaFlow Pharma - Product ranking index
+Per-outlet, per-SKU running totals of sales, units and profit, updated as
+transactions arrive. Top-K / bottom-K queries for any outlet and category
+selection are answered with argpartition instead of a full sort.
+"""
+
+import threading
+
+import pandas as pd
+import numpy as np
+from typing import Hashable, Optional, Sequence
+
+from analytics import bincount_matrix
+
+
+METRICS = {
+    'TotalPriceKES': 0,
+    'Quantity': 1,
+    'ProfitKES': 2,
+    'Lines': 3,
+}
+
+
+def _select_k(values: np.ndarray, k: int, largest: bool) -> np.ndarray:
+    """Positions of the k largest (or smallest) values, ordered, via argpartition."""
+    k = min(k, len(values))
+    if k == 0:
+        return np.array([], dtype=int)
+    keyed = -values if largest else values
+    part = np.argpartition(keyed, k - 1)[:k] if k < len(values) else np.arange(len(values))
+    return part[np.lexsort((part, keyed[part]))]
+
+
+def _ranking_frame(items: pd.DataFrame, totals: np.ndarray, positions: np.ndarray) -> pd.DataFrame:
+    ranked = items.iloc[positions].reset_index(drop=True)
+    ranked['Quantity'] = totals[METRICS['Quantity'], positions].astype(int)
+    ranked['TotalPriceKES'] = totals[METRICS['TotalPriceKES'], positions]
+    ranked['ProfitKES'] = totals[METRICS['ProfitKES'], positions]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ranked['ProfitMargin'] = (ranked['ProfitKES'] / ranked['TotalPriceKES'] * 100).round(1)
+    return ranked
+
+
+class RankingIndex:
+    """Running per-(outlet, SKU) totals that serve top-K and bottom-K product queries.
+
+    Totals live in one dense float array of shape (metric, outlet, SKU);
+    ``update`` folds new transactions in with a single bincount and grows
+    the array when new outlets or SKUs appear. Categories are an attribute
+    of the SKU, so a category filter is a mask over the SKU axis.
+    ``sync`` keeps a shared index current with a growing sales frame,
+    folding in only the sales after the last one it has seen; the frame's
+    dataset key tells a continuation from a different dataset.
+    """
+
+    def __init__(self):
+        self._reset()
+        self._lock = threading.Lock()
+
+    def _reset(self) -> None:
+        self._outlets = pd.Index([], dtype=object)
+        self._items = pd.DataFrame(columns=['ItemCode', 'ItemName', 'Category'])
+        self._item_index = pd.Index([], dtype=object)
+        self._totals = np.zeros((len(METRICS), 0, 0))
+        self.latest: Optional[pd.Timestamp] = None
+        self.lines = 0
+        self.key: Optional[Hashable] = None
+
+    @classmethod
+    def from_transactions(cls, df: pd.DataFrame) -> 'RankingIndex':
+        index = cls()
+        index.update(df)
+        return index
+
+    @property
+    def outlets(self) -> pd.Index:
+        return self._outlets
+
+    @property
+    def items(self) -> pd.DataFrame:
+        return self._items
+
+    def sync(self, df: pd.DataFrame, key: Optional[Hashable] = None) -> int:
+        """Bring the totals up to date with all of ``df``; return the number of lines folded in.
+
+        ``key`` identifies the dataset ``df`` belongs to (the app passes its
+        dataset key). Sales after the latest one already indexed are added
+        with ``update``. If the key differs from the one indexed, or the
+        sales up to the latest no longer number the lines indexed, the index
+        is rebuilt from ``df``.
+        """
+        with self._lock:
+            if self.latest is not None:
+                seen = (df['Date'] <= self.latest).values
+                if key == self.key and seen.sum() == self.lines:
+                    new = df[~seen]
+                    self._update(new)
+                    return len(new)
+                self._reset()
+            self.key = key
+            self._update(df)
+            return len(df)
+
+    def update(self, df: pd.DataFrame) -> None:
+        """Add a batch of (non-voided, non-return) transactions to the totals."""
+        with self._lock:
+            self._update(df)
+
+    def _update(self, df: pd.DataFrame) -> None:
+        if len(df) == 0:
+            return
+        self.lines += len(df)
+        latest = df['Date'].max()
+        self.latest = latest if self.latest is None else max(self.latest, latest)
+        new_outlets = pd.Index(df['OutletName'].unique()).difference(self._outlets)
+        new_items = df.loc[~df['ItemCode'].isin(self._item_index), ['ItemCode', 'ItemName', 'Category']] \
+            .drop_duplicates('ItemCode')
+        if len(new_outlets) or len(new_items):
+            self._outlets = self._outlets.append(new_outlets)
+            self._items = pd.concat([self._items, new_items], ignore_index=True)
+            self._item_index = pd.Index(self._items['ItemCode'])
+            grown = np.zeros((len(METRICS), len(self._outlets), len(self._items)))
+            grown[:, :self._totals.shape[1], :self._totals.shape[2]] = self._totals
+            self._totals = grown
+
+        shape = self._totals.shape[1:]
+        codes = (self._outlets.get_indexer(df['OutletName']), self._item_index.get_indexer(df['ItemCode']))
+        for metric, m in METRICS.items():
+            weights = None if metric == 'Lines' else df[metric].values.astype(float)
+            self._totals[m] += bincount_matrix(codes, shape, weights)
+
+    def totals(self, outlets: Optional[Sequence[str]] = None) -> np.ndarray:
+        """Per-SKU totals (metric x SKU) summed over the selected outlets."""
+        if outlets is None:
+            return self._totals.sum(axis=1)
+        rows = self._outlets.get_indexer(pd.Index(outlets))
+        return self._totals[:, rows[rows >= 0], :].sum(axis=1)
+
+    def rank(self, k: int, by: str = 'TotalPriceKES', largest: bool = True,
+             outlets: Optional[Sequence[str]] = None,
+             categories: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        """Top (or bottom) ``k`` SKUs by ``by`` among SKUs sold in the selection."""
+        with self._lock:
+            items, totals = self._items, self.totals(outlets)
+        eligible = totals[METRICS['Lines']] > 0
+        if categories is not None:
+            eligible &= items['Category'].isin(categories).values
+        candidates = np.flatnonzero(eligible)
+        positions = candidates[_select_k(totals[METRICS[by], candidates], k, largest)]
+        return _ranking_frame(items, totals, positions)
+
+    def top_k(self, k: int, by: str = 'TotalPriceKES', **filters) -> pd.DataFrame:
+        return self.rank(k, by, largest=True, **filters)
+
+    def bottom_k(self, k: int, by: str = 'TotalPriceKES', **filters) -> pd.DataFrame:
+        return self.rank(k, by, largest=False, **filters)
+
+
+def rank_products(df: pd.DataFrame, k: int, by: str = 'TotalPriceKES', largest: bool = True) -> pd.DataFrame:
+    """One-off top/bottom ``k`` products for an arbitrary filtered frame.
+
+    Used when a filter (dates, cashiers, shifts...) is outside what the
+    RankingIndex is keyed on; still one bincount pass per metric plus
+    argpartition, without the outlet axis.
+    """
+    # factorize and drop_duplicates both keep first-appearance order
+    codes, item_codes = pd.factorize(df['ItemCode'])
+    items = df[['ItemCode', 'ItemName', 'Category']].drop_duplicates('ItemCode').reset_index(drop=True)
+    totals = np.zeros((len(METRICS), len(item_codes)))
+    for metric, m in METRICS.items():
+        weights = None if metric == 'Lines' else df[metric].values.astype(float)
+        totals[m] = np.bincount(codes, weights=weights, minlength=len(item_codes))
+    return _ranking_frame(items, totals, _select_k(totals[METRICS[by]], k, largest))
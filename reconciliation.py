@@ -0,0 +1,229 @@
+"""
+BiasharaFlow Pharma - M-Pesa payment reconciliation
+Matches M-Pesa statement lines to POS baskets by amount and nearest
+timestamp with sorted as-of joins, and reports unmatched lines together with
+per-day and per-cashier variances.
+"""
+
+import pandas as pd
+import numpy as np
+from typing import Dict, Tuple
+
+from baskets import build_baskets
+
+
+# Safaricom statement export headers mapped to the engine's column names
+STATEMENT_COLUMNS = {
+    'Receipt No.': 'ReceiptNo',
+    'Receipt No': 'ReceiptNo',
+    'Completion Time': 'Timestamp',
+    'Paid In': 'Amount',
+    'Details': 'Details',
+    'Till': 'OutletID',
+}
+
+MATCH_TOLERANCE = pd.Timedelta(minutes=15)
+MAX_MATCH_ROUNDS = 5
+
+
+# ============================================================================
+# SECTION 1: STATEMENTS
+# ============================================================================
+
+def load_mpesa_statement(path: str) -> pd.DataFrame:
+    """Read an M-Pesa statement CSV into ReceiptNo, Timestamp, Amount, OutletID, Details.
+
+    Accepts either Safaricom export headers ('Receipt No.', 'Completion
+    Time', 'Paid In', ...) or the normalized names. Withdrawals and blank
+    Paid In lines are dropped.
+    """
+    statement = pd.read_csv(path).rename(columns=STATEMENT_COLUMNS)
+    missing = [c for c in ['ReceiptNo', 'Timestamp', 'Amount'] if c not in statement.columns]
+    if missing:
+        raise ValueError(f"M-Pesa statement is missing columns: {', '.join(missing)}")
+
+    statement['Timestamp'] = pd.to_datetime(statement['Timestamp']).astype('datetime64[ns]')
+    statement['Amount'] = pd.to_numeric(
+        statement['Amount'].astype(str).str.replace(',', ''), errors='coerce'
+    )
+    statement = statement[statement['Amount'] > 0]
+    if 'OutletID' not in statement.columns:
+        statement['OutletID'] = None
+    if 'Details' not in statement.columns:
+        statement['Details'] = ''
+    return statement[['ReceiptNo', 'Timestamp', 'Amount', 'OutletID', 'Details']].reset_index(drop=True)
+
+
+def simulate_mpesa_statement(df: pd.DataFrame, seed: int = 42) -> pd.DataFrame:
+    """Build a statement stand-in from POS data, with realistic discrepancies.
+
+    One payment per M-Pesa basket, settling a few minutes either side of the
+    POS time. About 1% of baskets never reach the till, 0.5% settle for a
+    different amount, 20% of voided lines were still charged, and 0.5%
+    extra payments have no POS record at all.
+    """
+    rng = np.random.default_rng(seed)
+    mpesa = df[(df['PaymentType'] == 'M-Pesa') & (df['IsReturn'] == 'No')]
+    charged = (mpesa['Voided'] == 'No').values | (rng.random(len(mpesa)) < 0.20)
+    baskets = build_baskets(mpesa.assign(TotalPriceKES=np.where(charged, mpesa['TotalPriceKES'], 0.0)))
+    charged_lines = np.bincount(pd.factorize(mpesa['TransactionID'])[0], weights=charged, minlength=len(baskets))
+    paid = baskets[(charged_lines > 0) & (rng.random(len(baskets)) >= 0.01)]
+
+    amount = paid['Value'].values.copy()
+    altered = rng.random(len(paid)) < 0.005
+    amount[altered] += rng.choice([-100, -50, 50, 100], size=altered.sum())
+
+    extra_n = int(len(paid) * 0.005)
+    extra = paid.iloc[rng.integers(0, max(len(paid), 1), size=extra_n)] if extra_n else paid.iloc[:0]
+
+    timestamps = np.concatenate([
+        paid['Date'].values + pd.to_timedelta(rng.integers(-180, 180, size=len(paid)), unit='s').values,
+        extra['Date'].values + pd.to_timedelta(rng.integers(600, 7200, size=extra_n), unit='s').values,
+    ])
+    statement = pd.DataFrame({
+        'Timestamp': timestamps,
+        'Amount': np.concatenate([amount, rng.choice([100, 250, 500, 1000], size=extra_n).astype(float)]),
+        'OutletID': np.concatenate([paid['OutletID'].values, extra['OutletID'].values]),
+        'Details': 'Merchant Payment',
+    }).sort_values('Timestamp', kind='mergesort').reset_index(drop=True)
+    statement.insert(0, 'ReceiptNo', [f'SK{i:08d}' for i in range(len(statement))])
+    return statement
+
+
+# ============================================================================
+# SECTION 2: MATCHING
+# ============================================================================
+
+def _amount_key(amount: pd.Series) -> np.ndarray:
+    return np.round(amount.values.astype(float) * 100).astype(np.int64)
+
+
+def _match_positions(transactions: pd.DataFrame, statement: pd.DataFrame,
+                     tolerance: pd.Timedelta) -> Tuple[np.ndarray, np.ndarray]:
+    """Matched transaction row (-1 if none) and lag in seconds for every statement line."""
+    # Work on integer row positions so the per-round anti-joins stay cheap
+    txns = pd.DataFrame({
+        'TxnPos': np.arange(len(transactions)),
+        'TxnTime': transactions['Date'].values.astype('datetime64[ns]'),
+        'OutletID': transactions['OutletID'].values,
+        'AmountKey': _amount_key(transactions['TotalPriceKES']),
+    }).sort_values('TxnTime', kind='mergesort')
+    lines = pd.DataFrame({
+        'LinePos': np.arange(len(statement)),
+        'Timestamp': statement['Timestamp'].values.astype('datetime64[ns]'),
+        'OutletID': statement['OutletID'].values,
+        'AmountKey': _amount_key(statement['Amount']),
+    }).sort_values('Timestamp', kind='mergesort')
+    by = ['OutletID', 'AmountKey'] if lines['OutletID'].notna().all() else ['AmountKey']
+
+    txn_pos = np.full(len(statement), -1)
+    lag = np.full(len(statement), np.nan)
+    txn_taken = np.zeros(len(transactions), dtype=bool)
+    pending = lines
+    for _ in range(MAX_MATCH_ROUNDS):
+        available = txns[~txn_taken[txns['TxnPos'].values]]
+        if pending.empty or available.empty:
+            break
+        joined = pd.merge_asof(
+            pending, available.assign(Timestamp=available['TxnTime']),
+            on='Timestamp', by=by, direction='nearest', tolerance=tolerance
+        )
+        joined = joined[joined['TxnPos'].notna()]
+        if joined.empty:
+            break
+        joined['LagSeconds'] = (joined['Timestamp'] - joined['TxnTime']).dt.total_seconds()
+        winners = joined.assign(AbsLag=joined['LagSeconds'].abs()) \
+            .sort_values(['AbsLag', 'LinePos'], kind='mergesort') \
+            .drop_duplicates('TxnPos')
+        won_lines = winners['LinePos'].values
+        won_txns = winners['TxnPos'].values.astype(int)
+        txn_pos[won_lines] = won_txns
+        lag[won_lines] = winners['LagSeconds'].values
+        txn_taken[won_txns] = True
+        pending = pending[txn_pos[pending['LinePos'].values] < 0]
+
+    return txn_pos, lag
+
+
+def match_statement(transactions: pd.DataFrame, statement: pd.DataFrame,
+                    tolerance: pd.Timedelta = MATCH_TOLERANCE) -> pd.DataFrame:
+    """One-to-one match of statement lines to M-Pesa baskets (one row per TransactionID).
+
+    Each round runs a nearest-direction ``merge_asof`` keyed by outlet and
+    amount in cents. When several lines claim the same transaction the
+    closest one keeps it; the rest retry against the remaining transactions
+    in the next round. Returns one row per statement line with the matched
+    TransactionID (NaN if unmatched) and the time lag in seconds.
+    """
+    txn_pos, lag = _match_positions(transactions, statement, tolerance)
+    return pd.DataFrame({
+        'ReceiptNo': statement['ReceiptNo'].values,
+        'TransactionID': pd.Series(transactions['TransactionID'].values).reindex(txn_pos).values,
+        'LagSeconds': lag,
+    })
+
+
+def reconcile_mpesa(df: pd.DataFrame, statement: pd.DataFrame,
+                    tolerance: pd.Timedelta = MATCH_TOLERANCE) -> Dict[str, pd.DataFrame]:
+    """Reconcile POS M-Pesa sales against a statement.
+
+    Each statement line pays for a whole basket, so POS lines are first
+    rolled up to one row per TransactionID. Returns a dict with 'matches',
+    'unmatched_lines', 'unmatched_txns', 'daily' (per day and outlet) and
+    'cashier' variance tables. Variance is money received on the statement
+    minus M-Pesa sales recorded at the POS.
+    """
+    transactions = build_baskets(
+        df[(df['PaymentType'] == 'M-Pesa') & (df['Voided'] == 'No') & (df['IsReturn'] == 'No')]
+    ).rename(columns={'Value': 'TotalPriceKES'})
+    statement = statement.reset_index(drop=True)
+    txn_pos, lag = _match_positions(transactions, statement, tolerance)
+    matched = txn_pos >= 0
+
+    lines = statement.assign(
+        TransactionID=pd.Series(transactions['TransactionID'].values).reindex(txn_pos).values,
+        LagSeconds=lag,
+        Unmatched=~matched
+    )
+    # Lines from a statement without till numbers take the outlet of their match
+    matched_outlet = pd.Series(transactions['OutletID'].values).reindex(txn_pos).values
+    lines['OutletID'] = lines['OutletID'].where(lines['OutletID'].notna(), matched_outlet)
+    received_amount = np.zeros(len(transactions))
+    received_amount[txn_pos[matched]] = statement['Amount'].values[matched]
+    txn_matched = np.zeros(len(transactions), dtype=bool)
+    txn_matched[txn_pos[matched]] = True
+    txns = transactions.assign(Received=received_amount, Unmatched=~txn_matched)
+
+    matches = lines.loc[matched, ['ReceiptNo', 'TransactionID', 'LagSeconds']]
+    unmatched_lines = lines.loc[~matched, ['ReceiptNo', 'Timestamp', 'Amount', 'OutletID', 'Details']]
+    unmatched_txns = txns.loc[~txn_matched, ['TransactionID', 'Date', 'OutletName', 'CashierName', 'Lines', 'TotalPriceKES']]
+
+    outlet_names = df[['OutletID', 'OutletName']].drop_duplicates()
+    recorded = transactions.groupby([transactions['Date'].dt.date, 'OutletID']).agg(
+        Recorded=('TotalPriceKES', 'sum'),
+        Transactions=('TransactionID', 'count')
+    )
+    received = lines.groupby([lines['Timestamp'].dt.date, 'OutletID'], dropna=False).agg(
+        Statement=('Amount', 'sum'),
+        UnmatchedLines=('Unmatched', 'sum')
+    )
+    received.index.names = recorded.index.names
+    daily = recorded.join(received, how='outer').fillna(0).reset_index()
+    daily['Variance'] = daily['Statement'] - daily['Recorded']
+    daily = daily.merge(outlet_names, on='OutletID', how='left')
+
+    cashier = txns.groupby(['CashierID', 'CashierName', 'OutletName']).agg(
+        Recorded=('TotalPriceKES', 'sum'),
+        Received=('Received', 'sum'),
+        Transactions=('TransactionID', 'count'),
+        UnmatchedTxns=('Unmatched', 'sum')
+    ).reset_index()
+    cashier['Variance'] = cashier['Received'] - cashier['Recorded']
+
+    return {
+        'matches': matches.reset_index(drop=True),
+        'unmatched_lines': unmatched_lines.reset_index(drop=True),
+        'unmatched_txns': unmatched_txns.reset_index(drop=True),
+        'daily': daily,
+        'cashier': cashier.sort_values('Variance').reset_index(drop=True),
+    }
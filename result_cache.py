@@ -0,0 +1,166 @@
+"""
+BiasharaFlow Pharma - Shared result cache
+Process-wide cache for per-view results (filtered frames, rankings, stats)
+keyed by a normalized hash of the filter state, so identical views across
+sessions are computed once. Bounded by a byte budget with LRU and TTL
+eviction, and counts hits, misses and evictions.
+"""
+
+import hashlib
+import json
+import sys
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime
+from typing import Any, Callable, Dict, Hashable, Optional
+
+import pandas as pd
+import numpy as np
+
+
+# ============================================================================
+# SECTION 1: KEYS AND SIZES
+# ============================================================================
+
+def _normalize(value: Any) -> Any:
+    """JSON-ready form in which equivalent filter states compare equal."""
+    if isinstance(value, (datetime, date, pd.Timestamp)):
+        return pd.Timestamp(value).isoformat()
+    if isinstance(value, dict):
+        return {str(k): _normalize(v) for k, v in sorted(value.items())}
+    if isinstance(value, (set, frozenset)):
+        return sorted(_normalize(v) for v in value)
+    if isinstance(value, (list, np.ndarray, pd.Index)):
+        # Multiselect order does not change the view
+        return sorted((_normalize(v) for v in value), key=repr)
+    if isinstance(value, tuple):
+        # Tuples are ranges (dates, hours): order matters
+        return [_normalize(v) for v in value]
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def filter_key(**state) -> str:
+    """Stable hash of a filter state; list order and date types do not matter."""
+    payload = json.dumps(_normalize(state), sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def sizeof(value: Any) -> int:
+    """Approximate bytes held by a cached value."""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, (pd.Series, pd.Index)):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(sizeof(k) + sizeof(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(sizeof(v) for v in value)
+    return sys.getsizeof(value)
+
+
+# ============================================================================
+# SECTION 2: CACHE
+# ============================================================================
+
+class ResultCache:
+    """Thread-safe LRU cache with a byte budget and a time-to-live.
+
+    Values are shared between callers and must be treated as read-only.
+    A value larger than the whole budget is returned but not stored.
+    Concurrent misses on the same key compute it once: later callers wait
+    for the first one's result.
+    """
+
+    def __init__(self, max_bytes: int = 256 * 1024 ** 2, ttl_seconds: Optional[float] = 3600):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries: 'OrderedDict[Hashable, tuple]' = OrderedDict()  # key -> (value, nbytes, stored_at)
+        self._inflight: Dict[Hashable, threading.Event] = {}
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _drop(self, key: Hashable) -> None:
+        _, nbytes, _ = self._entries.pop(key)
+        self._bytes -= nbytes
+
+    def _lookup(self, key: Hashable) -> tuple:
+        """(found, value) under the lock, expiring a stale entry."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        if self.ttl_seconds is not None and time.monotonic() - entry[2] > self.ttl_seconds:
+            self._drop(key)
+            self.expirations += 1
+            return False, None
+        self._entries.move_to_end(key)
+        return True, entry[0]
+
+    def _store(self, key: Hashable, value: Any) -> None:
+        nbytes = sizeof(value)
+        if nbytes > self.max_bytes:
+            return
+        if key in self._entries:
+            self._drop(key)
+        while self._entries and self._bytes + nbytes > self.max_bytes:
+            self._drop(next(iter(self._entries)))
+            self.evictions += 1
+        self._entries[key] = (value, nbytes, time.monotonic())
+        self._bytes += nbytes
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """Cached value for ``key``, calling ``compute()`` once on a miss."""
+        while True:
+            with self._lock:
+                found, value = self._lookup(key)
+                if found:
+                    self.hits += 1
+                    return value
+                waiting = self._inflight.get(key)
+                if waiting is None:
+                    self.misses += 1
+                    done = self._inflight[key] = threading.Event()
+                    break
+            waiting.wait()
+
+        try:
+            value = compute()
+            with self._lock:
+                self._store(key, value)
+            return value
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            done.set()
+
+    def peek(self, key: Hashable) -> tuple:
+        """(found, value) for ``key`` without computing it or counting a lookup."""
+        with self._lock:
+            return self._lookup(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'Entries': len(self._entries),
+                'Bytes': self._bytes,
+                'MaxBytes': self.max_bytes,
+                'Hits': self.hits,
+                'Misses': self.misses,
+                'HitRate': self.hits / lookups * 100 if lookups else 0.0,
+                'Evictions': self.evictions,
+                'Expirations': self.expirations,
+            }
@@ -0,0 +1,167 @@
+"""
+BiasharaFlow Pharma - Return matching
+Links every return line to the sale it most likely reverses: the latest
+earlier sale at the same outlet of the same item, quantity and amount,
+within a lookback window. Returns with no such sale, and returns rung up by
+a different cashier from the one who made the sale, are flagged.
+
+Usage:
+    python returns.py --rows 1000000 --scale 200x10x10000
+"""
+
+import argparse
+import time
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+import numpy as np
+
+
+LOOKBACK_DAYS = 30
+MAX_MATCH_ROUNDS = 5
+MATCH_KEY = ['OutletID', 'ItemCode', 'Quantity', 'AmountKey']
+RETURN_COLUMNS = ['TransactionID', 'Date', 'OutletID', 'OutletName', 'CashierID', 'CashierName', 'ItemCode',
+                  'ItemName', 'Quantity', 'TotalPriceKES', 'IsReturn']
+STATUSES = ['Matched', 'Different cashier', 'Unmatched']
+
+
+def _match_keys(sales: pd.DataFrame, returns: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+    """One integer code per (outlet, item, quantity, absolute amount in cents), shared by sales and returns."""
+    keys = pd.DataFrame({
+        'OutletID': np.concatenate([sales['OutletID'].values, returns['OutletID'].values]),
+        'ItemCode': np.concatenate([sales['ItemCode'].values, returns['ItemCode'].values]),
+        'Quantity': np.concatenate([sales['Quantity'].values, returns['Quantity'].values]),
+        'AmountKey': np.round(np.abs(np.concatenate([sales['TotalPriceKES'].values,
+                                                     returns['TotalPriceKES'].values])) * 100).astype(np.int64),
+    })
+    # Hash each column, then fold the codes together and re-hash after each step to keep them dense,
+    # so merge_asof groups by a single int64 column
+    code = np.zeros(len(keys), dtype=np.int64)
+    for col in MATCH_KEY:
+        part, uniques = pd.factorize(keys[col])
+        code, _ = pd.factorize(code * len(uniques) + part)
+    return code[:len(sales)], code[len(sales):]
+
+
+def _match_positions(sales: pd.DataFrame, returns: pd.DataFrame,
+                     lookback: pd.Timedelta) -> Tuple[np.ndarray, np.ndarray]:
+    """Matched sale row (-1 if none) and lag in days for every return line.
+
+    Each round joins the pending returns to the latest earlier untaken sale
+    with the same key (``merge_asof`` backward, by key code). When several
+    returns claim one sale the nearest keeps it and the rest retry against
+    the remaining sales in the next round.
+    """
+    sale_code, return_code = _match_keys(sales, returns)
+    sale_lines = pd.DataFrame({
+        'SalePos': np.arange(len(sales)),
+        'Time': sales['Date'].values.astype('datetime64[ns]'),
+        'Key': sale_code,
+    }).sort_values('Time', kind='mergesort')
+    pending = pd.DataFrame({
+        'ReturnPos': np.arange(len(returns)),
+        'Time': returns['Date'].values.astype('datetime64[ns]'),
+        'Key': return_code,
+    }).sort_values('Time', kind='mergesort')
+
+    sale_pos = np.full(len(returns), -1)
+    lag = np.full(len(returns), np.nan)
+    taken = np.zeros(len(sales), dtype=bool)
+    for _ in range(MAX_MATCH_ROUNDS):
+        available = sale_lines[~taken[sale_lines['SalePos'].values]]
+        if pending.empty or available.empty:
+            break
+        joined = pd.merge_asof(
+            pending, available.assign(SaleTime=available['Time']),
+            on='Time', by='Key', direction='backward', tolerance=lookback, allow_exact_matches=False
+        )
+        joined = joined[joined['SalePos'].notna()]
+        if joined.empty:
+            break
+        joined['LagDays'] = (joined['Time'] - joined['SaleTime']) / pd.Timedelta(days=1)
+        winners = joined.sort_values(['LagDays', 'ReturnPos'], kind='mergesort').drop_duplicates('SalePos')
+        won_returns = winners['ReturnPos'].values
+        won_sales = winners['SalePos'].values.astype(int)
+        sale_pos[won_returns] = won_sales
+        lag[won_returns] = winners['LagDays'].values
+        taken[won_sales] = True
+        pending = pending[sale_pos[pending['ReturnPos'].values] < 0]
+
+    return sale_pos, lag
+
+
+def match_returns(df: pd.DataFrame, lookback_days: float = LOOKBACK_DAYS) -> Dict[str, pd.DataFrame]:
+    """Match every live return line to its original sale, one sale per return.
+
+    Returns a dict with 'returns' (one row per return line with the matched
+    sale's TransactionID, date and cashier, the lag in days and a Status of
+    'Matched', 'Different cashier' or 'Unmatched') and 'cashier' (per
+    cashier counts and values of each status, most flagged first).
+    """
+    live = df.loc[df['Voided'] == 'No', RETURN_COLUMNS]
+    returned = live['IsReturn'] == 'Yes'
+    sales = live[~returned].reset_index(drop=True)
+    returns = live[returned].reset_index(drop=True)
+    sale_pos, lag = _match_positions(sales, returns, pd.Timedelta(days=lookback_days))
+    matched = sale_pos >= 0
+
+    def sale_column(col: str) -> np.ndarray:
+        return pd.Series(sales[col].values).reindex(sale_pos).values
+
+    table = returns[['TransactionID', 'Date', 'OutletName', 'CashierID', 'CashierName', 'ItemCode', 'ItemName',
+                     'Quantity', 'TotalPriceKES']].rename(columns={'TransactionID': 'ReturnID', 'Date': 'ReturnDate'})
+    table['SaleID'] = sale_column('TransactionID')
+    table['SaleDate'] = sale_column('Date')
+    table['SaleCashierID'] = sale_column('CashierID')
+    table['SaleCashierName'] = sale_column('CashierName')
+    table['LagDays'] = lag
+    table['Status'] = np.where(~matched, STATUSES[2],
+                               np.where(table['SaleCashierID'].values != table['CashierID'].values,
+                                        STATUSES[1], STATUSES[0]))
+    table = table.sort_values('ReturnDate', ascending=False, kind='mergesort').reset_index(drop=True)
+
+    value = table['TotalPriceKES'].abs()
+    cashier = table.assign(**{status: table['Status'] == status for status in STATUSES},
+                           FlaggedKES=value.where(table['Status'] != STATUSES[0], 0.0), ValueKES=value)
+    cashier = cashier.groupby(['CashierID', 'CashierName', 'OutletName']).agg(
+        Returns=('ReturnID', 'count'),
+        Matched=(STATUSES[0], 'sum'),
+        DifferentCashier=(STATUSES[1], 'sum'),
+        Unmatched=(STATUSES[2], 'sum'),
+        ValueKES=('ValueKES', 'sum'),
+        FlaggedKES=('FlaggedKES', 'sum'),
+    ).reset_index()
+    cashier['FlaggedRate'] = (cashier['DifferentCashier'] + cashier['Unmatched']) / cashier['Returns'] * 100
+    cashier = cashier.sort_values(['FlaggedKES', 'Returns'], ascending=False, kind='mergesort')
+    return {'returns': table, 'cashier': cashier.reset_index(drop=True)}
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    import data_generation
+    import dimensions
+
+    parser = argparse.ArgumentParser(description="Match returns to their original sales and time it.")
+    parser.add_argument('--rows', type=int, default=2500, help="Synthetic transactions to generate")
+    parser.add_argument('--seed', type=int, default=42, help="Generator seed")
+    parser.add_argument('--scale', default='', help="Synthetic OUTLETSxSTAFFxSKUS, e.g. 200x10x10000")
+    parser.add_argument('--lookback-days', type=float, default=LOOKBACK_DAYS, help="How far back a sale can be")
+    parser.add_argument('--out', default='', help="Write the matched returns to this CSV")
+    args = parser.parse_args(argv)
+
+    dims = dimensions.synthesize_dimensions(**dimensions.parse_scale(args.scale), seed=args.seed) \
+        if args.scale else None
+    df = data_generation.generate_pharmacy_data(args.rows, args.seed, dims)
+
+    t0 = time.perf_counter()
+    result = match_returns(df, args.lookback_days)
+    seconds = time.perf_counter() - t0
+    table = result['returns']
+    print(f"Matched {len(table):,} returns against {len(df):,} lines in {seconds:.2f}s")
+    print(table['Status'].value_counts().reindex(STATUSES, fill_value=0).to_string())
+    if args.out:
+        table.to_csv(args.out, index=False)
+        print(f"Wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+"""
+BiasharaFlow Pharma - Outlet-sharded execution backend
+Splits the transactions by outlet across worker processes, each holding its
+shard in memory for the life of the backend. A query is scattered to every
+shard, each returns a partial aggregate of its own rows, and the partials
+are merged, so group-wide views use every core.
+
+Usage:
+    python sharded_backend.py --shards 4 --rows 200000 --scale 40x10x2000
+"""
+
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Sequence
+
+import pandas as pd
+import numpy as np
+
+import analytics
+import sql_backend
+
+
+EMPLOYEE_MEASURES = {'TotalPriceKES': 'sum', 'ProfitKES': 'sum', 'TransactionID': 'nunique',
+                     'Quantity': 'sum', 'DiscountPercent': 'mean'}
+DAILY_MEASURES = {'TotalPriceKES': 'sum', 'ProfitKES': 'sum', 'TransactionID': 'nunique', 'Quantity': 'sum'}
+
+
+def assign_shards(df: pd.DataFrame, shards: int) -> Dict[str, int]:
+    """Shard number per OutletID, largest outlets first onto the lightest shard."""
+    rows = df['OutletID'].value_counts(sort=True)
+    load = np.zeros(shards, dtype=np.int64)
+    assignment = {}
+    for outlet, count in rows.items():
+        shard = int(np.argmin(load))
+        assignment[outlet] = shard
+        load[shard] += count
+    return assignment
+
+
+# ============================================================================
+# SECTION 1: SHARD WORKERS
+# ============================================================================
+
+# This worker process's rows: 'all' transactions and the 'sales' view of them
+_SHARD: Dict[str, pd.DataFrame] = {}
+
+
+def _load_shard(all_df: pd.DataFrame) -> None:
+    all_df = analytics.fraud_flags(all_df)
+    _SHARD['all'] = all_df
+    _SHARD['sales'] = analytics.sales_only(all_df)
+
+
+def _group_partial(source: str, keys: Sequence[str], measures: Dict[str, str], filters: Dict) -> pd.DataFrame:
+    """This shard's totals per group, with each mean split into a sum and a count.
+
+    A basket's lines share one outlet and so one shard, which makes the
+    per-shard distinct basket counts disjoint and summable.
+    """
+    df = analytics.filter_transactions(_SHARD[source], **filters)
+    groups = [df['Date'].dt.date.rename('SaleDate') if key == 'SaleDate' else df[key] for key in keys]
+    spec = {}
+    for col, how in measures.items():
+        if how == 'mean':
+            spec[f'{col}:sum'] = (col, 'sum')
+            spec[f'{col}:count'] = (col, 'count')
+        else:
+            spec[col] = (col, how)
+    return df.groupby(groups).agg(**spec).reset_index()
+
+
+def _kpi_partial(filters: Dict) -> Dict[str, float]:
+    df = analytics.filter_transactions(_SHARD['sales'], **filters)
+    return {
+        'Sales': float(df['TotalPriceKES'].sum()),
+        'Profit': float(df['ProfitKES'].sum()),
+        'Transactions': int(df['TransactionID'].nunique()),
+        'Units': int(df['Quantity'].sum()),
+        'MpesaSales': float(df.loc[df['PaymentType'] == 'M-Pesa', 'TotalPriceKES'].sum()),
+    }
+
+
+def _day_hour_partial(value: str, filters: Dict):
+    """Full day-of-week x 24-hour totals and the hours seen, or None if no rows match."""
+    df = analytics.filter_transactions(_SHARD['sales'], **filters)
+    if len(df) == 0:
+        return None
+    matrix = analytics.bincount_matrix((df['DayOfWeek'].values, df['Hour'].values), (7, 24), df[value].values)
+    return matrix, int(df['Hour'].min()), int(df['Hour'].max())
+
+
+def _shard_rows() -> int:
+    return len(_SHARD['all'])
+
+
+# ============================================================================
+# SECTION 2: BACKEND
+# ============================================================================
+
+class ShardedBackend:
+    """Scatter-gather aggregations over outlet shards held by worker processes.
+
+    Each shard is a one-process pool initialized with its outlets' rows, so
+    work submitted to it always finds them in memory. Methods mirror their
+    analytics counterparts and take the same keyword filters as
+    analytics.filter_transactions; results match the pandas path. Pools
+    accept submissions from any thread, so concurrent sessions queue at the
+    shards rather than behind one lock.
+    """
+
+    def __init__(self, all_df: pd.DataFrame, shards: Optional[int] = None):
+        shards = max(1, min(shards or os.cpu_count() or 1, all_df['OutletID'].nunique()))
+        self.assignment = assign_shards(all_df, shards)
+        shard_of = all_df['OutletID'].map(self.assignment).values
+        self._pools = [
+            ProcessPoolExecutor(max_workers=1, initializer=_load_shard,
+                                initargs=(all_df[shard_of == shard].reset_index(drop=True),))
+            for shard in range(shards)
+        ]
+        # Start every worker now rather than on the first query
+        self.shard_rows = self._scatter(_shard_rows)
+
+    @classmethod
+    def from_frame(cls, all_df: pd.DataFrame, shards: Optional[int] = None) -> 'ShardedBackend':
+        """Shard all transactions, voids and returns included (sales views exclude them per shard)."""
+        return cls(all_df, shards)
+
+    def close(self) -> None:
+        """Stop the shard workers, waiting for them so their pipes close cleanly."""
+        for pool in self._pools:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    def _scatter(self, func, *args) -> List:
+        futures = [pool.submit(func, *args) for pool in self._pools]
+        return [future.result() for future in futures]
+
+    def _aggregate(self, source: str, keys: Sequence[str], measures: Dict[str, str], filters: Dict) -> pd.DataFrame:
+        """Merged totals per group of ``keys``, sorted by the keys, with means recombined."""
+        partials = pd.concat(self._scatter(_group_partial, source, list(keys), measures, filters), ignore_index=True)
+        merged = partials.groupby(list(keys)).sum().reset_index()
+        for col, how in measures.items():
+            if how == 'mean':
+                merged[col] = merged.pop(f'{col}:sum') / merged.pop(f'{col}:count')
+        return merged[list(keys) + list(measures)]
+
+    def sales_totals(self, by: Sequence[str], **filters) -> pd.DataFrame:
+        """Sharded counterpart of analytics.sales_totals(filter_transactions(df, **filters), by)."""
+        return self._aggregate('sales', by, analytics.SALES_TOTALS, filters)
+
+    def kpis(self, **filters) -> Dict[str, float]:
+        """Overview headline numbers: sales, profit, baskets, units and M-Pesa sales."""
+        partials = self._scatter(_kpi_partial, filters)
+        return {key: sum(p[key] for p in partials) for key in partials[0]}
+
+    def daily_sales_report(self, **filters) -> pd.DataFrame:
+        """Sharded counterpart of analytics.daily_sales_report."""
+        report = self._aggregate('sales', ['SaleDate'], DAILY_MEASURES, filters)
+        report.columns = ['Date', 'Total Sales', 'Profit', 'Transactions', 'Units Sold']
+        return report
+
+    def employee_performance(self, **filters) -> pd.DataFrame:
+        """Sharded counterpart of analytics.employee_performance."""
+        stats = self._aggregate('sales', ['CashierID', 'CashierName', 'OutletName'], EMPLOYEE_MEASURES, filters)
+        return analytics.rank_employees(stats)
+
+    def fraud_risk(self, **filters) -> pd.DataFrame:
+        """Sharded counterpart of analytics.fraud_risk over all transactions, voids included."""
+        stats = self._aggregate('all', ['CashierID', 'CashierName', 'OutletName'], analytics.FRAUD_MEASURES, filters)
+        return analytics.score_fraud(stats)
+
+    def day_hour_matrix(self, value: str = 'TotalPriceKES', **filters) -> pd.DataFrame:
+        """Sharded counterpart of analytics.day_hour_matrix(filter_transactions(df, **filters))."""
+        partials = [p for p in self._scatter(_day_hour_partial, value, filters) if p is not None]
+        if not partials:
+            hours = np.arange(7, 23)
+            return pd.DataFrame(np.zeros((7, len(hours))), index=analytics.DAY_ORDER, columns=hours)
+        hours = np.arange(min(p[1] for p in partials), max(p[2] for p in partials) + 1)
+        matrix = sum(p[0] for p in partials)
+        return pd.DataFrame(matrix[:, hours], index=analytics.DAY_ORDER, columns=hours)
+
+
+# ============================================================================
+# SECTION 3: PARITY AND TIMING
+# ============================================================================
+
+def parity_check(all_df: pd.DataFrame, backend: ShardedBackend, **filters) -> pd.DataFrame:
+    """Run every sharded query against its single-process pandas counterpart on ``all_df``.
+
+    Returns one row per query with both timings and the first difference
+    found ('' when the results agree).
+    """
+    sales_df = analytics.sales_only(all_df)
+    checks = [(f"sales_totals({', '.join(by)})",
+               lambda by=by: analytics.sales_totals(analytics.filter_transactions(sales_df, **filters), by),
+               lambda by=by: backend.sales_totals(by, **filters)) for by in sql_backend.PARITY_GROUPS]
+    checks += [
+        ('daily_sales_report', lambda: analytics.daily_sales_report(analytics.filter_transactions(sales_df, **filters)),
+         lambda: backend.daily_sales_report(**filters)),
+        ('employee_performance',
+         lambda: analytics.employee_performance(analytics.filter_transactions(sales_df, **filters)),
+         lambda: backend.employee_performance(**filters)),
+        ('fraud_risk', lambda: analytics.fraud_risk(analytics.filter_transactions(all_df, **filters)),
+         lambda: backend.fraud_risk(**filters)),
+        ('day_hour_matrix', lambda: analytics.day_hour_matrix(analytics.filter_transactions(sales_df, **filters)),
+         lambda: backend.day_hour_matrix(**filters)),
+    ]
+
+    results = []
+    for name, pandas_query, sharded_query in checks:
+        t0 = time.perf_counter()
+        expected = pandas_query()
+        pandas_seconds = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        actual = sharded_query()
+        sharded_seconds = time.perf_counter() - t0
+        results.append({
+            'Query': name,
+            'Rows': len(expected),
+            'PandasSeconds': pandas_seconds,
+            'ShardedSeconds': sharded_seconds,
+            'Speedup': pandas_seconds / sharded_seconds if sharded_seconds > 0 else np.nan,
+            'Difference': sql_backend.first_difference(expected, actual) or '',
+        })
+    return pd.DataFrame(results)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    import data_generation
+    import dimensions
+    import price_anomalies
+
+    parser = argparse.ArgumentParser(description="Check sharded backend results and timings against pandas.")
+    parser.add_argument('--shards', type=int, default=os.cpu_count(), help="Worker processes (default: one per core)")
+    parser.add_argument('--rows', type=int, default=2500, help="Synthetic transactions to generate")
+    parser.add_argument('--seed', type=int, default=42, help="Generator seed")
+    parser.add_argument('--scale', default='', help="Synthetic OUTLETSxSTAFFxSKUS, e.g. 200x10x10000")
+    args = parser.parse_args(argv)
+
+    dims = dimensions.synthesize_dimensions(**dimensions.parse_scale(args.scale), seed=args.seed) \
+        if args.scale else None
+    all_df = price_anomalies.score_lines(data_generation.generate_pharmacy_data(args.rows, args.seed, dims))
+
+    t0 = time.perf_counter()
+    backend = ShardedBackend.from_frame(all_df, args.shards)
+    print(f"Loaded {len(all_df):,} rows into {len(backend.shard_rows)} shards "
+          f"({', '.join(f'{n:,}' for n in backend.shard_rows)} rows) in {time.perf_counter() - t0:.2f}s")
+
+    outlets = sorted(all_df['OutletName'].unique())
+    scenarios = {
+        'no filters': {},
+        'half the outlets, one month, daytime': {
+            'date_range': (pd.Timestamp('2024-10-01').date(), pd.Timestamp('2024-10-31').date()),
+            'outlets': outlets[::2],
+            'hour_range': (9, 17),
+        },
+        'empty selection': {'payment_types': []},
+    }
+    failed = False
+    try:
+        with pd.option_context('display.width', 200, 'display.max_colwidth', 80):
+            for label, filters in scenarios.items():
+                results = parity_check(all_df, backend, **filters)
+                failed |= (results['Difference'] != '').any()
+                print(f"\n{label}:")
+                print(results.to_string(index=False, float_format='{:.4f}'.format))
+    finally:
+        backend.close()
+    if failed:
+        raise SystemExit("Sharded backend results differ from pandas")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,370 @@
+"""
+BiasharaFlow Pharma - Approximate metrics from mergeable sketches
+Keeps a t-digest (basket value), exact value counts (discount %),
+HyperLogLog (distinct baskets, distinct items) and count-min sketch (units
+per item) for every (day, outlet) partition. A query merges the partitions
+it covers instead of scanning rows; basket-value digests are also rolled up
+per month x outlet and per month, so whole months merge a few rollups
+rather than every day.
+
+Error bounds, with the defaults below:
+    HyperLogLog   p=12 (4096 registers): relative standard error 1.04/sqrt(4096)
+                  = 1.6% on distinct counts.
+    Count-min     width 2048, depth 5: estimates never undercount, and overcount
+                  by at most e/2048 = 0.13% of all units in the selection with
+                  probability 1 - e^-5 = 99.3%.
+    t-digest      compression 100 per day, 50 per rollup: no worst-case
+                  guarantee; rank error is largest near the median (typically
+                  around 1% after the rollups) and shrinks toward the tails,
+                  where centroids are singletons.
+    Value counts  exact: discount % takes a handful of values, so its quantiles
+                  are exact and always a discount that was actually given.
+"""
+
+import pandas as pd
+import numpy as np
+from scipy import sparse
+from typing import Dict, Optional, Sequence, Tuple
+
+from baskets import build_baskets
+
+
+HLL_PRECISION = 12
+CMS_WIDTH = 2048
+CMS_DEPTH = 5
+TDIGEST_COMPRESSION = 100
+ROLLUP_COMPRESSION = 50
+
+
+def _hash(values: pd.Series) -> np.ndarray:
+    """Deterministic 64-bit hash of each value."""
+    return pd.util.hash_pandas_object(pd.Series(values), index=False).values
+
+
+def _as_int(codes: np.ndarray) -> np.ndarray:
+    return np.asarray(codes, dtype=np.int64)
+
+
+def _group_extreme(groups: np.ndarray, values: np.ndarray, n: int, ufunc, fill: float) -> np.ndarray:
+    """Per-group minimum or maximum (``ufunc`` np.minimum / np.maximum)."""
+    out = np.full(n, fill)
+    ufunc.at(out, _as_int(groups), values)
+    return out
+
+
+def _sorted_last(keys: np.ndarray, values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Unique keys with the maximum value of each."""
+    order = np.lexsort((values, keys))
+    keys, values = keys[order], values[order]
+    last = np.append(keys[1:] != keys[:-1], True)
+    return keys[last], values[last]
+
+
+def _covered(groups: np.ndarray, selected: np.ndarray) -> np.ndarray:
+    """Per row, whether every row of its group is selected."""
+    return (np.bincount(groups, weights=selected) == np.bincount(groups))[groups]
+
+
+# ============================================================================
+# SECTION 1: SKETCH PRIMITIVES
+# ============================================================================
+
+def hll_registers(hashes: np.ndarray, precision: int = HLL_PRECISION) -> Tuple[np.ndarray, np.ndarray]:
+    """HyperLogLog register index and rank (leading zeros + 1) for each hash."""
+    tail_bits = 64 - precision
+    register = (hashes >> np.uint64(tail_bits)).astype(np.int64)
+    tail = (hashes & np.uint64((1 << tail_bits) - 1)).astype(np.float64)  # < 2**52, so exact
+    bit_length = np.frexp(tail)[1]
+    return register, (tail_bits - bit_length + 1).astype(np.uint8)
+
+
+def hll_estimate(registers: np.ndarray) -> float:
+    """Cardinality estimate from a full register array, with small-range correction."""
+    m = len(registers)
+    alpha = 0.7213 / (1 + 1.079 / m)
+    estimate = alpha * m * m / np.sum(np.ldexp(1.0, -registers.astype(int)))
+    zeros = np.count_nonzero(registers == 0)
+    if estimate <= 2.5 * m and zeros > 0:
+        estimate = m * np.log(m / zeros)
+    return float(estimate)
+
+
+def cms_columns(hashes: np.ndarray, width: int = CMS_WIDTH, depth: int = CMS_DEPTH) -> np.ndarray:
+    """Count-min counter column per (row, hash) as ``row * width + bucket``, shape (n, depth).
+
+    The ``depth`` bucket hashes are derived from two halves of one 64-bit
+    hash (h1 + i * h2), which keeps the count-min guarantees.
+    """
+    h1 = (hashes & np.uint64(0xFFFFFFFF)).astype(np.int64)
+    h2 = (hashes >> np.uint64(32)).astype(np.int64) | 1
+    rows = np.arange(depth, dtype=np.int64)
+    return rows * width + (h1[:, None] + rows * h2[:, None]) % width
+
+
+def tdigest_compress(means: np.ndarray, weights: np.ndarray, groups: Optional[np.ndarray] = None,
+                     compression: int = TDIGEST_COMPRESSION) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Merge weighted points into t-digest centroids, independently per group.
+
+    Points are sorted and cut where the arcsine scale function
+    k(q) = compression / (2 pi) * asin(2q - 1) crosses an integer, so
+    centroids are small at the tails and large around the median. Returns
+    (group, mean, weight) per centroid, sorted by group then mean. Compressing
+    the centroids of several digests together is how digests merge.
+    """
+    groups = np.zeros(len(means), dtype=np.int64) if groups is None else groups
+    order = np.lexsort((means, groups))
+    groups, means, weights = groups[order], means[order], weights[order]
+    if len(means) == 0:
+        return groups, means, weights
+
+    starts = np.flatnonzero(np.append(True, groups[1:] != groups[:-1]))
+    group_of = np.repeat(np.arange(len(starts)), np.diff(np.append(starts, len(groups))))
+    cum = np.cumsum(weights)
+    before = np.append(0.0, cum)[starts][group_of]
+    totals = np.bincount(group_of, weights=weights)[group_of]
+    q = (cum - before - weights / 2) / totals
+    k = np.floor(compression / (2 * np.pi) * np.arcsin(np.clip(2 * q - 1, -1, 1)) + compression / 4)
+
+    # A new centroid starts at every group or k-bucket change
+    boundary = np.append(True, (group_of[1:] != group_of[:-1]) | (k[1:] != k[:-1]))
+    centroid = np.cumsum(boundary) - 1
+    out_weights = np.bincount(centroid, weights=weights)
+    out_means = np.bincount(centroid, weights=means * weights) / out_weights
+    return groups[boundary], out_means, out_weights
+
+
+def tdigest_quantiles(means: np.ndarray, weights: np.ndarray, lo: float, hi: float,
+                      qs: Sequence[float]) -> np.ndarray:
+    """Quantiles from one digest's sorted centroids, interpolating between centroid centres."""
+    if len(means) == 0:
+        return np.full(len(qs), np.nan)
+    total = weights.sum()
+    centres = np.cumsum(weights) - weights / 2
+    return np.interp(np.asarray(qs) * total, np.concatenate([[0], centres, [total]]),
+                     np.concatenate([[lo], means, [hi]]))
+
+
+def discrete_quantiles(values: np.ndarray, counts: np.ndarray, qs: Sequence[float]) -> np.ndarray:
+    """Quantiles of a discrete column from its sorted values and their counts.
+
+    Each quantile is the smallest value whose cumulative count reaches it
+    (the inverted CDF), so it is always a value that occurs.
+    """
+    present = counts > 0
+    values, cum = values[present], np.cumsum(counts[present])
+    if len(values) == 0:
+        return np.full(len(qs), np.nan)
+    rank = np.searchsorted(cum, np.asarray(qs) * cum[-1], side='left')
+    return values[np.minimum(rank, len(values) - 1)].astype(float)
+
+
+# ============================================================================
+# SECTION 2: PARTITIONED SKETCHES
+# ============================================================================
+
+class SketchIndex:
+    """Mergeable sketches per (day, outlet) partition, answering approximate queries.
+
+    Each sketch family is stored for all partitions at once: HyperLogLog
+    registers, count-min counters and value counts as sparse partition x
+    counter matrices (a partition only holds the counters its rows touched),
+    t-digest centroids as flat arrays tagged with their partition. A query
+    selects partitions by date and outlet, merges them (max for registers,
+    sum for counters, re-compression for centroids) and reads the answer
+    off the merged sketch.
+
+    Day digests are small, so they are pre-merged into month x outlet and
+    month rollups; a query uses the rollup of every month (or month x
+    outlet) it covers entirely and day digests only for the rest.
+    """
+
+    def __init__(self, partitions: pd.DataFrame, digests: Dict[str, Tuple],
+                 histograms: Dict[str, Tuple[np.ndarray, sparse.csr_matrix]],
+                 registers: Dict[str, sparse.csr_matrix], counters: sparse.csr_matrix, items: pd.DataFrame):
+        self.partitions = partitions
+        self._digests = digests
+        self._histograms = histograms
+        self._registers = registers
+        self._counters = counters
+        self._items = items
+        self._item_columns = cms_columns(_hash(items['ItemCode']))
+
+        # Rollups: each partition's month x outlet cell and month, and their pre-merged digests
+        month = partitions['Day'].dt.to_period('M')
+        self._cells, _ = pd.MultiIndex.from_arrays([month, partitions['OutletName']]).factorize()
+        self._months, _ = month.factorize()
+        self._rollups = {
+            name: tuple(tdigest_compress(means, weights, level[groups], ROLLUP_COMPRESSION)
+                        for level in (self._cells, self._months))
+            for name, (groups, means, weights, _, _) in digests.items()
+        }
+
+    @classmethod
+    def from_transactions(cls, df: pd.DataFrame) -> 'SketchIndex':
+        """Build sketches from completed sales (no voids or returns)."""
+        day = df['Date'].dt.normalize()
+        codes, partitions = pd.MultiIndex.from_arrays([day, df['OutletName']]).factorize()
+        partitions = partitions.to_frame(index=False, name=['Day', 'OutletName'])
+        n = len(partitions)
+
+        # A basket's lines share its date and outlet, so each basket falls in one partition
+        basket_df = build_baskets(df)
+        basket_part = pd.MultiIndex.from_frame(partitions).get_indexer(
+            pd.MultiIndex.from_arrays([basket_df['Date'].dt.normalize(), basket_df['OutletName']])
+        )
+
+        digests = {}
+        for name, groups, values in [('BasketValue', basket_part, basket_df['Value'].values)]:
+            values = values.astype(float)
+            digests[name] = tdigest_compress(values, np.ones(len(values)), _as_int(groups)) + (
+                _group_extreme(groups, values, n, np.minimum, np.inf),
+                _group_extreme(groups, values, n, np.maximum, -np.inf),
+            )
+
+        histograms = {}
+        for name in ['DiscountPercent']:
+            values, column = np.unique(df[name].values.astype(float), return_inverse=True)
+            histograms[name] = values, sparse.csr_matrix(
+                (np.ones(len(df)), (_as_int(codes), column)), shape=(n, len(values))
+            )
+
+        m = 1 << HLL_PRECISION
+        registers = {}
+        for name, groups, keys in [('Baskets', basket_part, basket_df['TransactionID']),
+                                   ('Items', codes, df['ItemCode'])]:
+            register, rank = hll_registers(_hash(keys))
+            cell, rank = _sorted_last(_as_int(groups) * m + register, rank)
+            registers[name] = sparse.csr_matrix((rank, (cell // m, cell % m)), shape=(n, m), dtype=np.uint8)
+
+        columns = cms_columns(_hash(df['ItemCode']))
+        counters = sparse.csr_matrix(
+            (np.repeat(df['Quantity'].values.astype(np.float64), CMS_DEPTH),
+             (np.repeat(_as_int(codes), CMS_DEPTH), columns.ravel())),
+            shape=(n, CMS_DEPTH * CMS_WIDTH)
+        )
+        items = df[['ItemCode', 'ItemName', 'Category']].drop_duplicates('ItemCode').reset_index(drop=True)
+        return cls(partitions, digests, histograms, registers, counters, items)
+
+    def merge(self, other: 'SketchIndex') -> 'SketchIndex':
+        """Combine with another index, e.g. the stored history with today's sales.
+
+        Partitions present in both are merged the way a query merges them:
+        register max, counter sum and centroid re-compression.
+        """
+        keys = pd.MultiIndex.from_frame(pd.concat([self.partitions, other.partitions], ignore_index=True))
+        codes, partitions = keys.factorize()
+        partitions = partitions.to_frame(index=False, name=['Day', 'OutletName'])
+        n = len(partitions)
+        left, right = _as_int(codes[:len(self.partitions)]), _as_int(codes[len(self.partitions):])
+        both = np.concatenate([left, right])
+
+        digests = {}
+        for name, (g1, m1, w1, lo1, hi1) in self._digests.items():
+            g2, m2, w2, lo2, hi2 = other._digests[name]
+            digests[name] = tdigest_compress(np.concatenate([m1, m2]), np.concatenate([w1, w2]),
+                                             np.concatenate([left[g1], right[g2]])) + (
+                _group_extreme(both, np.concatenate([lo1, lo2]), n, np.minimum, np.inf),
+                _group_extreme(both, np.concatenate([hi1, hi2]), n, np.maximum, -np.inf),
+            )
+
+        histograms = {}
+        for name, (v1, h1) in self._histograms.items():
+            v2, h2 = other._histograms[name]
+            values = np.union1d(v1, v2)
+            a, b = h1.tocoo(), h2.tocoo()
+            histograms[name] = values, sparse.csr_matrix(
+                (np.concatenate([a.data, b.data]),
+                 (np.concatenate([left[a.row], right[b.row]]),
+                  np.concatenate([np.searchsorted(values, v1)[a.col], np.searchsorted(values, v2)[b.col]]))),
+                shape=(n, len(values))
+            )
+
+        registers = {}
+        for name, mine in self._registers.items():
+            a, b = mine.tocoo(), other._registers[name].tocoo()
+            m = a.shape[1]
+            cell, rank = _sorted_last(np.concatenate([left[a.row], right[b.row]]) * m +
+                                      np.concatenate([a.col, b.col]), np.concatenate([a.data, b.data]))
+            registers[name] = sparse.csr_matrix((rank, (cell // m, cell % m)), shape=(n, m), dtype=np.uint8)
+
+        a, b = self._counters.tocoo(), other._counters.tocoo()
+        counters = sparse.csr_matrix(
+            (np.concatenate([a.data, b.data]), (np.concatenate([left[a.row], right[b.row]]), np.concatenate([a.col, b.col]))),
+            shape=(n, a.shape[1])
+        )
+        items = pd.concat([self._items, other._items]).drop_duplicates('ItemCode').reset_index(drop=True)
+        return SketchIndex(partitions, digests, histograms, registers, counters, items)
+
+    def _select(self, date_range: Optional[Tuple] = None, outlets: Optional[Sequence[str]] = None) -> np.ndarray:
+        mask = np.ones(len(self.partitions), dtype=bool)
+        if date_range is not None and len(date_range) == 2:
+            days = self.partitions['Day'].values
+            mask &= (days >= np.datetime64(date_range[0])) & (days <= np.datetime64(date_range[1]))
+        if outlets is not None:
+            mask &= self.partitions['OutletName'].isin(outlets).values
+        return np.flatnonzero(mask)
+
+    def quantiles(self, metric: str, qs: Sequence[float], **filters) -> np.ndarray:
+        """Approximate quantiles of 'BasketValue' or exact ones of 'DiscountPercent' over the selection."""
+        parts = self._select(**filters)
+        if metric in self._histograms:
+            values, counts = self._histograms[metric]
+            return discrete_quantiles(values, np.asarray(counts[parts].sum(axis=0)).ravel(), qs)
+
+        groups, means, weights, lo, hi = self._digests[metric]
+        if len(parts) == 0:
+            return np.full(len(qs), np.nan)
+        # Months, then month x outlet cells, whose every partition is selected come from their rollup
+        selected = np.zeros(len(self.partitions), dtype=bool)
+        selected[parts] = True
+        whole_month = _covered(self._months, selected)
+        whole_cell = _covered(self._cells, selected) & ~whole_month
+        days = selected & ~whole_month & ~whole_cell
+        (cell_groups, cell_means, cell_weights), (month_groups, month_means, month_weights) = self._rollups[metric]
+        keep_cells = np.isin(cell_groups, self._cells[whole_cell])
+        keep_months = np.isin(month_groups, self._months[whole_month])
+        pieces = [(means[days[groups]], weights[days[groups]]), (cell_means[keep_cells], cell_weights[keep_cells]),
+                  (month_means[keep_months], month_weights[keep_months])]
+        _, means, weights = tdigest_compress(np.concatenate([m for m, _ in pieces]),
+                                             np.concatenate([w for _, w in pieces]))
+        if len(means) == 0:
+            return np.full(len(qs), np.nan)
+        return tdigest_quantiles(means, weights, lo[parts].min(), hi[parts].max(), qs)
+
+    def distinct(self, kind: str, **filters) -> float:
+        """Approximate number of distinct 'Baskets' or 'Items' in the selection."""
+        parts = self._select(**filters)
+        if len(parts) == 0:
+            return 0.0
+        merged = self._registers[kind][parts].max(axis=0).toarray().ravel()
+        return hll_estimate(merged)
+
+    def heavy_hitters(self, n: int = 10, **filters) -> pd.DataFrame:
+        """Items with the most units in the selection, with the count-min error bound.
+
+        Candidates are the items seen when the index was built; each one's
+        units are the minimum of its counters in the merged sketch.
+        """
+        parts = self._select(**filters)
+        merged = np.asarray(self._counters[parts].sum(axis=0)).ravel()
+        estimates = merged[self._item_columns].min(axis=1)
+        total = merged[:CMS_WIDTH].sum()
+        top = np.argsort(-estimates, kind='mergesort')[:n]
+        hitters = self._items.iloc[top].reset_index(drop=True)
+        hitters['Units'] = estimates[top].astype(int)
+        hitters['MaxOvercount'] = int(np.ceil(np.e / CMS_WIDTH * total))
+        return hitters[hitters['Units'] > 0]
+
+    def summary(self, **filters) -> Dict[str, float]:
+        """Headline approximate metrics for the selection."""
+        value = self.quantiles('BasketValue', [0.5, 0.9, 0.99], **filters)
+        discount = self.quantiles('DiscountPercent', [0.5, 0.9], **filters)
+        return {
+            'Baskets': self.distinct('Baskets', **filters),
+            'Items': self.distinct('Items', **filters),
+            'BasketValueP50': value[0],
+            'BasketValueP90': value[1],
+            'BasketValueP99': value[2],
+            'DiscountP50': discount[0],
+            'DiscountP90': discount[1],
+        }
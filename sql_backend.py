@@ -0,0 +1,311 @@
+"""
+BiasharaFlow Pharma - SQL execution backend
+Compiles the sidebar filters and the sales aggregations into SQL for an
+embedded engine (DuckDB when installed, else SQLite) over an in-memory or
+on-disk database, or Parquet files, so only small results reach pandas.
+
+Usage:
+    python sql_backend.py --engine sqlite --rows 20000
+    python sql_backend.py --engine duckdb --parquet sales.parquet
+"""
+
+import argparse
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import pandas as pd
+
+import analytics
+
+try:
+    import duckdb
+except ImportError:  # optional: SQLite from the standard library is always available
+    duckdb = None
+
+
+TABLE = 'sales'
+ENGINES = ['duckdb', 'sqlite']
+
+# SQL aggregate for each analytics.SALES_TOTALS measure
+SQL_MEASURES = {
+    'sum': 'SUM({col})',
+    'nunique': 'COUNT(DISTINCT {col})',
+    'mean': 'AVG({col})',
+}
+
+# Dialect differences between the engines
+DATE_OF = {'sqlite': 'date(Date)', 'duckdb': 'CAST(Date AS DATE)'}
+TIMESTAMP_PARAM = {'sqlite': '?', 'duckdb': 'CAST(? AS TIMESTAMP)'}
+
+
+def default_engine() -> str:
+    return 'duckdb' if duckdb is not None else 'sqlite'
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+# ============================================================================
+# SECTION 1: FILTER COMPILATION
+# ============================================================================
+
+def compile_filters(engine: str,
+                    date_range: Optional[Tuple] = None,
+                    outlets: Optional[Sequence[str]] = None,
+                    categories: Optional[Sequence[str]] = None,
+                    employees: Optional[Sequence[str]] = None,
+                    shifts: Optional[Sequence[str]] = None,
+                    hour_range: Optional[Tuple[int, int]] = None,
+                    payment_types: Optional[Sequence[str]] = None) -> Tuple[str, List]:
+    """WHERE clause and parameters equivalent to analytics.filter_transactions.
+
+    Same arguments and semantics: a None filter is not applied, an empty
+    selection matches nothing. Dates become a half-open timestamp range on
+    Date so an index (SQLite) or zone map (DuckDB) can prune rows.
+    """
+    clauses, params = [], []
+    if date_range is not None and len(date_range) == 2:
+        start = pd.Timestamp(date_range[0])
+        end = pd.Timestamp(date_range[1]) + pd.Timedelta(days=1)
+        clauses.append(f"Date >= {TIMESTAMP_PARAM[engine]} AND Date < {TIMESTAMP_PARAM[engine]}")
+        params += [str(start), str(end)]
+    for column, values in [('OutletName', outlets), ('Category', categories), ('CashierName', employees),
+                           ('Shift', shifts), ('PaymentType', payment_types)]:
+        if values is None:
+            continue
+        values = list(values)
+        if not values:
+            clauses.append('1 = 0')
+            continue
+        clauses.append(f"{column} IN ({', '.join('?' * len(values))})")
+        params += [str(v) for v in values]
+    if hour_range is not None:
+        clauses.append('Hour BETWEEN ? AND ?')
+        params += [int(hour_range[0]), int(hour_range[1])]
+    where = ' WHERE ' + ' AND '.join(clauses) if clauses else ''
+    return where, params
+
+
+# ============================================================================
+# SECTION 2: BACKEND
+# ============================================================================
+
+class SQLBackend:
+    """Filtered aggregations over a ``sales`` table in an embedded SQL engine.
+
+    Methods mirror their analytics counterparts (``sales_totals``,
+    ``daily_sales_report``, ``employee_performance``) and take the same
+    keyword filters as analytics.filter_transactions, so callers can switch
+    between the pandas and SQL paths without reshaping the results.
+    """
+
+    def __init__(self, engine: Optional[str] = None, database: str = ':memory:'):
+        engine = engine or default_engine()
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown SQL engine '{engine}', expected one of: {', '.join(ENGINES)}")
+        if engine == 'duckdb' and duckdb is None:
+            raise ValueError("The duckdb engine needs the duckdb package; install it or use 'sqlite'")
+        self.engine = engine
+        self.database = database
+        # One connection shared across Streamlit sessions; queries are serialized
+        self._lock = threading.Lock()
+        if engine == 'duckdb':
+            self._conn = duckdb.connect(database)
+        else:
+            self._conn = sqlite3.connect(database, check_same_thread=False)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, engine: Optional[str] = None,
+                   database: str = ':memory:') -> 'SQLBackend':
+        backend = cls(engine, database)
+        backend.write(df)
+        return backend
+
+    @classmethod
+    def from_parquet(cls, path: str, database: str = ':memory:') -> 'SQLBackend':
+        """DuckDB view over Parquet file(s); rows are scanned on demand, never loaded whole."""
+        backend = cls('duckdb', database)
+        with backend._lock:
+            # DDL cannot take bound parameters, so the path is inlined as a quoted literal
+            literal = "'" + path.replace("'", "''") + "'"
+            backend._conn.execute(f"CREATE OR REPLACE VIEW {TABLE} AS SELECT * FROM read_parquet({literal})")
+        return backend
+
+    def write(self, df: pd.DataFrame) -> None:
+        """Replace the sales table with ``df`` and index it for the sidebar filters."""
+        with self._lock:
+            if self.engine == 'duckdb':
+                self._conn.register('_incoming', df)
+                self._conn.execute(f"CREATE OR REPLACE TABLE {TABLE} AS SELECT * FROM _incoming ORDER BY Date")
+                self._conn.unregister('_incoming')
+            else:
+                # SQLite has no timestamp type; ISO text sorts and compares correctly
+                stored = df.sort_values('Date', kind='mergesort').copy()
+                for col in stored.columns[stored.dtypes.map(pd.api.types.is_datetime64_any_dtype)]:
+                    stored[col] = stored[col].dt.strftime('%Y-%m-%d %H:%M:%S')
+                stored.to_sql(TABLE, self._conn, if_exists='replace', index=False, chunksize=50000)
+                self._conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{TABLE}_date ON {TABLE} (Date)")
+                self._conn.commit()
+
+    def query(self, sql: str, params: Optional[Sequence] = None) -> pd.DataFrame:
+        with self._lock:
+            if self.engine == 'duckdb':
+                return self._conn.execute(sql, params or []).df()
+            return pd.read_sql_query(sql, self._conn, params=params or [])
+
+    def _aggregate(self, keys: Sequence[str], measures: Dict[str, str], filters: Dict) -> pd.DataFrame:
+        """SELECT keys, measures ... GROUP BY keys ORDER BY keys, with filters pushed into WHERE."""
+        where, params = compile_filters(self.engine, **filters)
+        select = list(keys) + [f"{SQL_MEASURES[how].format(col=_quote(col))} AS {_quote(col)}"
+                               for col, how in measures.items()]
+        positions = ', '.join(str(i + 1) for i in range(len(keys)))
+        group = f" GROUP BY {positions} ORDER BY {positions}" if keys else ''
+        return self.query(f"SELECT {', '.join(select)} FROM {TABLE}{where}{group}", params)
+
+    def sales_totals(self, by: Sequence[str], **filters) -> pd.DataFrame:
+        """SQL counterpart of analytics.sales_totals(filter_transactions(df, **filters), by)."""
+        result = self._aggregate([_quote(c) for c in by], analytics.SALES_TOTALS, filters)
+        result.columns = list(by) + list(analytics.SALES_TOTALS)
+        return result.dropna(subset=['TotalPriceKES']).astype({'TransactionID': int, 'Quantity': int})
+
+    def kpis(self, **filters) -> Dict[str, float]:
+        """Overview headline numbers: sales, profit, baskets, units and M-Pesa sales."""
+        where, params = compile_filters(self.engine, **filters)
+        row = self.query(
+            f"SELECT COALESCE(SUM(TotalPriceKES), 0) AS Sales, COALESCE(SUM(ProfitKES), 0) AS Profit, "
+            f"COUNT(DISTINCT TransactionID) AS Transactions, COALESCE(SUM(Quantity), 0) AS Units, "
+            f"COALESCE(SUM(CASE WHEN PaymentType = 'M-Pesa' THEN TotalPriceKES ELSE 0 END), 0) AS MpesaSales "
+            f"FROM {TABLE}{where}", params
+        ).iloc[0]
+        return {k: int(v) if k in ('Transactions', 'Units') else float(v) for k, v in row.items()}
+
+    def daily_sales_report(self, **filters) -> pd.DataFrame:
+        """SQL counterpart of analytics.daily_sales_report."""
+        measures = {'TotalPriceKES': 'sum', 'ProfitKES': 'sum', 'TransactionID': 'nunique', 'Quantity': 'sum'}
+        report = self._aggregate([f"{DATE_OF[self.engine]} AS SaleDate"], measures, filters)
+        report['SaleDate'] = pd.to_datetime(report['SaleDate']).dt.date
+        report.columns = ['Date', 'Total Sales', 'Profit', 'Transactions', 'Units Sold']
+        return report.astype({'Transactions': int, 'Units Sold': int})
+
+    def employee_performance(self, **filters) -> pd.DataFrame:
+        """SQL counterpart of analytics.employee_performance."""
+        measures = {'TotalPriceKES': 'sum', 'ProfitKES': 'sum', 'TransactionID': 'nunique',
+                    'Quantity': 'sum', 'DiscountPercent': 'mean'}
+        stats = self._aggregate(['CashierID', 'CashierName', 'OutletName'], measures, filters)
+        return analytics.rank_employees(stats.astype({'TransactionID': int, 'Quantity': int}))
+
+
+# ============================================================================
+# SECTION 3: PARITY
+# ============================================================================
+
+# Group keys exercised by the parity check (the dashboard's sales views)
+PARITY_GROUPS = [
+    ['Hour'],
+    ['DayOfWeek', 'DayName'],
+    ['WeekNumber'],
+    ['MonthNum', 'Month'],
+    ['Shift'],
+    ['OutletID', 'OutletName', 'City', 'MonthlyTarget'],
+]
+
+
+def first_difference(expected: pd.DataFrame, actual: pd.DataFrame) -> Optional[str]:
+    """First line of the assertion message if the frames differ beyond float tolerance, else None."""
+    try:
+        pd.testing.assert_frame_equal(expected.reset_index(drop=True), actual.reset_index(drop=True),
+                                      check_dtype=False, rtol=1e-9, atol=1e-6)
+    except AssertionError as error:
+        return str(error).splitlines()[0]
+    return None
+
+
+def parity_check(df: pd.DataFrame, backend: SQLBackend, **filters) -> pd.DataFrame:
+    """Run every backend query against its pandas counterpart on ``df``.
+
+    Returns one row per query with both timings and the first difference
+    found ('' when the results agree).
+    """
+    t0 = time.perf_counter()
+    filtered_df = analytics.filter_transactions(df, **filters)
+    filter_seconds = time.perf_counter() - t0
+
+    checks = [(f"sales_totals({', '.join(by)})",
+               lambda by=by: analytics.sales_totals(filtered_df, by),
+               lambda by=by: backend.sales_totals(by, **filters)) for by in PARITY_GROUPS]
+    checks += [
+        ('daily_sales_report', lambda: analytics.daily_sales_report(filtered_df),
+         lambda: backend.daily_sales_report(**filters)),
+        ('employee_performance', lambda: analytics.employee_performance(filtered_df),
+         lambda: backend.employee_performance(**filters)),
+    ]
+
+    results = []
+    for name, pandas_query, sql_query in checks:
+        t0 = time.perf_counter()
+        expected = pandas_query()
+        pandas_seconds = time.perf_counter() - t0 + filter_seconds
+        t0 = time.perf_counter()
+        actual = sql_query()
+        sql_seconds = time.perf_counter() - t0
+        results.append({
+            'Query': name,
+            'Rows': len(expected),
+            'PandasSeconds': pandas_seconds,
+            'SQLSeconds': sql_seconds,
+            'Difference': first_difference(expected, actual) or '',
+        })
+    return pd.DataFrame(results)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    import data_generation
+    import dimensions
+
+    parser = argparse.ArgumentParser(description="Check SQL backend results and timings against pandas.")
+    parser.add_argument('--engine', default=default_engine(), choices=ENGINES, help="Embedded SQL engine")
+    parser.add_argument('--rows', type=int, default=2500, help="Synthetic transactions to generate")
+    parser.add_argument('--seed', type=int, default=42, help="Generator seed")
+    parser.add_argument('--scale', default='', help="Synthetic OUTLETSxSTAFFxSKUS, e.g. 200x10x10000")
+    parser.add_argument('--database', default=':memory:', help="SQLite/DuckDB database file")
+    parser.add_argument('--parquet', default='', help="Also write the sales to this Parquet file and query it (DuckDB)")
+    args = parser.parse_args(argv)
+
+    dims = dimensions.synthesize_dimensions(**dimensions.parse_scale(args.scale), seed=args.seed) \
+        if args.scale else None
+    sales_df = analytics.sales_only(data_generation.generate_pharmacy_data(args.rows, args.seed, dims))
+
+    t0 = time.perf_counter()
+    if args.parquet:
+        sales_df.to_parquet(args.parquet, index=False)
+        backend = SQLBackend.from_parquet(args.parquet, args.database)
+    else:
+        backend = SQLBackend.from_frame(sales_df, args.engine, args.database)
+    print(f"Loaded {len(sales_df):,} rows into {backend.engine} in {time.perf_counter() - t0:.2f}s")
+
+    outlets = sorted(sales_df['OutletName'].unique())
+    scenarios = {
+        'no filters': {},
+        'half the outlets, one month, daytime': {
+            'date_range': (pd.Timestamp('2024-10-01').date(), pd.Timestamp('2024-10-31').date()),
+            'outlets': outlets[::2],
+            'hour_range': (9, 17),
+        },
+        'empty selection': {'payment_types': []},
+    }
+    failed = False
+    with pd.option_context('display.width', 200, 'display.max_colwidth', 80):
+        for label, filters in scenarios.items():
+            results = parity_check(sales_df, backend, **filters)
+            failed |= (results['Difference'] != '').any()
+            print(f"\n{label}:")
+            print(results.to_string(index=False, float_format='{:.4f}'.format))
+    if failed:
+        raise SystemExit("SQL backend results differ from pandas")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""
+BiasharaFlow Pharma - Stock ledger
+Every stock movement per outlet x item shelf (opening stock, deliveries,
+sales and returns) in time order, with running balances and periodic
+checkpoints, so stock on hand at any moment is a checkpoint lookup plus a
+replay of the movements since it.
+"""
+
+from datetime import date, datetime
+from typing import Optional, Sequence, Union
+
+import pandas as pd
+import numpy as np
+
+
+KINDS = np.array(['Opening', 'Delivery', 'Sale', 'Return'])
+SHELF_COLUMNS = ['OutletID', 'OutletName', 'ItemCode', 'ItemName', 'Category', 'ReorderLevel', 'MaxStock']
+
+When = Union[str, date, datetime, pd.Timestamp]
+
+
+def _moment(when: When) -> np.datetime64:
+    """A timestamp; a bare date means the end of that day."""
+    if isinstance(when, date) and not isinstance(when, datetime):
+        return (pd.Timestamp(when) + pd.Timedelta(days=1) - pd.Timedelta(1, 'ns')).to_datetime64()
+    return pd.Timestamp(when).to_datetime64()
+
+
+class StockLedger:
+    """Stock movements per shelf with running balances and checkpoints.
+
+    Movements are held as flat arrays sorted by time. ``balance`` is each
+    movement's shelf's stock right after it, from a cumulative sum per
+    shelf. ``checkpoints`` holds every shelf's stock at each checkpoint
+    time (one row per checkpoint), built with one bincount over
+    (period, shelf) and a cumulative sum down the periods. Point-in-time
+    queries replay at most one period of movements.
+    """
+
+    def __init__(self, shelves: pd.DataFrame, times: np.ndarray, shelf: np.ndarray, kind: np.ndarray,
+                 change: np.ndarray, reference: np.ndarray, checkpoint_times: np.ndarray):
+        self.shelves = shelves
+        self.times = times
+        self.shelf = shelf
+        self.kind = kind
+        self.change = change
+        self.reference = reference
+        num_shelves = len(shelves)
+
+        # Running balance per shelf: cumulative sum in shelf-then-time order
+        self._by_shelf = np.argsort(shelf, kind='stable')
+        self._shelf_start = np.searchsorted(shelf[self._by_shelf], np.arange(num_shelves + 1))
+        total = np.cumsum(change[self._by_shelf])
+        before_shelf = np.r_[0, total][self._shelf_start[:-1]]
+        self.balance = np.empty_like(change)
+        self.balance[self._by_shelf] = total - np.repeat(before_shelf, np.diff(self._shelf_start))
+
+        # Checkpoint c is stock after every movement before checkpoint_times[c]
+        self.checkpoint_times = checkpoint_times
+        period = np.searchsorted(checkpoint_times, times, side='right')
+        moved = np.bincount(period * num_shelves + shelf, weights=change,
+                            minlength=(len(checkpoint_times) + 1) * num_shelves)
+        self.checkpoints = np.cumsum(moved.reshape(-1, num_shelves), axis=0)[:-1].astype(np.int64)
+
+    @classmethod
+    def from_transactions(cls, df: pd.DataFrame, receipts: pd.DataFrame, freq: str = 'W') -> 'StockLedger':
+        """Build from line items (voids move no stock) and stock receipts, checkpointing every ``freq``."""
+        live = df[df['Voided'] == 'No']
+        returned = (live['IsReturn'] == 'Yes').values
+        quantity = live['Quantity'].values.astype(np.int64)
+        movements = pd.DataFrame({
+            'Date': np.concatenate([receipts['Date'].values, live['Date'].values]),
+            'OutletID': np.concatenate([receipts['OutletID'].values, live['OutletID'].values]),
+            'ItemCode': np.concatenate([receipts['ItemCode'].values, live['ItemCode'].values]),
+            'Kind': np.concatenate([np.where(receipts['Kind'].values == 'Opening', 0, 1),
+                                    np.where(returned, 3, 2)]),
+            'Change': np.concatenate([receipts['Quantity'].values.astype(np.int64),
+                                      np.where(returned, quantity, -quantity)]),
+            'Reference': np.concatenate([np.full(len(receipts), ''), live['TransactionID'].values]),
+        })
+        # Receipts first, so a delivery stamped at the same moment as a sale is on the shelf for it
+        movements = movements.sort_values('Date', kind='mergesort').reset_index(drop=True)
+
+        shelf, keys = pd.MultiIndex.from_frame(movements[['OutletID', 'ItemCode']]).factorize(sort=True)
+        details = pd.concat([receipts, live])[SHELF_COLUMNS].drop_duplicates(['OutletID', 'ItemCode'])
+        shelves = keys.to_frame(index=False, name=['OutletID', 'ItemCode']).merge(
+            details, on=['OutletID', 'ItemCode'], how='left')
+
+        times = movements['Date'].values
+        checkpoint_times = (pd.date_range(pd.Timestamp(times[0]).normalize(), pd.Timestamp(times[-1]), freq=freq)
+                            .normalize().values if len(times) else np.array([], dtype='datetime64[ns]'))
+        return cls(shelves, times, np.asarray(shelf, dtype=np.int64), movements['Kind'].values.astype(np.int8),
+                   movements['Change'].values, movements['Reference'].values, checkpoint_times)
+
+    def _shelf_mask(self, outlets: Optional[Sequence[str]] = None,
+                    items: Optional[Sequence[str]] = None) -> np.ndarray:
+        mask = np.ones(len(self.shelves), dtype=bool)
+        if outlets is not None:
+            mask &= self.shelves['OutletName'].isin(outlets).values
+        if items is not None:
+            mask &= self.shelves['ItemName'].isin(items).values
+        return mask
+
+    def levels_as_of(self, when: When) -> np.ndarray:
+        """Stock on hand per shelf after every movement up to and including ``when``."""
+        moment = _moment(when)
+        c = np.searchsorted(self.checkpoint_times, moment, side='right') - 1
+        if c >= 0:
+            stock, replay_from = self.checkpoints[c].copy(), self.checkpoint_times[c]
+            lo = np.searchsorted(self.times, replay_from, side='left')
+        else:
+            stock, lo = np.zeros(len(self.shelves), dtype=np.int64), 0
+        hi = np.searchsorted(self.times, moment, side='right')
+        stock += np.bincount(self.shelf[lo:hi], weights=self.change[lo:hi],
+                             minlength=len(self.shelves)).astype(np.int64)
+        return stock
+
+    def stock_as_of(self, when: When, outlets: Optional[Sequence[str]] = None,
+                    items: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        """Shelf table with ``Stock`` on hand as of ``when`` (a date means its close)."""
+        mask = self._shelf_mask(outlets, items)
+        stock = self.shelves[mask].copy()
+        stock['Stock'] = self.levels_as_of(when)[mask]
+        return stock.reset_index(drop=True)
+
+    def closing_stock(self) -> pd.DataFrame:
+        """Shelf table with stock after the last movement."""
+        stock = self.shelves.copy()
+        stock['Stock'] = self.balance[self._by_shelf[self._shelf_start[1:] - 1]]
+        return stock
+
+    def history(self, outlet_id: str, item_code: str) -> pd.DataFrame:
+        """Every movement of one shelf in time order, with the balance after it."""
+        match = np.flatnonzero((self.shelves['OutletID'].values == outlet_id) &
+                               (self.shelves['ItemCode'].values == item_code))
+        if len(match) == 0:
+            return pd.DataFrame(columns=['Date', 'Kind', 'Change', 'Balance', 'TransactionID'])
+        rows = self._by_shelf[self._shelf_start[match[0]]:self._shelf_start[match[0] + 1]]
+        return pd.DataFrame({
+            'Date': self.times[rows],
+            'Kind': KINDS[self.kind[rows]],
+            'Change': self.change[rows],
+            'Balance': self.balance[rows],
+            'TransactionID': self.reference[rows],
+        })
+
+    def stockouts(self, until: Optional[When] = None) -> pd.DataFrame:
+        """Every interval a shelf stood at zero: from the sale that emptied it to its next movement.
+
+        A shelf can only be refilled from zero (nothing sells from an empty
+        shelf), so each zero balance opens one interval. Intervals still
+        open end at ``until``, by default the close of the last movement's
+        day, and are marked ``Ongoing``.
+        """
+        columns = SHELF_COLUMNS + ['Start', 'End', 'Ongoing', 'TransactionID']
+        if len(self.times) == 0:
+            return pd.DataFrame(columns=columns)
+        if until is None:
+            until = (pd.Timestamp(self.times[-1]).normalize() + pd.Timedelta(days=1)).to_datetime64()
+        else:
+            until = _moment(until)
+        rows = self._by_shelf
+        shelf = self.shelf[rows]
+        followed = np.r_[shelf[1:] == shelf[:-1], False]
+        empty = np.flatnonzero(self.balance[rows] == 0)
+        next_time = self.times[rows[np.minimum(empty + 1, len(rows) - 1)]]
+
+        intervals = self.shelves.iloc[shelf[empty]].reset_index(drop=True)
+        intervals['Start'] = self.times[rows[empty]]
+        intervals['End'] = np.where(followed[empty], next_time, until)
+        intervals['Ongoing'] = ~followed[empty]
+        intervals['TransactionID'] = self.reference[rows[empty]]
+        return intervals[intervals['Start'] < intervals['End']].reset_index(drop=True)
+
+    def stock_trend(self, freq: str = 'D', by: str = 'Category', outlets: Optional[Sequence[str]] = None,
+                    items: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        """Closing stock per period and ``by`` group, plus how many of the group's shelves were empty.
+
+        Period totals come from summing movements per (period, group) and a
+        cumulative sum down the periods; empty-shelf counts need each shelf's
+        closing level, taken from the running balance of its last movement in
+        each period.
+        """
+        mask = self._shelf_mask(outlets, items)
+        if len(self.times) == 0 or not mask.any():
+            return pd.DataFrame(columns=['Date', by, 'Stock', 'EmptyShelves'])
+        group, labels = pd.factorize(self.shelves[by].where(mask), sort=True)
+        periods = pd.period_range(pd.Timestamp(self.times[0]), pd.Timestamp(self.times[-1]), freq=freq)
+        ends = (periods.end_time.normalize() + pd.Timedelta(days=1)).values
+        period = np.searchsorted(ends, self.times, side='right')
+        keep = mask[self.shelf]
+        num_periods, num_groups = len(periods), len(labels)
+
+        cell = period[keep] * num_groups + group[self.shelf[keep]]
+        stock = np.cumsum(np.bincount(cell, weights=self.change[keep],
+                                      minlength=num_periods * num_groups).reshape(num_periods, num_groups), axis=0)
+
+        # Each shelf's level at each period end: its last movement per period, carried forward
+        rows = np.flatnonzero(keep)
+        rows = rows[np.lexsort((period[rows], self.shelf[rows]))]
+        last = np.r_[(self.shelf[rows][1:] != self.shelf[rows][:-1]) |
+                     (period[rows][1:] != period[rows][:-1]), True]
+        rows = rows[last]
+        # A shelf that closes a period empty stays empty until the next period it moves in
+        next_start = np.r_[np.where(self.shelf[rows][1:] == self.shelf[rows][:-1], period[rows][1:], num_periods),
+                           num_periods]
+        empty = self.balance[rows] == 0
+        spans = np.zeros((num_periods + 1, num_groups), dtype=np.int64)
+        np.add.at(spans, (period[rows][empty], group[self.shelf[rows][empty]]), 1)
+        np.add.at(spans, (next_start[empty], group[self.shelf[rows][empty]]), -1)
+        empty_shelves = np.cumsum(spans, axis=0)[:-1]
+
+        return pd.DataFrame({
+            'Date': np.repeat(periods.start_time, num_groups),
+            by: np.tile(np.asarray(labels), num_periods),
+            'Stock': stock.ravel().astype(np.int64),
+            'EmptyShelves': empty_shelves.ravel(),
+        })
@@ -0,0 +1,116 @@
+"""
+BiasharaFlow Pharma - Stock-outs and lost sales
+Finds the intervals each outlet x item shelf stood empty (from the stock
+ledger) and estimates the sales lost in them. Demand over time follows the
+day-of-week x hour profile behind the Time Analysis heatmap, in units, so an
+empty Saturday evening costs more than an empty Tuesday night.
+"""
+
+from typing import Optional, Tuple
+
+import pandas as pd
+import numpy as np
+
+import analytics
+from stock_ledger import SHELF_COLUMNS, StockLedger
+
+
+HOUR = np.timedelta64(1, 'h')
+
+
+# ============================================================================
+# SECTION 1: DEMAND CLOCK
+# ============================================================================
+
+def weekly_profile(sales_df: pd.DataFrame, value: str = 'Quantity') -> np.ndarray:
+    """Share of a week's ``value`` (units by default) in each day-of-week x hour slot (7 x 24, Monday first)."""
+    matrix = analytics.day_hour_matrix(sales_df, value=value)
+    profile = np.zeros((7, 24))
+    profile[:, matrix.columns.values] = matrix.values
+    total = profile.sum()
+    return profile / total if total > 0 else np.full((7, 24), 1 / (7 * 24))
+
+
+def demand_clock(profile: np.ndarray, start: np.datetime64, end: np.datetime64) -> Tuple[np.datetime64, np.ndarray]:
+    """Expected demand elapsed at every hour boundary from ``start``, in average weeks.
+
+    Returns the clock's origin (``start`` floored to the hour) and the
+    cumulative profile weight at each boundary, so the demand expected
+    between two moments is the difference of their readings.
+    """
+    origin = np.datetime64(start, 'h')
+    hours = np.arange(origin, np.datetime64(end, 'h') + 2 * HOUR, HOUR)
+    days = hours.astype('datetime64[D]').astype(np.int64)
+    weights = profile[(days + 3) % 7, (hours - hours.astype('datetime64[D]')).astype(np.int64)]
+    return origin, np.r_[0.0, np.cumsum(weights)]
+
+
+def clock_reading(clock: Tuple[np.datetime64, np.ndarray], times: np.ndarray) -> np.ndarray:
+    """Expected demand elapsed at each of ``times``, interpolating within the hour."""
+    origin, cumulative = clock
+    elapsed = (np.asarray(times, dtype='datetime64[ns]') - origin) / HOUR
+    return np.interp(elapsed, np.arange(len(cumulative)), cumulative)
+
+
+# ============================================================================
+# SECTION 2: LOST SALES
+# ============================================================================
+
+def estimate_lost_sales(ledger: StockLedger, sales_df: pd.DataFrame,
+                        until: Optional[np.datetime64] = None) -> pd.DataFrame:
+    """Stock-out intervals with the units, revenue and profit expected to have been lost in each.
+
+    A shelf's demand rate is its units sold divided by the demand-clock time
+    it spent in stock; an interval's lost units are that rate times the
+    clock time it spent empty. Revenue and profit per unit are the shelf's
+    realized averages (after discounts), falling back to the item's.
+    """
+    intervals = ledger.stockouts(until)
+    if len(intervals) == 0:
+        return intervals.assign(Hours=[], ExpectedWeeks=[], LostUnits=[], LostRevenueKES=[], LostProfitKES=[])
+    start = ledger.times[0]
+    end = intervals['End'].values.max()
+    clock = demand_clock(weekly_profile(sales_df), start, end)
+    intervals['Hours'] = (intervals['End'] - intervals['Start']) / pd.Timedelta(hours=1)
+    intervals['ExpectedWeeks'] = (clock_reading(clock, intervals['End'].values)
+                                  - clock_reading(clock, intervals['Start'].values))
+
+    # Per-shelf rate over in-stock clock time, and realized value per unit
+    keys = ['OutletID', 'ItemCode']
+    shelves = sales_df.groupby(keys).agg(
+        Units=('Quantity', 'sum'), Revenue=('TotalPriceKES', 'sum'), Profit=('ProfitKES', 'sum')
+    )
+    items = shelves.groupby(level='ItemCode').sum()
+    horizon = clock_reading(clock, np.array([end]))[0] - clock_reading(clock, np.array([start]))[0]
+    out = intervals.groupby(keys)['ExpectedWeeks'].sum()
+    shelves['InStockWeeks'] = horizon - out.reindex(shelves.index, fill_value=0.0)
+
+    shelf = shelves.reindex(pd.MultiIndex.from_frame(intervals[keys])).fillna(0.0)
+    item = items.reindex(intervals['ItemCode']).fillna(0.0)
+    in_stock = shelf['InStockWeeks'].values
+    rate = np.divide(shelf['Units'].values, in_stock, out=np.zeros(len(shelf)), where=in_stock > 0)
+    own = shelf['Units'].values > 0
+    units = np.maximum(np.where(own, shelf['Units'].values, item['Units'].values), 1)
+    revenue_per_unit = np.where(own, shelf['Revenue'].values, item['Revenue'].values) / units
+    profit_per_unit = np.where(own, shelf['Profit'].values, item['Profit'].values) / units
+
+    intervals['LostUnits'] = rate * intervals['ExpectedWeeks'].values
+    intervals['LostRevenueKES'] = intervals['LostUnits'].values * revenue_per_unit
+    intervals['LostProfitKES'] = intervals['LostUnits'].values * profit_per_unit
+    return intervals
+
+
+def lost_revenue_table(lost: pd.DataFrame) -> pd.DataFrame:
+    """Shelves ranked by estimated lost revenue, one row per outlet x item."""
+    table = lost.groupby(SHELF_COLUMNS, dropna=False).agg(
+        StockOuts=('Start', 'size'),
+        HoursOut=('Hours', 'sum'),
+        LastOut=('Start', 'max'),
+        StillOut=('Ongoing', 'any'),
+        LostUnits=('LostUnits', 'sum'),
+        LostRevenueKES=('LostRevenueKES', 'sum'),
+        LostProfitKES=('LostProfitKES', 'sum'),
+    ).reset_index()
+    table = table.sort_values('LostRevenueKES', ascending=False, kind='mergesort').reset_index(drop=True)
+    table.insert(0, 'Rank', np.arange(1, len(table) + 1))
+    return table
@@ -0,0 +1,158 @@
+"""
+BiasharaFlow Pharma - Monthly target tracking
+Month-to-date sales against MonthlyTarget for every outlet and month, with
+a month-end projection from a day-of-week x hour weighted run rate and the
+probability of reaching target. Every outlet x month is one cell of a few
+outlet x day matrices, so the whole chain is computed in one pass.
+
+Usage:
+    python targets.py --rows 1000000 --scale 200x10x10000
+"""
+
+import argparse
+import time
+from datetime import date, datetime
+from typing import List, Optional, Union
+
+import pandas as pd
+import numpy as np
+from scipy.special import ndtr
+
+import analytics
+from stockouts import clock_reading, demand_clock, weekly_profile
+
+
+# Prior weight on an outlet's long-run rate, in average weeks of demand, so early-month projections are steady
+PRIOR_WEEKS = 1.0
+# Projection band: 10th to 90th percentile
+BAND_Z = 1.2816
+STATUS_BINS = [0.3, 0.7]
+STATUSES = ['Off track', 'At risk', 'On track']
+TRACKING_COLUMNS = ['OutletID', 'OutletName', 'Month', 'MonthlyTarget', 'DaysElapsed', 'DaysInMonth', 'MTDSales',
+                    'Projected', 'P10', 'P90', 'ProjectedPct', 'HitProbability', 'Status', 'Closed']
+
+
+def track_targets(sales_df: pd.DataFrame, as_of: Optional[Union[date, datetime, pd.Timestamp]] = None) -> pd.DataFrame:
+    """Target tracking per outlet x month up to ``as_of`` (a date means its close; default: the last sale).
+
+    Demand is timed with the chain's day-of-week x hour sales profile: a
+    day's weight is its share of an average week's sales. An outlet's rate
+    is its month-to-date sales over the weight elapsed this month, shrunk
+    toward its rate over all history before ``as_of`` by PRIOR_WEEKS; the
+    projection adds that rate times the weight still to come. Daily noise
+    is the outlet's spread of daily sales around rate x weight, which gives
+    the P10-P90 band and the probability of reaching target (normal
+    approximation). Months already closed are exact.
+    """
+    if as_of is None:
+        as_of = sales_df['Date'].max()
+    elif isinstance(as_of, date) and not isinstance(as_of, datetime):
+        as_of = pd.Timestamp(as_of) + pd.Timedelta(days=1) - pd.Timedelta(1, 'ns')
+    as_of = pd.Timestamp(as_of)
+    sales = sales_df[sales_df['Date'] <= as_of]
+    if len(sales) == 0:
+        return pd.DataFrame(columns=TRACKING_COLUMNS)
+
+    # Calendar: every day from the first month with sales to the end of as_of's month
+    first_day = sales['Date'].min().to_period('M').start_time
+    last_day = as_of.to_period('M').end_time.normalize()
+    days = pd.date_range(first_day, last_day, freq='D')
+    month_of_day, months = pd.factorize(days.to_period('M'))
+    month_start = np.flatnonzero(np.r_[True, month_of_day[1:] != month_of_day[:-1]])
+
+    # Day weights from the demand clock, and the part of each day already elapsed at as_of
+    clock = demand_clock(weekly_profile(sales, value='TotalPriceKES'), days[0].to_datetime64(),
+                         (days[-1] + pd.Timedelta(days=1)).to_datetime64())
+    bounds = clock_reading(clock, (days.append(pd.DatetimeIndex([days[-1] + pd.Timedelta(days=1)]))).values)
+    weight = np.diff(bounds)
+    elapsed = np.clip(clock_reading(clock, np.array([as_of.to_datetime64()]))[0] - bounds[:-1], 0, weight)
+    remaining = weight - elapsed
+
+    outlet_codes, outlet_ids = pd.factorize(sales['OutletID'], sort=True)
+    day_codes = (sales['Date'].values.astype('datetime64[D]') - days[0].to_datetime64().astype('datetime64[D]')).astype(np.int64)
+    daily = analytics.bincount_matrix((outlet_codes, day_codes), (len(outlet_ids), len(days)),
+                                      sales['TotalPriceKES'].values)
+
+    # Long-run rate (sales per average week of demand) and daily noise, from full days before as_of
+    full = (elapsed >= weight) & (weight > 0)
+    history_rate = daily[:, full].sum(axis=1) / max(weight[full].sum(), 1e-12)
+    expected = history_rate[:, None] * weight[None, full]
+    residual_var = ((daily[:, full] - expected) ** 2).sum(axis=1) / np.maximum((weight[full] ** 2).sum(), 1e-12)
+
+    # Month sums of sales and weights, every outlet at once
+    mtd = np.add.reduceat(daily, month_start, axis=1)
+    elapsed_weight = np.add.reduceat(elapsed, month_start)
+    remaining_weight = np.add.reduceat(remaining, month_start)
+    remaining_sq = np.add.reduceat(remaining ** 2, month_start)
+    rate = (mtd + PRIOR_WEEKS * history_rate[:, None]) / (elapsed_weight + PRIOR_WEEKS)[None, :]
+    projected = mtd + rate * remaining_weight[None, :]
+    # Day-to-day noise on the days left, plus the uncertainty of the rate itself
+    rate_var = residual_var[:, None] / (elapsed_weight + PRIOR_WEEKS)[None, :]
+    spread = np.sqrt(residual_var[:, None] * remaining_sq[None, :] + rate_var * remaining_weight[None, :] ** 2)
+
+    targets = sales.drop_duplicates('OutletID').set_index('OutletID')
+    target = targets['MonthlyTarget'].reindex(outlet_ids).values.astype(float)[:, None]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        z = np.where(spread > 0, (projected - target) / spread, np.where(projected >= target, np.inf, -np.inf))
+    probability = ndtr(z)
+
+    num_outlets, num_months = mtd.shape
+    month_days = np.diff(np.r_[month_start, len(days)])
+    days_elapsed = np.add.reduceat((elapsed > 0).astype(np.int64), month_start)
+    closed = remaining_weight <= 0
+    result = pd.DataFrame({
+        'OutletID': np.repeat(np.asarray(outlet_ids), num_months),
+        'OutletName': np.repeat(targets['OutletName'].reindex(outlet_ids).values, num_months),
+        'Month': np.tile(months.astype(str), num_outlets),
+        'MonthlyTarget': np.repeat(target[:, 0], num_months),
+        'DaysElapsed': np.tile(days_elapsed, num_outlets),
+        'DaysInMonth': np.tile(month_days, num_outlets),
+        'MTDSales': mtd.ravel(),
+        'Projected': projected.ravel(),
+        'P10': np.maximum(projected - BAND_Z * spread, mtd).ravel(),
+        'P90': (projected + BAND_Z * spread).ravel(),
+        'HitProbability': probability.ravel(),
+        'Closed': np.tile(closed, num_outlets),
+    })
+    result['ProjectedPct'] = result['Projected'] / result['MonthlyTarget'] * 100
+    result['Status'] = np.where(result['MTDSales'] >= result['MonthlyTarget'], 'Achieved',
+                                np.where(result['Closed'], 'Missed',
+                                         np.asarray(STATUSES)[np.digitize(result['HitProbability'], STATUS_BINS)]))
+    return result[TRACKING_COLUMNS]
+
+
+def current_month(tracking: pd.DataFrame) -> pd.DataFrame:
+    """Rows of the latest month in ``tracking``, least likely to hit target first."""
+    latest = tracking[tracking['Month'] == tracking['Month'].max()]
+    return latest.sort_values(['HitProbability', 'ProjectedPct'], kind='mergesort').reset_index(drop=True)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    import data_generation
+    import dimensions
+
+    parser = argparse.ArgumentParser(description="Project month-end sales against target for every outlet.")
+    parser.add_argument('--rows', type=int, default=2500, help="Synthetic transactions to generate")
+    parser.add_argument('--seed', type=int, default=42, help="Generator seed")
+    parser.add_argument('--scale', default='', help="Synthetic OUTLETSxSTAFFxSKUS, e.g. 200x10x10000")
+    parser.add_argument('--as-of', default='', help="Track as of this date (YYYY-MM-DD); default: the last sale")
+    args = parser.parse_args(argv)
+
+    dims = dimensions.synthesize_dimensions(**dimensions.parse_scale(args.scale), seed=args.seed) \
+        if args.scale else None
+    sales_df = analytics.sales_only(data_generation.generate_pharmacy_data(args.rows, args.seed, dims))
+    as_of = pd.Timestamp(args.as_of).date() if args.as_of else None
+
+    t0 = time.perf_counter()
+    tracking = track_targets(sales_df, as_of)
+    seconds = time.perf_counter() - t0
+    print(f"Tracked {tracking['OutletID'].nunique():,} outlets x {tracking['Month'].nunique():,} months "
+          f"from {len(sales_df):,} sales in {seconds:.2f}s")
+    latest = current_month(tracking)
+    print(latest['Status'].value_counts().to_string())
+    print(latest.head(10)[['OutletName', 'Month', 'DaysElapsed', 'MTDSales', 'Projected', 'P10', 'P90',
+                           'MonthlyTarget', 'HitProbability', 'Status']].to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
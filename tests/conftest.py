@@ -0,0 +1,36 @@
+import os
+import sys
+
+# The modules are flat at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+import pytest
+
+
+# A completed sale of one Paracetamol at list price; tests override what they need
+LINE_DEFAULTS = {
+    'OutletID': 'OUT001', 'OutletName': 'Nairobi CBD', 'CashierID': 'C001', 'CashierName': 'Jane Wanjiku',
+    'PaymentType': 'M-Pesa', 'CustomerType': 'Walk-in', 'ItemCode': 'MED001', 'ItemName': 'Paracetamol 500mg',
+    'Category': 'Painkillers', 'Quantity': 1, 'UnitPriceKES': 50, 'UnitCostKES': 30, 'DiscountPercent': 0,
+    'Voided': 'No', 'IsReturn': 'No', 'MonthlyTarget': 800000,
+}
+
+
+@pytest.fixture
+def make_lines():
+    """Build transaction lines from dicts holding at least TransactionID and Date.
+
+    Totals, cost and profit follow from quantity, price and discount; a
+    return's total and profit are negative, as in the generator.
+    """
+    def build(rows):
+        lines = pd.DataFrame([{**LINE_DEFAULTS, **row} for row in rows])
+        lines['Date'] = pd.to_datetime(lines['Date'])
+        lines['Hour'], lines['DayOfWeek'] = lines['Date'].dt.hour, lines['Date'].dt.dayofweek
+        sign = lines['IsReturn'].map({'No': 1, 'Yes': -1})
+        lines['TotalPriceKES'] = sign * lines['UnitPriceKES'] * lines['Quantity'] * (1 - lines['DiscountPercent'] / 100)
+        lines['CostPriceKES'] = lines.pop('UnitCostKES') * lines['Quantity'] * 1.0
+        lines['ProfitKES'] = sign * (lines['TotalPriceKES'].abs() - lines['CostPriceKES'])
+        return lines
+    return build
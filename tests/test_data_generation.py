@@ -0,0 +1,33 @@
+import pandas as pd
+
+import data_generation
+import dimensions
+
+
+def test_workers_produce_the_same_data():
+    dims = dimensions.synthesize_dimensions(**dimensions.parse_scale('6x3x200'), seed=1)
+    single = data_generation.generate_pharmacy_data(20000, 9, dims, workers=1, with_receipts=True)
+    pooled = data_generation.generate_pharmacy_data(20000, 9, dims, workers=2, with_receipts=True)
+    pd.testing.assert_frame_equal(single[0], pooled[0])
+    pd.testing.assert_frame_equal(single[1], pooled[1])
+    assert single[0]['TransactionID'].str.match(r'^TXN\d+$').all()
+
+
+def test_short_shelves_serve_what_is_left():
+    dims = dimensions.synthesize_dimensions(6, 3, 200, seed=1)
+    df = data_generation.generate_pharmacy_data(20000, 9, dims)
+    assert len(df) < 20000  # rows count demand; lost sales are dropped
+    sale = (df['Voided'] == 'No') & (df['IsReturn'] == 'No')
+    returned = (df['Voided'] == 'No') & (df['IsReturn'] == 'Yes')
+    moved = (df['StockLevelBefore'] - df['Quantity'].where(sale, 0) + df['Quantity'].where(returned, 0))
+    assert (moved == df['StockLevelAfter']).all()
+    assert (df['Quantity'] > 0).all() and (df['StockLevelAfter'] >= 0).all()
+    # A line that emptied the shelf may have been cut short, but it is still sold and priced at what it got
+    emptied = df[sale & (df['StockLevelAfter'] == 0)]
+    assert len(emptied) > 0
+    expected = emptied['UnitPriceKES'] * emptied['Quantity'] * (1 - emptied['DiscountPercent'] / 100)
+    pd.testing.assert_series_equal(emptied['TotalPriceKES'], expected, check_names=False)
+    # ... and costed at the catalog unit cost for what it got
+    unit_cost = emptied['ItemName'].map(dims['catalog'].set_index('ItemName')['CostPriceKES'])
+    pd.testing.assert_series_equal(emptied['CostPriceKES'], unit_cost * emptied['Quantity'],
+                                   check_names=False, check_dtype=False)
@@ -0,0 +1,25 @@
+import pytest
+
+import dimensions
+
+
+def test_synthetic_cashier_names_are_unique():
+    staff = dimensions.synthesize_dimensions(**dimensions.parse_scale('200x10x100'))['staff']
+    assert staff['CashierName'].is_unique
+
+
+@pytest.mark.parametrize('spec', ['0x10x100', '20x0x100', '20x10x0', '20x-1x100', '20x10', 'axbxc'])
+def test_bad_scale_is_rejected(spec):
+    with pytest.raises(ValueError, match='Scale'):
+        dimensions.parse_scale(spec)
+
+
+def test_synthesize_rejects_empty_dimensions():
+    with pytest.raises(ValueError, match='staff_per_outlet'):
+        dimensions.synthesize_dimensions(3, 0, 10)
+
+
+def test_defaults_come_from_config():
+    dims = dimensions.default_dimensions()
+    assert [len(dims[name]) for name in ['outlets', 'staff', 'catalog']] == [3, 9, 30]
+    assert dims['catalog']['Seasonal'].eq('Yes').sum() == 5
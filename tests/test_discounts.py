@@ -0,0 +1,44 @@
+import pandas as pd
+import pytest
+
+import analytics
+import data_generation
+import discounts
+
+
+@pytest.fixture(scope='module')
+def sales():
+    sales = analytics.sales_only(data_generation.generate_pharmacy_data(20000, 5))
+    return sales.assign(Cashier=sales['CashierName'] + ' (' + sales['CashierID'] + ')',
+                        Month=sales['Date'].dt.strftime('%Y-%m'),
+                        ForgoneKES=sales['UnitPriceKES'] * sales['Quantity'] - sales['TotalPriceKES'])
+
+
+@pytest.fixture(scope='module')
+def cube(sales):
+    return discounts.DiscountCube.from_transactions(sales)
+
+
+PART_MONTHS = (pd.Timestamp('2024-08-10').date(), pd.Timestamp('2024-11-20').date())
+
+
+@pytest.mark.parametrize('by', ['CustomerType', 'Cashier', 'Month', 'ItemName', 'Category'])
+@pytest.mark.parametrize('date_range', [None, PART_MONTHS], ids=['all days', 'part months'])
+@pytest.mark.parametrize('selection', [{}, {'OutletName': ['Nairobi CBD']}, {'CustomerType': ['Corporate', 'Regular']},
+                                       {'Category': ['Painkillers']}], ids=['none', 'outlet', 'customers', 'category'])
+def test_leakage_matches_the_line_items(by, date_range, selection, sales, cube):
+    lines = sales
+    if date_range is not None:
+        lines = lines[(lines['Date'].dt.date >= date_range[0]) & (lines['Date'].dt.date <= date_range[1])]
+    for dimension, values in selection.items():
+        lines = lines[lines[dimension].isin(values)]
+    expected = lines.groupby(by)['ForgoneKES'].sum()
+    actual = cube.leakage(by, date_range, selection).set_index(by)['ForgoneKES']
+    pd.testing.assert_series_equal(actual.sort_index(), expected.sort_index(), check_names=False,
+                                   check_index_type=False)
+    assert cube.totals(date_range, selection)['ForgoneKES'] == pytest.approx(lines['ForgoneKES'].sum())
+
+
+def test_every_value_selected_is_no_selection(sales, cube):
+    everything = {'OutletName': cube.values('OutletName'), 'Category': cube.values('Category')}
+    pd.testing.assert_frame_equal(cube.leakage('Cashier', PART_MONTHS, everything), cube.leakage('Cashier', PART_MONTHS))
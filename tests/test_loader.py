@@ -0,0 +1,13 @@
+import loader
+
+
+def test_logins_run_alongside_the_simulation():
+    stages = loader.dataset_stages(2000, 3)
+    assert stages['logins'][1] == []
+    frames, timings = loader.load_datasets(2000, 3, max_workers=2)
+    logins, sales = frames['logins'], frames['sales']
+    assert str(logins['Date'].min()) == str(sales['Date'].min().date())
+    assert set(sales['CashierName']) <= set(logins['CashierName'])
+    # Logins never wait on the simulation
+    row = timings.set_index('Stage').loc['logins']
+    assert row['Path'] == 'logins'
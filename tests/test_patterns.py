@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+
+import data_generation
+import patterns
+
+
+def test_void_and_re_ring_pair(make_lines):
+    df = make_lines([
+        {'TransactionID': 'TXN1', 'Date': '2024-09-02 10:00', 'Quantity': 2, 'Voided': 'Yes'},
+        {'TransactionID': 'TXN2', 'Date': '2024-09-02 10:04', 'Quantity': 2},
+        # Same item, other cashier; then the same cashier re-rings too late
+        {'TransactionID': 'TXN3', 'Date': '2024-09-02 11:00', 'Voided': 'Yes', 'CashierID': 'C002'},
+        {'TransactionID': 'TXN4', 'Date': '2024-09-02 11:02'},
+        {'TransactionID': 'TXN5', 'Date': '2024-09-02 12:00', 'Voided': 'Yes'},
+        {'TransactionID': 'TXN6', 'Date': '2024-09-02 12:11'},
+    ])
+    found = patterns.detect_patterns(df)
+    cases = found['cases']
+    assert cases[['Pattern', 'TransactionIDs', 'Lines', 'AmountKES']].values.tolist() == \
+        [['Void and re-ring', 'TXN1, TXN2', 2, 100.0]]
+    assert found['evidence']['Role'].tolist() == ['Void', 'Re-ring']
+
+
+def test_re_ring_at_a_deeper_discount(make_lines):
+    df = make_lines([
+        {'TransactionID': 'TXN1', 'Date': '2024-09-02 10:00', 'Quantity': 4, 'Voided': 'Yes', 'DiscountPercent': 5},
+        {'TransactionID': 'TXN2', 'Date': '2024-09-02 10:03', 'Quantity': 4, 'DiscountPercent': 50},
+    ])
+    cases = patterns.detect_patterns(df)['cases']
+    assert cases[['Pattern', 'AmountKES']].values.tolist() == [['Discount after void', 90.0]]
+
+
+def test_burst_of_three_returns(make_lines):
+    df = make_lines([
+        {'TransactionID': 'TXN1', 'Date': '2024-09-02 10:00', 'IsReturn': 'Yes'},
+        {'TransactionID': 'TXN2', 'Date': '2024-09-04 10:00', 'IsReturn': 'Yes'},
+        {'TransactionID': 'TXN3', 'Date': '2024-09-08 09:00', 'IsReturn': 'Yes'},
+        # Two returns a week later are not enough on their own
+        {'TransactionID': 'TXN4', 'Date': '2024-09-20 10:00', 'IsReturn': 'Yes'},
+        {'TransactionID': 'TXN5', 'Date': '2024-09-21 10:00', 'IsReturn': 'Yes'},
+    ])
+    cases = patterns.detect_patterns(df)['cases']
+    assert cases[['Pattern', 'TransactionIDs', 'Lines', 'AmountKES']].values.tolist() == \
+        [['Burst returns', 'TXN1, TXN2, TXN3', 3, 150.0]]
+
+
+def brute_force_cases(df, window, return_window, min_returns):
+    """Every case by direct scans of each cashier x item history."""
+    found = []
+    for (cashier, item), lines in df.groupby(['CashierID', 'ItemCode'], sort=False):
+        lines = lines.sort_values('Date', kind='mergesort')
+        times = lines['Date'].tolist()
+        voided = (lines['Voided'] == 'Yes').tolist()
+        sale = [not v and r == 'No' for v, r in zip(voided, lines['IsReturn'])]
+        for i in np.flatnonzero(voided):
+            later = [j for j in range(i + 1, len(lines)) if sale[j] or voided[j]]
+            if later and sale[later[0]] and times[later[0]] - times[i] <= window:
+                found.append((cashier, item, times[i], times[later[0]], 2))
+
+        returned = lines[(lines['Voided'] == 'No') & (lines['IsReturn'] == 'Yes')]
+        seconds = ((returned['Date'] - df['Date'].min()) // pd.Timedelta(seconds=1)).tolist()
+        covered = np.zeros(len(returned), dtype=bool)
+        for i, t in enumerate(seconds):
+            inside = [j for j in range(i + 1) if t - seconds[j] <= return_window.total_seconds()]
+            if len(inside) >= min_returns:
+                covered[inside] = True
+        for run in np.split(np.arange(len(returned)), np.flatnonzero(np.diff(covered.astype(int))) + 1):
+            if len(run) and covered[run[0]]:
+                found.append((cashier, item, returned['Date'].iloc[run[0]], returned['Date'].iloc[run[-1]], len(run)))
+    return sorted(found)
+
+
+def test_detectors_match_a_brute_force_scan():
+    df = data_generation.generate_pharmacy_data(20000, 3)
+    cases = patterns.detect_patterns(df, return_days=14)['cases']
+    assert set(cases['Pattern']) == set(patterns.PATTERNS)
+    actual = sorted(cases[['CashierID', 'ItemCode', 'Start', 'End', 'Lines']].itertuples(index=False, name=None))
+    assert actual == brute_force_cases(df, pd.Timedelta(minutes=patterns.RERING_MINUTES), pd.Timedelta(days=14),
+                                       patterns.MIN_RETURNS)
@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+
+import data_generation
+import price_anomalies
+
+
+def test_half_price_line_is_flagged(make_lines):
+    usual = [{'TransactionID': f'TXN{i}', 'Date': f'2024-09-{i:02d} 10:00'} for i in range(1, 26)]
+    df = make_lines(usual + [
+        {'TransactionID': 'TXN26', 'Date': '2024-09-26 10:00', 'DiscountPercent': 50},
+        {'TransactionID': 'TXN27', 'Date': '2024-09-27 10:00', 'DiscountPercent': 5},
+        {'TransactionID': 'TXN28', 'Date': '2024-09-28 10:00', 'DiscountPercent': 50, 'Voided': 'Yes'},
+        # A branch with too few sales of its own is scored against the chain
+        {'TransactionID': 'TXN29', 'Date': '2024-09-29 10:00', 'DiscountPercent': 50, 'OutletID': 'OUT002',
+         'OutletName': 'Mombasa Nyali'},
+    ])
+    scored = price_anomalies.score_lines(df).set_index('TransactionID')
+    assert scored.loc[scored['PriceAnomaly'] == 1].index.tolist() == ['TXN26', 'TXN29']
+    # No spread at all in the baseline, so the 5% floor sets the scale: (25 - 50) / (1.4826 * 2.5)
+    assert scored.loc['TXN26', 'PriceZ'] == -25 / (price_anomalies.MAD_SCALE * 2.5)
+    assert np.isnan(scored.loc['TXN28', 'PriceZ'])
+
+    baselines = price_anomalies.price_baselines(df).set_index('OutletID')
+    assert baselines['Level'].to_dict() == {'OUT001': 'Outlet', 'OUT002': 'Chain'}
+    worst = price_anomalies.anomaly_lines(scored.reset_index())
+    assert sorted(worst['TransactionID']) == ['TXN26', 'TXN29']
+    assert worst['UnderRungKES'].tolist() == [25.0, 25.0]
+
+
+def test_scores_match_a_groupby_baseline():
+    df = data_generation.generate_pharmacy_data(20000, 3)
+    scored = price_anomalies.score_lines(df)
+    price, margin = price_anomalies.line_measures(df)
+    lines = df.assign(Price=price, Margin=margin)
+    sales = lines[(lines['Voided'] == 'No') & (lines['IsReturn'] == 'No')]
+
+    def baseline(keys):
+        median = sales.groupby(keys)[['Price', 'Margin']].median()
+        deviation = (sales.set_index(keys)[['Price', 'Margin']] - median.reindex(sales.set_index(keys).index)).abs()
+        return median, deviation.groupby(level=list(range(len(keys)))).median(), sales.groupby(keys).size()
+
+    own_median, own_mad, own_lines = baseline(['OutletID', 'ItemCode'])
+    chain_median, chain_mad, _ = baseline(['ItemCode'])
+    shelf = pd.MultiIndex.from_frame(sales[['OutletID', 'ItemCode']])
+    thin = own_lines.reindex(shelf).values < price_anomalies.MIN_BASELINE_LINES
+    median = np.where(thin[:, None], chain_median.reindex(sales['ItemCode']).values, own_median.reindex(shelf).values)
+    mad = np.where(thin[:, None], chain_mad.reindex(sales['ItemCode']).values, own_mad.reindex(shelf).values)
+    price_z = (sales['Price'].values - median[:, 0]) / (
+        price_anomalies.MAD_SCALE * np.maximum(mad[:, 0], price_anomalies.PRICE_MAD_FLOOR * median[:, 0]))
+    margin_z = (sales['Margin'].values - median[:, 1]) / (
+        price_anomalies.MAD_SCALE * np.maximum(mad[:, 1], price_anomalies.MARGIN_MAD_FLOOR))
+
+    live = scored.loc[sales.index]
+    np.testing.assert_allclose(live['PriceZ'].values, price_z)
+    np.testing.assert_allclose(live['MarginZ'].values, margin_z)
+    expected = (np.abs(price_z) > price_anomalies.Z_THRESHOLD) | (margin_z < -price_anomalies.Z_THRESHOLD)
+    assert expected.any() and (live['PriceAnomaly'].values == expected).all()
+    assert scored.loc[~scored.index.isin(sales.index), 'PriceAnomaly'].eq(0).all()
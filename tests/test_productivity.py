@@ -0,0 +1,37 @@
+import pytest
+
+import analytics
+import data_generation
+import dimensions
+import productivity
+
+
+@pytest.mark.parametrize('scale', ['', '20x4x500'])
+def test_synthetic_off_shift_sales_come_from_absences_and_late_logins(scale):
+    dims = dimensions.synthesize_dimensions(**dimensions.parse_scale(scale)) if scale else None
+    df = data_generation.generate_pharmacy_data(20000, 7, dims)
+    logins = data_generation.generate_employee_logins(dims, 7)
+    assert str(logins['Date'].min()) == str(df['Date'].min().date())
+    assert str(logins['Date'].max()) == str(df['Date'].max().date())
+
+    stats = productivity.cashier_productivity(analytics.sales_only(df), logins)
+    cashier = stats['cashier']
+    rate = cashier['OffShiftBaskets'].sum() / cashier['ScoredBaskets'].sum() * 100
+    assert 0.5 < rate < 10
+    # Every logged-out sale is on an absent day or before a late login
+    off = stats['off_shift'].assign(Day=lambda t: t['Date'].dt.date)
+    day_logins = logins.set_index(['CashierName', 'Date'])
+    flags = day_logins.loc[list(zip(off['CashierName'], off['Day']))]
+    explained = (flags['Status'].values == 'Absent') | flags['IsLate'].values | \
+                (off['Date'].values < flags['LoginTime'].values) | (off['Date'].values > flags['LogoutTime'].values)
+    assert explained.all()
+
+
+def test_days_without_logins_are_not_scored():
+    df = data_generation.generate_pharmacy_data(5000, 7)
+    logins = data_generation.generate_employee_logins(None, 7)
+    last_day = logins['Date'].max()
+    stats = productivity.cashier_productivity(analytics.sales_only(df), logins[logins['Date'] < last_day])
+    cashier = stats['cashier']
+    assert (cashier['ScoredBaskets'] < cashier['Baskets']).any()
+    assert (stats['off_shift']['Date'].dt.date < last_day).all()
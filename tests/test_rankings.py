@@ -0,0 +1,37 @@
+import pandas as pd
+
+import analytics
+import data_generation
+import rankings
+
+
+def test_sync_folds_in_only_new_sales():
+    sales = analytics.sales_only(data_generation.generate_pharmacy_data(5000, 3)).sort_values('Date', kind='mergesort')
+    cutoff = sales['Date'].iloc[len(sales) // 2]
+    index = rankings.RankingIndex()
+    assert index.sync(sales[sales['Date'] <= cutoff]) == (sales['Date'] <= cutoff).sum()
+    assert index.sync(sales) == (sales['Date'] > cutoff).sum()
+    assert index.sync(sales) == 0
+
+    outlets = sorted(sales['OutletName'].unique())[:2]
+    expected = rankings.rank_products(analytics.filter_transactions(sales, outlets=outlets), 10)
+    pd.testing.assert_frame_equal(index.rank(10, outlets=outlets), expected, check_dtype=False)
+
+
+def test_sync_rebuilds_for_a_different_dataset():
+    index = rankings.RankingIndex()
+    index.sync(analytics.sales_only(data_generation.generate_pharmacy_data(3000, 3)))
+    other = analytics.sales_only(data_generation.generate_pharmacy_data(2000, 4))
+    assert index.sync(other) == len(other)
+    pd.testing.assert_frame_equal(index.rank(10), rankings.rank_products(other, 10), check_dtype=False)
+
+
+def test_sync_rebuilds_when_the_dataset_key_changes():
+    sales = analytics.sales_only(data_generation.generate_pharmacy_data(3000, 3))
+    index = rankings.RankingIndex()
+    index.sync(sales, key=('a',))
+    # Same dates and line count, different numbers: only the key tells them apart
+    other = sales.assign(TotalPriceKES=sales['TotalPriceKES'] * 2)
+    assert index.sync(other, key=('a',)) == 0
+    assert index.sync(other, key=('b',)) == len(other)
+    pd.testing.assert_frame_equal(index.rank(10), rankings.rank_products(other, 10), check_dtype=False)
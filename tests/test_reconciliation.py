@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+
+import data_generation
+import reconciliation
+from baskets import build_baskets
+
+
+def statement(rows):
+    lines = pd.DataFrame(rows, columns=['ReceiptNo', 'Timestamp', 'Amount'])
+    return lines.assign(Timestamp=pd.to_datetime(lines['Timestamp']), OutletID='OUT001', Details='Merchant Payment')
+
+
+def test_contested_basket_goes_to_the_closest_payment(make_lines):
+    df = make_lines([
+        {'TransactionID': 'TXN1', 'Date': '2024-09-02 10:00', 'Quantity': 10},
+        {'TransactionID': 'TXN2', 'Date': '2024-09-02 10:12', 'Quantity': 10},
+        {'TransactionID': 'TXN3', 'Date': '2024-09-02 15:00', 'Quantity': 4},
+        {'TransactionID': 'TXN4', 'Date': '2024-09-02 15:30', 'Quantity': 2, 'PaymentType': 'Cash'},
+    ])
+    result = reconciliation.reconcile_mpesa(df, statement([
+        ('SK1', '2024-09-02 10:02', 500.0),   # nearest TXN1, but SK2 is closer to it
+        ('SK2', '2024-09-02 10:01', 500.0),
+        ('SK3', '2024-09-02 12:00', 999.0),   # no POS record
+    ]))
+    matches = result['matches'].set_index('ReceiptNo')
+    assert matches['TransactionID'].to_dict() == {'SK1': 'TXN2', 'SK2': 'TXN1'}
+    assert matches['LagSeconds'].to_dict() == {'SK1': -600.0, 'SK2': 60.0}
+    assert result['unmatched_lines']['ReceiptNo'].tolist() == ['SK3']
+    # Cash sales are not expected on the statement
+    assert result['unmatched_txns']['TransactionID'].tolist() == ['TXN3']
+    daily = result['daily'].iloc[0]
+    assert (daily['Recorded'], daily['Statement'], daily['Variance']) == (1200.0, 1999.0, 799.0)
+    assert result['cashier']['Variance'].tolist() == [-200.0]
+
+
+def test_payment_outside_the_tolerance_is_unmatched(make_lines):
+    df = make_lines([{'TransactionID': 'TXN1', 'Date': '2024-09-02 10:00'}])
+    result = reconciliation.reconcile_mpesa(df, statement([('SK1', '2024-09-02 10:16', 50.0)]))
+    assert result['matches'].empty and len(result['unmatched_lines']) == 1
+
+
+def test_no_unmatched_payment_could_have_taken_an_unmatched_basket():
+    df = data_generation.generate_pharmacy_data(3000, 7)
+    lines = reconciliation.simulate_mpesa_statement(df, seed=7)
+    mpesa = df[(df['PaymentType'] == 'M-Pesa') & (df['Voided'] == 'No') & (df['IsReturn'] == 'No')]
+    txns = build_baskets(mpesa).rename(columns={'Value': 'TotalPriceKES'})
+    matched = reconciliation.match_statement(txns, lines).merge(lines, on='ReceiptNo')
+
+    # Every match pays the same outlet the same amount within the tolerance, one payment per basket
+    found = matched.dropna(subset=['TransactionID']).merge(txns, on='TransactionID', suffixes=('', 'Txn'))
+    assert len(found) > 0 and found['TransactionID'].is_unique
+    assert (found['OutletID'] == found['OutletIDTxn']).all()
+    assert np.allclose(found['Amount'], found['TotalPriceKES'])
+    assert (found['LagSeconds'].abs() <= reconciliation.MATCH_TOLERANCE.total_seconds()).all()
+
+    # Brute force: compare every leftover payment with every leftover basket
+    left_lines = matched[matched['TransactionID'].isna()]
+    left_txns = txns[~txns['TransactionID'].isin(found['TransactionID'])]
+    pairs = left_lines.merge(left_txns, on='OutletID')
+    pairs = pairs[np.isclose(pairs['Amount'], pairs['TotalPriceKES']) &
+                  ((pairs['Timestamp'] - pairs['Date']).abs() <= reconciliation.MATCH_TOLERANCE)]
+    assert pairs.empty
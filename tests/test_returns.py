@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+
+import data_generation
+import returns
+
+
+def test_return_takes_the_latest_of_two_candidate_sales(make_lines):
+    df = make_lines([
+        {'TransactionID': 'TXN1', 'Date': '2024-09-01 10:00', 'Quantity': 2},
+        {'TransactionID': 'TXN2', 'Date': '2024-09-03 10:00', 'Quantity': 2, 'CashierID': 'C002',
+         'CashierName': 'Peter Omondi'},
+        {'TransactionID': 'TXN3', 'Date': '2024-09-05 10:00', 'Quantity': 2, 'IsReturn': 'Yes'},
+        # A second identical return gets the remaining sale; a third finds none
+        {'TransactionID': 'TXN4', 'Date': '2024-09-06 10:00', 'Quantity': 2, 'IsReturn': 'Yes'},
+        {'TransactionID': 'TXN5', 'Date': '2024-09-07 10:00', 'Quantity': 2, 'IsReturn': 'Yes'},
+        # Different quantity: not a candidate
+        {'TransactionID': 'TXN6', 'Date': '2024-09-07 11:00', 'Quantity': 3, 'IsReturn': 'Yes'},
+    ])
+    table = returns.match_returns(df)['returns'].set_index('ReturnID')
+    assert table['SaleID'].fillna('').to_dict() == {'TXN6': '', 'TXN5': '', 'TXN4': 'TXN1', 'TXN3': 'TXN2'}
+    assert table['Status'].to_dict() == {'TXN6': 'Unmatched', 'TXN5': 'Unmatched', 'TXN4': 'Matched',
+                                         'TXN3': 'Different cashier'}
+    assert table.loc['TXN3', 'LagDays'] == 2.0
+
+
+def test_sale_outside_the_lookback_is_not_matched(make_lines):
+    df = make_lines([
+        {'TransactionID': 'TXN1', 'Date': '2024-08-01 10:00'},
+        {'TransactionID': 'TXN2', 'Date': '2024-09-05 10:00', 'IsReturn': 'Yes'},
+    ])
+    assert returns.match_returns(df)['returns']['Status'].tolist() == ['Unmatched']
+    assert returns.match_returns(df, lookback_days=40)['returns']['Status'].tolist() == ['Matched']
+
+
+def brute_force_matches(df, lookback):
+    """(ReturnID, ItemCode, SaleID) per return, claiming sales round by round with plain loops."""
+    live = df[df['Voided'] == 'No'].assign(AmountKey=lambda t: np.round(t['TotalPriceKES'].abs() * 100))
+    sales = live[live['IsReturn'] == 'No'].reset_index(drop=True)
+    lines = live[live['IsReturn'] == 'Yes'].reset_index(drop=True)
+    key = ['OutletID', 'ItemCode', 'Quantity', 'AmountKey']
+    by_key = sales.groupby(key).indices
+    sale_time, return_time = sales['Date'].tolist(), lines['Date'].tolist()
+
+    matched, taken, pending = {}, set(), list(range(len(lines)))
+    for _ in range(returns.MAX_MATCH_ROUNDS):
+        claims = {}
+        for r in pending:
+            candidates = [s for s in by_key.get(tuple(lines.loc[r, key]), [])
+                          if s not in taken and sale_time[s] < return_time[r] <= sale_time[s] + lookback]
+            if candidates:
+                # The latest earlier sale; the nearest return keeps a sale claimed twice
+                sale = max(candidates, key=lambda s: (sale_time[s], s))
+                claims.setdefault(sale, []).append((return_time[r] - sale_time[sale], r))
+        for sale, claimants in claims.items():
+            matched[min(claimants)[1]] = sale
+            taken.add(sale)
+        pending = [r for r in pending if r not in matched]
+    sale_ids = [sales['TransactionID'][matched[r]] if r in matched else '' for r in range(len(lines))]
+    return sorted(zip(lines['TransactionID'], lines['ItemCode'], sale_ids))
+
+
+def test_matches_agree_with_a_brute_force_search():
+    df = data_generation.generate_pharmacy_data(20000, 3)
+    table = returns.match_returns(df)['returns']
+    assert (table['Status'] == 'Matched').any() and (table['Status'] == 'Unmatched').any()
+    actual = sorted(zip(table['ReturnID'], table['ItemCode'], table['SaleID'].fillna('')))
+    assert actual == brute_force_matches(df, pd.Timedelta(days=returns.LOOKBACK_DAYS))
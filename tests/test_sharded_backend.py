@@ -0,0 +1,48 @@
+import pandas as pd
+import pytest
+
+import analytics
+import data_generation
+import sharded_backend
+
+
+def every_other(df, column):
+    return sorted(df[column].unique())[::2]
+
+
+SCENARIOS = {
+    'no filters': lambda df: {},
+    'one month, daytime': lambda df: {
+        'date_range': (pd.Timestamp('2024-10-01').date(), pd.Timestamp('2024-10-31').date()),
+        'hour_range': (9, 17),
+    },
+    'outlets and payment types': lambda df: {'outlets': every_other(df, 'OutletName'),
+                                             'payment_types': ['M-Pesa', 'Cash']},
+    'empty selection': lambda df: {'payment_types': []},
+}
+
+
+@pytest.fixture(scope='module')
+def all_df():
+    return data_generation.generate_pharmacy_data(3000, 11)
+
+
+@pytest.fixture(scope='module')
+def backend(all_df):
+    backend = sharded_backend.ShardedBackend.from_frame(all_df, shards=2)
+    yield backend
+    backend.close()
+
+
+@pytest.mark.parametrize('scenario', list(SCENARIOS))
+def test_sharded_backend_matches_pandas(scenario, all_df, backend):
+    results = sharded_backend.parity_check(all_df, backend, **SCENARIOS[scenario](all_df))
+    assert (results['Difference'] == '').all(), results.loc[results['Difference'] != '', ['Query', 'Difference']]
+
+
+def test_kpis_match_pandas(all_df, backend):
+    df = analytics.filter_transactions(analytics.sales_only(all_df), payment_types=['M-Pesa', 'Cash'])
+    kpis = backend.kpis(payment_types=['M-Pesa', 'Cash'])
+    assert kpis['Sales'] == pytest.approx(df['TotalPriceKES'].sum())
+    assert kpis['Transactions'] == df['TransactionID'].nunique()
+    assert kpis['MpesaSales'] == pytest.approx(df.loc[df['PaymentType'] == 'M-Pesa', 'TotalPriceKES'].sum())
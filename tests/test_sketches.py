@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import analytics
+import baskets
+import data_generation
+import sketches
+
+
+@pytest.fixture(scope='module')
+def sales():
+    return analytics.sales_only(data_generation.generate_pharmacy_data(20000, 5))
+
+
+FILTERS = {
+    'everything': {},
+    'part months': {'date_range': (pd.Timestamp('2024-08-10').date(), pd.Timestamp('2024-11-20').date())},
+    'one outlet': {'outlets': ['Nairobi CBD']},
+}
+
+
+@pytest.mark.parametrize('name', list(FILTERS))
+def test_quantiles_track_the_exact_ones(name, sales):
+    index = sketches.SketchIndex.from_transactions(sales)
+    filters = FILTERS[name]
+    selected = analytics.filter_transactions(sales, **filters)
+    values = baskets.build_baskets(selected)['Value']
+    for q, estimate in zip([0.5, 0.9, 0.99], index.quantiles('BasketValue', [0.5, 0.9, 0.99], **filters)):
+        assert (values <= estimate).mean() == pytest.approx(q, abs=0.01)
+    # Discounts are exact and always a discount that was given
+    discounts = index.quantiles('DiscountPercent', [0.5, 0.9, 0.99], **filters)
+    expected = np.quantile(selected['DiscountPercent'], [0.5, 0.9, 0.99], method='inverted_cdf')
+    np.testing.assert_array_equal(discounts, expected)
+
+
+def test_merged_index_matches_one_built_at_once(sales):
+    cutoff = pd.Timestamp('2024-10-15')
+    merged = sketches.SketchIndex.from_transactions(sales[sales['Date'] < cutoff]).merge(
+        sketches.SketchIndex.from_transactions(sales[sales['Date'] >= cutoff]))
+    whole = sketches.SketchIndex.from_transactions(sales)
+    assert merged.summary(**FILTERS['part months']) == pytest.approx(whole.summary(**FILTERS['part months']))
@@ -0,0 +1,46 @@
+import pandas as pd
+import pytest
+
+import analytics
+import data_generation
+import sql_backend
+
+
+def every_other(sales_df, column):
+    return sorted(sales_df[column].unique())[::2]
+
+
+SCENARIOS = {
+    'no filters': lambda df: {},
+    'one month, daytime': lambda df: {
+        'date_range': (pd.Timestamp('2024-10-01').date(), pd.Timestamp('2024-10-31').date()),
+        'hour_range': (9, 17),
+    },
+    'outlets and payment types': lambda df: {'outlets': every_other(df, 'OutletName'),
+                                             'payment_types': ['M-Pesa', 'Cash']},
+    'categories, shifts and employees': lambda df: {'categories': every_other(df, 'Category'), 'shifts': ['Morning'],
+                                                    'employees': every_other(df, 'CashierName')},
+    'empty selection': lambda df: {'payment_types': []},
+}
+
+
+@pytest.fixture(scope='module')
+def sales_df():
+    return analytics.sales_only(data_generation.generate_pharmacy_data(3000, 11))
+
+
+def _backend(engine, sales_df, tmp_path):
+    if engine != 'sqlite' and sql_backend.duckdb is None:
+        pytest.skip("duckdb is not installed")
+    if engine == 'parquet':
+        path = str(tmp_path / 'sales.parquet')
+        sales_df.to_parquet(path, index=False)
+        return sql_backend.SQLBackend.from_parquet(path)
+    return sql_backend.SQLBackend.from_frame(sales_df, engine)
+
+
+@pytest.mark.parametrize('scenario', list(SCENARIOS))
+@pytest.mark.parametrize('engine', sql_backend.ENGINES + ['parquet'])
+def test_sql_backend_matches_pandas(engine, scenario, sales_df, tmp_path):
+    results = sql_backend.parity_check(sales_df, _backend(engine, sales_df, tmp_path), **SCENARIOS[scenario](sales_df))
+    assert (results['Difference'] == '').all(), results.loc[results['Difference'] != '', ['Query', 'Difference']]
@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import analytics
+import data_generation
+import targets
+
+
+def test_steady_outlet_projects_its_run_rate(make_lines):
+    days = pd.date_range('2024-09-01 10:00', '2024-10-10 10:00', freq='D')
+    df = make_lines([{'TransactionID': f'TXN{i}', 'Date': day, 'Quantity': 1, 'MonthlyTarget': 1000}
+                     for i, day in enumerate(days)] +
+                    [{'TransactionID': f'TXN{i}B', 'Date': day, 'OutletID': 'OUT002', 'OutletName': 'Mombasa Nyali',
+                      'MonthlyTarget': 100000} for i, day in enumerate(days)])
+    tracking = targets.track_targets(df, pd.Timestamp('2024-10-10').date()).set_index(['OutletID', 'Month'])
+
+    september = tracking.loc[('OUT001', '2024-09')]
+    assert september['Closed'] and september['Status'] == 'Achieved'
+    assert september['MTDSales'] == september['Projected'] == 1500.0
+
+    october = tracking.loc[('OUT001', '2024-10')]
+    assert (october['DaysElapsed'], october['DaysInMonth'], october['MTDSales']) == (10, 31, 500.0)
+    # Fifty a day, every day, runs on to 31 x 50
+    assert october['Projected'] == pytest.approx(1550.0, rel=0.02)
+    assert october['Status'] == 'On track' and october['HitProbability'] == pytest.approx(1.0)
+    far = tracking.loc[('OUT002', '2024-10')]
+    assert far['Status'] == 'Off track' and far['HitProbability'] == pytest.approx(0.0)
+    assert tracking.loc[('OUT002', '2024-09'), 'Status'] == 'Missed'
+
+
+def test_month_to_date_matches_a_groupby():
+    sales = analytics.sales_only(data_generation.generate_pharmacy_data(20000, 3))
+    as_of = pd.Timestamp('2024-10-15').date()
+    tracking = targets.track_targets(sales, as_of)
+
+    upto = sales[sales['Date'].dt.date <= as_of]
+    expected = upto.groupby(['OutletID', upto['Date'].dt.strftime('%Y-%m')])['TotalPriceKES'].sum()
+    actual = tracking.set_index(['OutletID', 'Month'])['MTDSales']
+    pd.testing.assert_series_equal(actual.reindex(expected.index), expected, check_names=False)
+    assert (tracking.loc[tracking['Closed'], 'Projected'] == tracking.loc[tracking['Closed'], 'MTDSales']).all()
+    open_months = tracking[~tracking['Closed']]
+    assert (open_months['Month'] == '2024-10').all()
+    assert (open_months['P10'] <= open_months['Projected']).all() and \
+           (open_months['Projected'] <= open_months['P90']).all()
+    assert np.isfinite(open_months['HitProbability']).all()